@@ -1,14 +1,33 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for, flash
+from flask import Flask, request, jsonify, render_template, session, redirect, url_for, flash, Response, stream_with_context, make_response, g
 from flask_cors import CORS
 import mysql.connector
 from mysql.connector import Error
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from functools import wraps
 import uuid
 import json
+import base64
+import hmac
+import threading
+import numpy as np
+
+import instrumentation
+import queries
+from auth_cache import UserVersionCache
+from config import Config
+from db_pool import ConnectionPool
+from instrumentation import span, timed
+from reference_cache import ReferenceCache
+from model.batching import MicroBatcher
+from model.cache import PredictionCache
+from model.features import encoder as feature_encoder
+from model.inference import engine as inference_engine, risk_result, risk_results
+from password_hashing import HasherBusy, PasswordHasher
+from profiler import ProfilerBusy, collapsed, sample_stacks
+from query_log import QueryLog
+from risk_scoring import RULES_MODEL_VERSION, normalize_record, read_csv_records, row_key, score_batch, to_columns
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 CORS(app)
@@ -16,48 +35,168 @@ app.config['SECRET_KEY'] = os.urandom(24)
 app.config['JWT_EXPIRATION_DELTA'] = timedelta(days=1)
 app.secret_key = 'your_secret_key_here'  # Set a secret key for sessions
 
+# Route latency and per-step spans, exported on /metrics
+instrumentation.init_app(app, slow_request_seconds=Config.SLOW_REQUEST_SECONDS,
+                         server_timing=Config.SERVER_TIMING_HEADER)
+
+# Shared connection pool; connections are opened lazily and reused across requests
+db_pool = ConnectionPool.from_config(Config)
+
+# Captures the plan of a slow statement; runs on query_log's background thread
+def explain_statement(operation, params):
+    connection = db_pool.connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute('EXPLAIN ' + operation, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        connection.close()
+
+# Every statement on a pooled connection is timed, fingerprinted and, when slow,
+# logged with its plan (see /admin/queries)
+query_log = QueryLog(slow_threshold=Config.SLOW_QUERY_SECONDS,
+                     max_fingerprints=Config.QUERY_LOG_MAX_FINGERPRINTS,
+                     explain=explain_statement if Config.SLOW_QUERY_EXPLAIN else None)
+
+def observe_statement(operation, params, seconds):
+    instrumentation.record('sql', seconds)
+    query_log.observe(operation, params, seconds)
+
+db_pool.listeners.append(observe_statement)
+
 # Database Connection with transaction support
+# Borrows from the pool; connection.close() returns it to the pool
 def create_connection():
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',  # Change as per your MySQL setup
-            password='root',  # Change as per your MySQL setup
-            database='lung_cancer_db',
-            autocommit=False  # Disable autocommit for transaction control
-        )
-        return connection
+        with span('db_connect'):
+            return db_pool.connection()
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
 
+# Password hashes are computed on a bounded process pool so a burst of logins
+# can't take the CPU from every request thread
+password_hasher = PasswordHasher(Config.PASSWORD_HASH_METHOD,
+                                 workers=Config.PASSWORD_HASH_WORKERS,
+                                 max_pending=Config.PASSWORD_HASH_MAX_PENDING,
+                                 timeout=Config.PASSWORD_HASH_TIMEOUT)
+
+# Refused (pool full or slow) sign-ins get a quick 503 instead of queueing
+def hasher_busy(template):
+    message = 'Too many sign-ins in progress, please try again in a moment'
+    if request.is_json:
+        response = jsonify({'message': message})
+    else:
+        flash(message, 'error')
+        response = make_response(render_template(template))
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+# Current version_control number of each user, used to reject stale tokens
+user_versions = UserVersionCache(ttl=Config.USER_CACHE_TTL)
+
+def load_user_version(user_id):
+    connection = create_connection()
+    if not connection:
+        raise Error(msg='Database connection error')
+    cursor = connection.cursor()
+    try:
+        cursor.execute(queries.RECORD_VERSION, ('users', user_id))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        cursor.close()
+        connection.close()
+
+def current_user_version(user_id):
+    version = user_versions.get(user_id)
+    if version is None:
+        version = load_user_version(user_id)
+        user_versions.put(user_id, version)
+    return version
+
+# API tokens embed the fields handlers need, so no users lookup is required
+def issue_token(user, version):
+    return jwt.encode({
+        'user_id': user['id'],
+        'name': user['name'],
+        'email': user['email'],
+        'ver': version,
+        'exp': datetime.utcnow() + app.config['JWT_EXPIRATION_DELTA'],
+    }, Config.JWT_SECRET_KEY, algorithm="HS256")
+
+# Bump a user's version after any change to their users row; tokens issued
+# before the change stop validating
+def touch_user(connection, cursor, user_id, modified_by):
+    updated = update_version(connection, cursor, 'users', user_id, modified_by)
+    user_versions.invalidate(user_id)
+    return updated
+
+# Checks an API token from /login; returns (current_user, None) or (None, error message).
+# The user fields come from the signed claims, so no user row is read per request.
+def authenticate_token(token):
+    if not token:
+        return None, 'Token is missing!'
+    
+    try:
+        data = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=["HS256"])
+        # Served from the in-process cache; only a miss costs one pooled query
+        version = current_user_version(data['user_id'])
+    except:
+        return None, 'Token is invalid!'
+    
+    if data.get('ver') != version:
+        return None, 'Token is stale, please log in again'
+    
+    return {
+        'id': data['user_id'],
+        'name': data['name'],
+        'email': data['email'],
+        'version': version,
+    }, None
+
 # JWT token required decorator
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        if 'x-access-token' in request.headers:
-            token = request.headers['x-access-token']
-        
-        if not token:
-            return jsonify({'message': 'Token is missing!'}), 401
-        
-        try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            connection = create_connection()
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM users WHERE id = %s", (data['user_id'],))
-            current_user = cursor.fetchone()
-            cursor.close()
-            connection.close()
-        except:
-            return jsonify({'message': 'Token is invalid!'}), 401
-            
+        current_user, error = authenticate_token(request.headers.get('x-access-token'))
+        if error:
+            return jsonify({'message': error}), 401
         return f(current_user, *args, **kwargs)
     
     return decorated
 
+# Pages use the session; API clients may send their token instead. The user id is
+# left in g.user_id either way.
+def login_or_token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if 'x-access-token' in request.headers:
+            current_user, error = authenticate_token(request.headers['x-access-token'])
+            if error:
+                return jsonify({'message': error}), 401
+            g.user_id = current_user['id']
+        elif 'user_id' in session:
+            g.user_id = session['user_id']
+        else:
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    
+    return decorated
+
+# Operational endpoints: require the X-Admin-Token header to match ADMIN_TOKEN, and
+# look like missing routes when no token is configured
+def admin_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('X-Admin-Token', '')
+        if not Config.ADMIN_TOKEN or not hmac.compare_digest(token, Config.ADMIN_TOKEN):
+            return jsonify({'message': 'Not found'}), 404
+        return f(*args, **kwargs)
+    return decorated
+
 # Helper: login required decorator
 def login_required(f):
     @wraps(f)
@@ -75,10 +214,11 @@ def transaction_required(f):
         if not connection:
             return jsonify({'message': 'Database connection error'}), 500
         
+        cursor = None
         try:
             cursor = connection.cursor()
-            # Start transaction
-            cursor.execute("START TRANSACTION")
+            # Pooled connections run with autocommit off, so a transaction is already
+            # implicit; the single commit below is the only one for the request
             
             # Execute the function
             result = f(connection, cursor, *args, **kwargs)
@@ -91,12 +231,14 @@ def transaction_required(f):
             connection.rollback()
             return jsonify({'message': f'Transaction failed: {str(e)}'}), 500
         finally:
-            cursor.close()
+            if cursor:
+                cursor.close()
             connection.close()
     
     return decorated
 
 # Lock management functions
+@timed('lock_acquire')
 def acquire_lock(connection, cursor, table_name, record_id, lock_type, user_id, timeout_minutes=5):
     try:
         lock_id = str(uuid.uuid4())
@@ -111,26 +253,22 @@ def acquire_lock(connection, cursor, table_name, record_id, lock_type, user_id,
         connection.rollback()
         return None
 
+# Runs inside the caller's transaction; the lock is released when the caller commits
+@timed('lock_release')
 def release_lock(connection, cursor, table_name, record_id, user_id):
     try:
         cursor.execute("""
             DELETE FROM lock_management 
             WHERE table_name = %s AND record_id = %s AND lock_holder = %s
         """, (table_name, record_id, user_id))
-        connection.commit()
         return True
     except Error as e:
-        connection.rollback()
         return False
 
 # Version control functions
 def check_version(connection, cursor, table_name, record_id, expected_version):
     try:
-        cursor.execute("""
-            SELECT version_number 
-            FROM version_control 
-            WHERE table_name = %s AND record_id = %s
-        """, (table_name, record_id))
+        cursor.execute(queries.RECORD_VERSION, (table_name, record_id))
         result = cursor.fetchone()
         if not result or result[0] != expected_version:
             return False
@@ -138,6 +276,7 @@ def check_version(connection, cursor, table_name, record_id, expected_version):
     except Error:
         return False
 
+# Runs inside the caller's transaction so the version bump commits with the change itself
 def update_version(connection, cursor, table_name, record_id, user_id):
     try:
         cursor.execute("""
@@ -147,61 +286,137 @@ def update_version(connection, cursor, table_name, record_id, user_id):
             version_number = version_number + 1,
             modified_by = %s
         """, (table_name, record_id, user_id, user_id))
-        connection.commit()
         return True
     except Error:
-        connection.rollback()
         return False
 
 # Basic lung cancer risk assessment model
+# Single-patient wrapper around the vectorized scorer in risk_scoring.py
 def predict_lung_cancer_risk(age, gender, smoking, cough, chest_pain, fatigue, shortness_of_breath):
-    # This is a simplified risk assessment model for demonstration
-    # In a real application, you'd use a trained ML model
+    risk_scores, predictions = score_batch({
+        'age': [age],
+        'gender': [gender],
+        'smoking': [smoking],
+        'cough': [cough],
+        'chest_pain': [chest_pain],
+        'fatigue': [fatigue],
+        'shortness_of_breath': [shortness_of_breath],
+    })
     
-    risk_score = 0
+    return {
+        "prediction": str(predictions[0]),
+        "risk_score": float(risk_scores[0]),
+        "model_version": RULES_MODEL_VERSION,
+    }
+
+# Scores prepared /predict submissions in one call with the configured engine; each
+# result names the model version that produced it
+@timed('inference')
+def score_submissions(items):
+    if Config.PREDICTION_ENGINE == 'model':
+        probabilities, version = inference_engine.predict_proba_versioned(np.vstack(items))
+        return [risk_result(float(probability), version) for probability in probabilities]
+    risk_scores, predictions = score_batch(to_columns(items), lookup=Config.RULES_LOOKUP_TABLE)
+    return [{"prediction": str(prediction), "risk_score": float(risk_score), "model_version": RULES_MODEL_VERSION}
+            for risk_score, prediction in zip(risk_scores, predictions)]
+
+# With the model engine, concurrent /predict requests are coalesced into one scoring call
+prediction_batcher = None
+if Config.PREDICTION_ENGINE == 'model' and Config.PREDICT_MICROBATCH_WAIT_MS > 0:
+    prediction_batcher = MicroBatcher(score_submissions,
+                                      max_batch=Config.PREDICT_MICROBATCH_MAX_ROWS,
+                                      max_wait=Config.PREDICT_MICROBATCH_WAIT_MS / 1000.0)
+
+# Identical submissions recur constantly, so results are memoized on the canonical
+# feature key. With the model engine an entry is served only while the model version
+# that scored it is still current; a swap also empties the cache to free the space.
+prediction_cache = None
+if Config.PREDICTION_CACHE_SIZE > 0:
+    model_engine = Config.PREDICTION_ENGINE == 'model'
+    prediction_cache = PredictionCache(maxsize=Config.PREDICTION_CACHE_SIZE,
+                                       ttl=Config.PREDICTION_CACHE_TTL,
+                                       current_version=(lambda: inference_engine.version) if model_engine else None)
+    inference_engine.listeners.append(lambda version: prediction_cache.clear())
+
+# Turns one normalize_record() row into (scoring input, cache key); done per request
+# so one bad submission cannot fail a shared batch
+def prepare_submission(record):
+    if Config.PREDICTION_ENGINE == 'model':
+        item = feature_encoder.encode_record(record)
+        return item, ('model', tuple(item.tolist()))
+    return record, ('rules', row_key(record))
+
+# Scores one normalized /predict submission with the configured engine; the span
+# includes any wait for a micro-batch, inference itself is timed separately
+@timed('score')
+def assess_risk(record):
+    item, key = prepare_submission(record)
     
-    # Age risk factor
-    if age < 40:
-        risk_score += 1
-    elif 40 <= age < 50:
-        risk_score += 2
-    elif 50 <= age < 60:
-        risk_score += 3
-    else:
-        risk_score += 4
+    if prediction_cache:
+        result = prediction_cache.get(key)
+        if result is not None:
+            return result
     
-    # Gender risk factor
-    if gender == 'Male':
-        risk_score += 2
+    if prediction_batcher:
+        result = prediction_batcher(item, timeout=Config.PREDICT_TIMEOUT)
     else:
-        risk_score += 1
-    
-    # Smoking risk factor (highest weight)
-    if smoking == 'yes':
-        risk_score += 5
+        result = score_submissions([item])[0]
     
-    # Symptoms risk factors
-    if cough == 'yes':
-        risk_score += 2
-    if chest_pain == 'yes':
-        risk_score += 3
-    if fatigue == 'yes':
-        risk_score += 1
-    if shortness_of_breath == 'yes':
-        risk_score += 3
-    
-    # Risk assessment based on total score
-    if risk_score < 6:
-        prediction = "Low risk of lung cancer"
-    elif 6 <= risk_score < 10:
-        prediction = "Moderate risk of lung cancer"
-    else:
-        prediction = "High risk of lung cancer"
+    if prediction_cache:
+        prediction_cache.put(key, result)
+    return result
+
+# Prediction persistence
+# Each prediction is a fresh row, so concurrent writers never conflict and no lock is
+# needed; the version_control row enables optimistic checks for later updates.
+# The record_prediction procedure writes the prediction, its user link and its version
+# row in one round trip; nothing is committed until the caller's transaction commits.
+# record is the normalize_record() row that was scored, so the stored answers are
+# exactly the ones behind the stored score.
+def save_prediction(connection, cursor, user_id, record, prediction_result):
+    results = cursor.execute(
+        """CALL record_prediction(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, @prediction_id);
+        SELECT @prediction_id""",
+        (user_id, record['age'], record['gender'], record['smoking'],
+         record['cough'], record['chest_pain'], record['fatigue'],
+         record['shortness_of_breath'], prediction_result["prediction"],
+         prediction_result["risk_score"], prediction_result.get("model_version")),
+        multi=True
+    )
     
-    return {
-        "prediction": prediction,
-        "risk_score": float(risk_score)
-    }
+    prediction_id = None
+    for result in results:
+        if result.with_rows:
+            prediction_id = result.fetchone()[0]
+    return prediction_id
+
+# Bulk variant for /predict/batch: one multi-row INSERT per chunk. The chunk's batch_id
+# lets the user links and version rows be written with INSERT ... SELECT, since
+# auto-increment ids of a multi-row INSERT are not guaranteed to be consecutive.
+def save_prediction_batch(connection, cursor, user_id, rows, risk_scores, predictions, model_version):
+    batch_id = uuid.uuid4().hex
+    cursor.executemany(
+        """INSERT INTO predictions 
+        (age, gender, smoking, cough, chest_pain, fatigue, shortness_of_breath, 
+         prediction, risk_score, model_version, version, batch_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 1, %s)""",
+        [(row['age'], row['gender'], row['smoking'], row['cough'], row['chest_pain'],
+          row['fatigue'], row['shortness_of_breath'], str(prediction), float(risk_score),
+          model_version, batch_id)
+         for row, risk_score, prediction in zip(rows, risk_scores, predictions)]
+    )
+    cursor.execute(
+        "INSERT INTO user_predictions (user_id, prediction_id) SELECT %s, id FROM predictions WHERE batch_id = %s",
+        (user_id, batch_id)
+    )
+    cursor.execute(
+        """INSERT INTO version_control (table_name, record_id, version_number, modified_by)
+        SELECT 'predictions', id, 1, %s FROM predictions WHERE batch_id = %s""",
+        (user_id, batch_id)
+    )
+    # Ids within one INSERT are increasing, so this matches the input order
+    cursor.execute(queries.BATCH_PREDICTION_IDS, (batch_id,))
+    return [row[0] for row in cursor.fetchall()]
 
 # Routes
 @app.route('/')
@@ -233,7 +448,11 @@ def register(connection, cursor):
             return render_template('register.html')
         
         # Insert new user
-        hashed_password = generate_password_hash(password)
+        try:
+            with span('password_hash'):
+                hashed_password = password_hasher.hash(password)
+        except HasherBusy:
+            return hasher_busy('register.html')
         cursor.execute(
             "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
             (name, email, hashed_password)
@@ -242,7 +461,7 @@ def register(connection, cursor):
         user_id = cursor.lastrowid
         
         # Initialize version control
-        update_version(connection, cursor, 'users', user_id, user_id)
+        touch_user(connection, cursor, user_id, user_id)
         
         flash('User registered successfully. Please login.', 'success')
         return redirect(url_for('login'))
@@ -267,15 +486,8 @@ def login():
             return render_template('login.html')
         cursor = connection.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM users WHERE Email = %s", (email,))
+            cursor.execute(queries.USER_BY_EMAIL, (email,))
             user = cursor.fetchone()
-            if not user or not check_password_hash(user['password_hash'], password):
-                flash('Invalid credentials', 'error')
-                return render_template('login.html')
-            session['user_id'] = user['ID']
-            session['name'] = user['Name']
-            session['email'] = user['Email']
-            return redirect(url_for('dashboard'))
         except Error as e:
             flash(f'Login failed: {str(e)}', 'error')
             return render_template('login.html')
@@ -283,6 +495,54 @@ def login():
             cursor.close()
             connection.close()
 
+        # The connection is back in the pool while the hash is checked
+        if not user:
+            flash('Invalid credentials', 'error')
+            return render_template('login.html')
+        try:
+            with span('password_hash'):
+                matches, new_hash = password_hasher.verify(user['password_hash'], password)
+        except HasherBusy:
+            return hasher_busy('login.html')
+        if not matches:
+            flash('Invalid credentials', 'error')
+            return render_template('login.html')
+        if new_hash:
+            upgrade_password_hash(user, new_hash)
+
+        session['user_id'] = user['id']
+        session['name'] = user['name']
+        session['email'] = user['email']
+        if request.is_json:
+            # API clients get a token carrying their user fields
+            try:
+                version = current_user_version(user['id'])
+            except Error as e:
+                flash(f'Login failed: {str(e)}', 'error')
+                return render_template('login.html')
+            return jsonify({'token': issue_token(user, version)}), 200
+        return redirect(url_for('dashboard'))
+
+# A login with a hash made by an older method or work factor stores the new hash.
+# Matching on the old hash keeps a concurrent password change from being overwritten.
+def upgrade_password_hash(user, new_hash):
+    connection = create_connection()
+    if not connection:
+        return
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+            (new_hash, user['id'], user['password_hash'])
+        )
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        print(f"Password hash of user {user['id']} not upgraded: {e}")
+    finally:
+        cursor.close()
+        connection.close()
+
 @app.route('/logout')
 def logout():
     session.clear()
@@ -304,78 +564,178 @@ def predict(connection, cursor):
     data = request.form if request.form else request.get_json()
     
     try:
-        # Acquire a GLOBAL lock for predictions (only one user can predict at a time)
-        lock_id = acquire_lock(connection, cursor, 'predictions', 0, 'EXCLUSIVE', user_id)
-        if not lock_id:
-            flash('System is busy. Only one user can predict at a time. Please try again later.', 'error')
-            return render_template('predict.html', user_id=user_id)
-        
         # Process prediction
-        prediction_result = predict_lung_cancer_risk(
-            int(data.get('age')),
-            data.get('gender'),
-            data.get('smoking'),
-            data.get('cough'),
-            data.get('chest_pain'),
-            data.get('fatigue'),
-            data.get('shortness_of_breath')
-        )
-        
-        # Insert prediction with version control
-        cursor.execute(
-            """INSERT INTO predictions 
-            (age, gender, smoking, cough, chest_pain, fatigue, shortness_of_breath, 
-             prediction, risk_score, version)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 1)""",
-            (data.get('age'), data.get('gender'), data.get('smoking'),
-             data.get('cough'), data.get('chest_pain'), data.get('fatigue'),
-             data.get('shortness_of_breath'), prediction_result["prediction"],
-             prediction_result["risk_score"])
-        )
+        # Scored and stored from the same normalized answers
+        record = normalize_record(data)
+        prediction_result = assess_risk(record)
         
-        prediction_id = cursor.lastrowid
-        
-        # Link prediction to user
-        cursor.execute(
-            "INSERT INTO user_predictions (user_id, prediction_id) VALUES (%s, %s)",
-            (user_id, prediction_id)
-        )
-        
-        # Initialize version control for prediction
-        update_version(connection, cursor, 'predictions', prediction_id, user_id)
-        
-        # Release the global lock
-        release_lock(connection, cursor, 'predictions', 0, user_id)
+        # Predictions are independent inserts, so no lock is taken here
+        save_prediction(connection, cursor, user_id, record, prediction_result)
         
         return render_template('result.html',
                              prediction=prediction_result["prediction"],
                              risk_score=prediction_result["risk_score"],
                              timestamp=datetime.now().isoformat())
     except Exception as e:
-        # Always try to release the lock if an error occurs
-        release_lock(connection, cursor, 'predictions', 0, user_id)
+        # Discard any partial inserts before the decorator commits
+        connection.rollback()
         flash(f'Error processing prediction: {str(e)}', 'error')
         return render_template('predict.html', user_id=user_id)
 
-@app.route('/user/predictions', methods=['GET'])
+@app.route('/predict/batch', methods=['POST'])
 @login_required
+def predict_batch():
+    user_id = session.get('user_id')
+    
+    # Accept a survey-format CSV upload or a JSON array of patients
+    try:
+        if 'file' in request.files:
+            records = read_csv_records(request.files['file'].stream)
+        else:
+            records = request.get_json()
+            if isinstance(records, dict):
+                records = records.get('patients')
+            if not isinstance(records, list):
+                return jsonify({'message': 'Expected a JSON array of patients or a CSV file'}), 400
+        rows = []
+        for index, record in enumerate(records):
+            if len(rows) >= Config.PREDICT_BATCH_MAX_ROWS:
+                return jsonify({'message': f'Batch exceeds {Config.PREDICT_BATCH_MAX_ROWS} rows'}), 413
+            try:
+                rows.append(normalize_record(record))
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({'message': f'Invalid patient at row {index}: {e}'}), 400
+    except (UnicodeDecodeError, ValueError) as e:
+        return jsonify({'message': f'Could not read batch: {str(e)}'}), 400
+    
+    if not rows:
+        return jsonify({'message': 'Batch is empty'}), 400
+    
+    # Score the whole batch in one vectorized call with the configured engine
+    columns = to_columns(rows)
+    if Config.PREDICTION_ENGINE == 'model':
+        probabilities, model_version = inference_engine.predict_proba_versioned(feature_encoder.encode(columns))
+        risk_scores, predictions = risk_results(probabilities)
+    else:
+        risk_scores, predictions = score_batch(columns, lookup=Config.RULES_LOOKUP_TABLE)
+        model_version = RULES_MODEL_VERSION
+    
+    connection = create_connection()
+    if not connection:
+        return jsonify({'message': 'Database connection error'}), 500
+    
+    def generate():
+        # Each chunk is inserted and committed before its results are streamed back
+        cursor = connection.cursor()
+        chunk_size = Config.PREDICT_BATCH_CHUNK_SIZE
+        try:
+            for start in range(0, len(rows), chunk_size):
+                end = start + chunk_size
+                prediction_ids = save_prediction_batch(connection, cursor, user_id, rows[start:end],
+                                                       risk_scores[start:end], predictions[start:end],
+                                                       model_version)
+                connection.commit()
+                lines = []
+                for index, prediction_id in enumerate(prediction_ids, start):
+                    lines.append(json.dumps({
+                        'row': index,
+                        'prediction_id': prediction_id,
+                        'prediction': str(predictions[index]),
+                        'risk_score': float(risk_scores[index]),
+                        'model_version': model_version,
+                    }))
+                yield '\n'.join(lines) + '\n'
+        except Error as e:
+            connection.rollback()
+            yield json.dumps({'message': f'Batch failed at row {start}: {str(e)}'}) + '\n'
+        finally:
+            cursor.close()
+            connection.close()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# History pagination: keyset on (prediction_date, id), newest first, so every page is
+# an index range scan however deep the client has paged
+def encode_page_cursor(row):
+    token = f"{row['prediction_date'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(token.encode()).decode()
+
+def decode_page_cursor(token):
+    prediction_date, prediction_id = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+    return datetime.fromisoformat(prediction_date), int(prediction_id)
+
+def page_arguments(args):
+    limit = args.get('limit', Config.HISTORY_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), Config.HISTORY_MAX_PAGE_SIZE)
+    token = args.get('cursor')
+    return limit, decode_page_cursor(token) if token else None
+
+def keyset_params(after):
+    prediction_date, prediction_id = after
+    return (prediction_date, prediction_date, prediction_id)
+
+def fetch_page(cursor, query, params, limit):
+    # One extra row tells us whether another page exists
+    cursor.execute(query, params + (limit + 1,))
+    rows = cursor.fetchall()
+    return page_from_rows(rows, limit)
+
+def page_from_rows(rows, limit):
+    next_cursor = encode_page_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    for row in rows:
+        format_prediction_row(row)
+    return rows, next_cursor
+
+def format_prediction_row(row):
+    row['prediction_date'] = row['prediction_date'].isoformat() if row['prediction_date'] else ''
+    return row
+
+def stream_ndjson(connection, cursor, query, params):
+    # Rows are read from the unbuffered server-side cursor in small chunks and written
+    # out as they arrive, so memory stays flat regardless of the result size
+    def generate():
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(Config.HISTORY_STREAM_CHUNK_SIZE)
+                if not rows:
+                    break
+                yield ''.join(json.dumps(format_prediction_row(row), default=str) + '\n' for row in rows)
+        finally:
+            try:
+                cursor.close()
+                connection.close()
+            except Error:
+                # The client went away mid-stream and left unread rows behind
+                connection.invalidate()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/user/predictions', methods=['GET'])
+@login_or_token_required
 def get_user_predictions():
+    try:
+        limit, after = page_arguments(request.args)
+    except ValueError:
+        flash('Invalid page cursor', 'error')
+        return redirect(url_for('get_user_predictions'))
     connection = create_connection()
     if not connection:
         flash('Database connection error', 'error')
         return render_template('history.html', predictions=[])
     cursor = connection.cursor(dictionary=True)
+    
+    if request.args.get('format') == 'ndjson':
+        return stream_ndjson(connection, cursor, queries.USER_PREDICTIONS, (g.user_id,))
+    
     try:
-        cursor.execute("""
-            SELECT p.* FROM predictions p
-            JOIN user_predictions up ON p.id = up.prediction_id
-            WHERE up.user_id = %s
-            ORDER BY p.prediction_date DESC
-        """, (session.get('user_id'),))
-        predictions = cursor.fetchall()
-        for prediction in predictions:
-            prediction['prediction_date'] = prediction['prediction_date'].isoformat() if prediction['prediction_date'] else ''
-        return render_template('history.html', predictions=predictions)
+        if after:
+            query, params = queries.USER_PREDICTIONS_PAGE_AFTER, (g.user_id,) + keyset_params(after)
+        else:
+            query, params = queries.USER_PREDICTIONS_PAGE, (g.user_id,)
+        predictions, next_cursor = fetch_page(cursor, query, params, limit)
+        return render_template('history.html', predictions=predictions, next_cursor=next_cursor, limit=limit)
     except Error as e:
         flash(f'Error fetching predictions: {str(e)}', 'error')
         return render_template('history.html', predictions=[])
@@ -383,35 +743,86 @@ def get_user_predictions():
         cursor.close()
         connection.close()
 
+# Export of every user's predictions: API token required
 @app.route('/predictions', methods=['GET'])
-def get_all_predictions():
+@token_required
+def get_all_predictions(current_user):
+    try:
+        limit, after = page_arguments(request.args)
+    except ValueError:
+        return jsonify({'message': 'Invalid page cursor'}), 400
     connection = create_connection()
     if not connection:
         return jsonify({'message': 'Database connection error'}), 500
     
     cursor = connection.cursor(dictionary=True)
     
+    if request.args.get('format') == 'ndjson':
+        return stream_ndjson(connection, cursor, queries.ALL_PREDICTIONS, ())
+    
     try:
-        cursor.execute("""
-            SELECT p.*, u.Name AS user_name, u.Email AS user_email
-            FROM predictions p
-            JOIN user_predictions up ON p.id = up.prediction_id
-            JOIN users u ON up.user_id = u.ID
-            ORDER BY p.prediction_date DESC
-        """)
-        predictions = cursor.fetchall()
-        
-        # Convert datetime objects to strings for JSON serialization
-        for prediction in predictions:
-            prediction['prediction_date'] = prediction['prediction_date'].isoformat() if prediction['prediction_date'] else ''
+        if after:
+            query, params = queries.ALL_PREDICTIONS_PAGE_AFTER, keyset_params(after)
+        else:
+            query, params = queries.ALL_PREDICTIONS_PAGE, ()
+        predictions, next_cursor = fetch_page(cursor, query, params, limit)
         
-        return jsonify({'predictions': predictions}), 200
+        return jsonify({'predictions': predictions, 'next_cursor': next_cursor}), 200
     except Error as e:
         return jsonify({'message': f'Error fetching predictions: {str(e)}'}), 500
     finally:
         cursor.close()
         connection.close()
 
+# Risk-level counts per day, gender or age bucket and model version over a date range. Reads only the
+# prediction_rollups table, which triggers keep current, so the cost does not grow
+# with the number of predictions.
+def analytics_range(args):
+    today = date.today()
+    end = date.fromisoformat(args['to']) if args.get('to') else today
+    start = (date.fromisoformat(args['from']) if args.get('from')
+             else end - timedelta(days=Config.ANALYTICS_DEFAULT_DAYS - 1))
+    if start > end:
+        raise ValueError('from is after to')
+    if (end - start).days >= Config.ANALYTICS_MAX_DAYS:
+        raise ValueError(f'range exceeds {Config.ANALYTICS_MAX_DAYS} days')
+    return start, end
+
+@app.route('/analytics', methods=['GET'])
+@admin_required
+def analytics():
+    by = request.args.get('by', 'day')
+    if by not in queries.ANALYTICS:
+        return jsonify({'message': f"by must be one of {', '.join(queries.ANALYTICS_DIMENSIONS)}"}), 400
+    try:
+        start, end = analytics_range(request.args)
+    except ValueError as e:
+        return jsonify({'message': f'Invalid date range: {str(e)}'}), 400
+    
+    connection = create_connection()
+    if not connection:
+        return jsonify({'message': 'Database connection error'}), 500
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(queries.ANALYTICS[by], (start, end))
+        rows = []
+        for row in cursor.fetchall():
+            predictions = int(row['predictions'])
+            rows.append({
+                by: row['bucket'].isoformat() if by == 'day' else row['bucket'],
+                # Average scores are only comparable within one model version
+                'model_version': row['model_version'],
+                'risk_level': row['risk_level'],
+                'predictions': predictions,
+                'avg_risk_score': round(float(row['risk_score_sum']) / predictions, 2),
+            })
+        return jsonify({'by': by, 'from': start.isoformat(), 'to': end.isoformat(), 'rows': rows}), 200
+    except Error as e:
+        return jsonify({'message': f'Error fetching analytics: {str(e)}'}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
 # --- Medical History ---
 @app.route('/medical_history', methods=['GET', 'POST'])
 @login_required
@@ -443,41 +854,74 @@ def medical_history():
         except Error as e:
             connection.rollback()
             flash(f'Error: {str(e)}', 'error')
-    cursor.execute("SELECT * FROM medical_history WHERE user_id = %s", (user_id,))
-    history = cursor.fetchone()
-    cursor.close()
-    connection.close()
+    try:
+        cursor.execute(queries.MEDICAL_HISTORY_BY_USER, (user_id,))
+        history = cursor.fetchone()
+    finally:
+        cursor.close()
+        connection.close()
     return render_template('medical_history.html', history=history)
 
+# --- Reference data (symptoms, recommendations) ---
+def load_reference_rows(table):
+    connection = create_connection()
+    if not connection:
+        raise Error(msg='Database connection error')
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(queries.REFERENCE_ROWS[table])
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        connection.close()
+
+def load_reference_versions(tables):
+    connection = create_connection()
+    if not connection:
+        raise Error(msg='Database connection error')
+    cursor = connection.cursor()
+    try:
+        cursor.execute(queries.REFERENCE_VERSIONS, tuple(tables))
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+        connection.close()
+
+reference_cache = ReferenceCache(queries.REFERENCE_ROWS, load_reference_rows, load_reference_versions,
+                                 ttl=Config.REFERENCE_CACHE_TTL,
+                                 check_interval=Config.REFERENCE_CACHE_CHECK_INTERVAL)
+
+# Serves a reference page from cached rows and cached HTML, answering conditional
+# requests with 304 so repeat views touch neither MySQL nor Jinja
+def reference_page(table, template):
+    try:
+        if session.get('_flashes'):
+            # Pending flash messages make this render unique; don't cache it
+            return render_template(template, **{table: reference_cache.page(table).rows})
+        page = reference_cache.rendered(table, lambda rows: render_template(template, **{table: rows}))
+    except Error:
+        flash('Database connection error', 'error')
+        return render_template(template, **{table: []})
+    
+    response = make_response(page.html)
+    response.set_etag(page.etag)
+    response.last_modified = page.last_modified
+    # The pages sit behind login: browsers may keep them but must revalidate
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 # --- Symptoms ---
 @app.route('/symptoms')
 @login_required
 def symptoms():
-    connection = create_connection()
-    if not connection:
-        flash('Database connection error', 'error')
-        return render_template('symptoms.html', symptoms=[])
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM symptoms")
-    symptoms = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    return render_template('symptoms.html', symptoms=symptoms)
+    return reference_page('symptoms', 'symptoms.html')
 
 # --- Recommendations ---
 @app.route('/recommendations')
 @login_required
 def recommendations():
-    connection = create_connection()
-    if not connection:
-        flash('Database connection error', 'error')
-        return render_template('recommendations.html', recommendations=[])
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM recommendations")
-    recommendations = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    return render_template('recommendations.html', recommendations=recommendations)
+    return reference_page('recommendations', 'recommendations.html')
 
 # --- User Feedback ---
 @app.route('/feedback', methods=['GET', 'POST'])
@@ -501,11 +945,166 @@ def feedback():
         except Error as e:
             connection.rollback()
             flash(f'Error: {str(e)}', 'error')
-    cursor.execute("SELECT f.*, p.prediction FROM user_feedback f LEFT JOIN predictions p ON f.prediction_id = p.id WHERE f.user_id = %s ORDER BY f.created_at DESC", (user_id,))
-    feedbacks = cursor.fetchall()
-    cursor.close()
-    connection.close()
+    try:
+        cursor.execute(queries.USER_FEEDBACK, (user_id,))
+        feedbacks = cursor.fetchall()
+    finally:
+        cursor.close()
+        connection.close()
     return render_template('feedback.html', feedbacks=feedbacks)
 
+# --- Pool metrics ---
+@app.route('/pool/stats', methods=['GET'])
+@admin_required
+def pool_stats():
+    return jsonify(db_pool.stats()), 200
+
+# --- Prediction scheduler and cache metrics ---
+@app.route('/predict/stats', methods=['GET'])
+@admin_required
+def predict_stats():
+    return jsonify({
+        'batching': prediction_batcher.stats() if prediction_batcher else None,
+        'cache': prediction_cache.stats() if prediction_cache else None,
+    }), 200
+
+# --- Prometheus metrics ---
+def collect_app_metrics():
+    pool = db_pool.stats()
+    metrics = [
+        ('db_pool_connections', 'gauge', 'Pooled MySQL connections by state',
+         [({'state': 'idle'}, pool['idle']), ({'state': 'in_use'}, pool['in_use'])]),
+        ('db_pool_events_total', 'counter', 'Connection pool events',
+         [({'event': event}, count) for event, count in pool['counters'].items()]),
+        ('db_pool_wait_seconds', 'histogram', 'Time to check out a pooled connection', [({}, pool['wait_seconds'])]),
+        ('db_pool_checkout_seconds', 'histogram', 'Time a connection stays checked out',
+         [({}, pool['checkout_seconds'])]),
+    ]
+    if prediction_batcher:
+        batching = prediction_batcher.stats()
+        metrics += [
+            ('predict_batch_size', 'histogram', 'Rows per micro-batch scoring call', [({}, batching['batch_size'])]),
+            ('predict_queue_wait_seconds', 'histogram', 'Time a prediction waits for its micro-batch',
+             [({}, batching['queue_wait_seconds'])]),
+        ]
+    hashing = password_hasher.stats()
+    metrics += [
+        ('password_hash_seconds', 'histogram', 'Time to hash or check a password, including queueing',
+         [({}, hashing['seconds'])]),
+        ('password_hash_events_total', 'counter', 'Password hashing events (verified, rehashed, rejected, ...)',
+         [({'event': event}, count) for event, count in hashing['counters'].items()]),
+    ]
+    caches = [('prediction', prediction_cache.stats() if prediction_cache else None),
+              ('reference', reference_cache.stats()),
+              ('user_version', user_versions.stats())]
+    metrics.append(('cache_events_total', 'counter', 'Cache events (hits, misses, reloads, ...) by cache',
+                    [({'cache': cache, 'event': event}, count)
+                     for cache, stats in caches if stats for event, count in stats['counters'].items()]))
+    return metrics
+
+instrumentation.registry.register(collect_app_metrics)
+
+@app.route('/metrics', methods=['GET'])
+@admin_required
+def metrics():
+    return Response(instrumentation.registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Sampling profiler, switched on per call: GET /debug/profile?seconds=10 returns
+# collapsed stacks for flame graph tools
+@app.route('/debug/profile', methods=['GET'])
+@admin_required
+def debug_profile():
+    seconds = min(max(request.args.get('seconds', 10, type=float), 0.1), 60)
+    interval = request.args.get('interval_ms', 5, type=float) / 1000.0
+    try:
+        samples = sample_stacks(seconds, max(interval, 0.001))
+    except ProfilerBusy as e:
+        return jsonify({'message': str(e)}), 409
+    return Response(collapsed(samples), mimetype='text/plain')
+
+# --- Query statistics ---
+# Top statements by fingerprint: sort by total_seconds (default), max_seconds,
+# mean_seconds, count or slow_count
+@app.route('/admin/queries', methods=['GET', 'DELETE'])
+@admin_required
+def admin_queries():
+    if request.method == 'DELETE':
+        query_log.reset()
+        return jsonify({'message': 'Query statistics reset'}), 200
+    sort = request.args.get('sort', 'total_seconds')
+    if sort not in ('total_seconds', 'max_seconds', 'mean_seconds', 'count', 'slow_count'):
+        return jsonify({'message': f'Cannot sort by {sort}'}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 500)
+    return jsonify({
+        'slow_threshold_seconds': query_log.slow_threshold,
+        'queries': query_log.top(limit, sort),
+    }), 200
+
+# --- Readiness ---
+# Set to this process's pid once its pool, caches and model are warm; a copy
+# inherited across fork() does not count
+worker_state = {'ready_pid': None, 'error': None}
+_warm_lock = threading.Lock()
+
+def warm_worker(wait=True):
+    """Open this process's pooled connections and load its caches; True once ready."""
+    if not _warm_lock.acquire(blocking=wait):
+        return False
+    try:
+        if worker_state['ready_pid'] == os.getpid():
+            return True
+        db_pool.warm()
+        for table in queries.REFERENCE_ROWS:
+            reference_cache.page(table)
+        if Config.PREDICTION_ENGINE == 'model':
+            inference_engine.load()
+            # The master preloaded the model once and does not follow promotions, so a
+            # worker forked since serves the current version from its first request
+            if inference_engine.is_stale():
+                try:
+                    inference_engine.reload()
+                except Exception as e:
+                    # The other workers' watchers keep the old model too (model/inference.py)
+                    print(f"Serving the preloaded model {inference_engine.version}; the current one failed to load: {e}")
+            if Config.MODEL_WATCH_INTERVAL > 0:
+                inference_engine.watch(Config.MODEL_WATCH_INTERVAL)
+        worker_state.update(ready_pid=os.getpid(), error=None)
+        return True
+    except Exception as e:
+        worker_state['error'] = str(e)
+        return False
+    finally:
+        _warm_lock.release()
+
+# Load balancers route to a worker only after this returns 200. A worker that is
+# still warming (serve.py starts that on fork) answers 503 without waiting.
+@app.route('/ready', methods=['GET'])
+def ready():
+    if worker_state['ready_pid'] == os.getpid() or warm_worker(wait=False):
+        return jsonify({'status': 'ready', 'pid': os.getpid()}), 200
+    return jsonify({'status': 'warming', 'pid': os.getpid(), 'error': worker_state['error']}), 503
+
+# Load the model before any worker forks so the pages are shared copy-on-write. The
+# watcher for newly promoted versions is started per serving process (warm_worker,
+# asgi.py, __main__ below), never here: under serve.py this runs in the master, which
+# serves nothing and must not fork workers while a thread holds a lock.
+if Config.PREDICTION_ENGINE == 'model':
+    inference_engine.load()
+
+# Warm the reference data so the first page views don't wait on MySQL
+if Config.WARM_CACHES_ON_START:
+    try:
+        reference_cache.warm()
+    except Error as e:
+        print(f"Reference cache not warmed: {e}")
+
 if __name__ == '__main__':
+    # Fork the hashing processes before any thread starts; on failure the pool is
+    # started through the forkserver on first use (password_hashing.py)
+    try:
+        password_hasher.start()
+    except Exception as e:
+        print(f"Password hashing pool not started: {e!r}")
+    if Config.PREDICTION_ENGINE == 'model' and Config.MODEL_WATCH_INTERVAL > 0:
+        inference_engine.watch(Config.MODEL_WATCH_INTERVAL)
     app.run(host='0.0.0.0', port=5050, debug=True)
\ No newline at end of file
@@ -0,0 +1,325 @@
+# asgi.py
+# Async serving mode:
+#     hypercorn asgi:application --bind 0.0.0.0:5050 --workers 2
+#
+# The high-traffic routes (/predict, prediction history, symptoms, recommendations)
+# are Quart coroutines on an aiomysql pool, so a request waiting on MySQL or a slow
+# client holds a coroutine instead of a thread. Every other route is the Flask view
+# from app.py, served through asgiref's WSGI adapter on a pool of ASYNC_WSGI_THREADS
+# threads. Both apps use the same secret
+# key and templates, so a session cookie set by one is valid in the other.
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import wraps
+
+import aiomysql
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from mysql.connector import Error
+from quart import Quart, Response, flash, g, jsonify, make_response, redirect, render_template, request, session, url_for
+
+import queries
+from app import app as flask_app
+from app import (authenticate_token, format_prediction_row, inference_engine, keyset_params, observe_statement, page_arguments,
+                 page_from_rows, prediction_batcher, prediction_cache, prepare_submission, reference_cache,
+                 score_submissions)
+from config import Config
+from risk_scoring import normalize_record
+
+aio_app = Quart(__name__, static_folder='static', template_folder='templates')
+aio_app.secret_key = flask_app.secret_key
+
+# aiomysql pool, opened once the worker's event loop is running
+db_pool = None
+
+# Errors that mean the database could not serve a request
+DB_ERRORS = (aiomysql.Error, asyncio.TimeoutError)
+
+@aio_app.before_serving
+async def open_pool():
+    global db_pool
+    connect_args = dict(Config.DB_CONFIG)
+    connect_args['db'] = connect_args.pop('database')
+    # Autocommit on: aiomysql closes connections released mid-transaction, so writes
+    # open their transaction explicitly
+    db_pool = await aiomysql.create_pool(minsize=1,
+                                         maxsize=Config.DB_POOL_SIZE + Config.DB_POOL_MAX_OVERFLOW,
+                                         pool_recycle=Config.DB_POOL_RECYCLE,
+                                         autocommit=True, **connect_args)
+    # Each serving process watches for newly promoted model versions itself
+    if Config.PREDICTION_ENGINE == 'model' and Config.MODEL_WATCH_INTERVAL > 0:
+        inference_engine.watch(Config.MODEL_WATCH_INTERVAL)
+
+@aio_app.after_serving
+async def close_pool():
+    db_pool.close()
+    await db_pool.wait_closed()
+
+@asynccontextmanager
+async def connection():
+    conn = await asyncio.wait_for(db_pool.acquire(), Config.DB_POOL_TIMEOUT)
+    try:
+        yield conn
+    finally:
+        db_pool.release(conn)
+
+# Statements are timed and fingerprinted into the same query log as app.py's
+async def execute(cursor, query, params):
+    started = time.perf_counter()
+    try:
+        await cursor.execute(query, params)
+    finally:
+        observe_statement(query, params, time.perf_counter() - started)
+
+# Same policy as CORS(app) in app.py
+@aio_app.after_request
+async def allow_cross_origin(response):
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    return response
+
+def login_required(f):
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return redirect(url_for('login'))
+        return await f(*args, **kwargs)
+    return decorated_function
+
+# app.py's token check (a cached version lookup) runs in a thread, off the event loop
+def token_required(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        current_user, error = await asyncio.to_thread(authenticate_token, request.headers.get('x-access-token'))
+        if error:
+            return jsonify({'message': error}), 401
+        return await f(current_user, *args, **kwargs)
+    return decorated
+
+def login_or_token_required(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        if 'x-access-token' in request.headers:
+            current_user, error = await asyncio.to_thread(authenticate_token, request.headers['x-access-token'])
+            if error:
+                return jsonify({'message': error}), 401
+            g.user_id = current_user['id']
+        elif 'user_id' in session:
+            g.user_id = session['user_id']
+        else:
+            return redirect(url_for('login'))
+        return await f(*args, **kwargs)
+    return decorated
+
+# Scoring: the result cache and micro-batcher are the ones app.py uses; a batch is
+# awaited without blocking the event loop
+async def assess_risk(record):
+    item, key = prepare_submission(record)
+
+    if prediction_cache:
+        result = prediction_cache.get(key)
+        if result is not None:
+            return result
+
+    if prediction_batcher:
+        future = asyncio.wrap_future(prediction_batcher.submit(item))
+        result = await asyncio.wait_for(future, Config.PREDICT_TIMEOUT)
+    elif Config.PREDICTION_ENGINE == 'model':
+        result = (await asyncio.to_thread(score_submissions, [item]))[0]
+    else:
+        result = score_submissions([item])[0]
+
+    if prediction_cache:
+        prediction_cache.put(key, result)
+    return result
+
+async def save_prediction(user_id, record, prediction_result):
+    async with connection() as conn:
+        async with conn.cursor() as cursor:
+            await conn.begin()
+            try:
+                await execute(
+                    cursor,
+                    "CALL record_prediction(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, @prediction_id)",
+                    (user_id, record['age'], record['gender'], record['smoking'],
+                     record['cough'], record['chest_pain'], record['fatigue'],
+                     record['shortness_of_breath'], prediction_result["prediction"],
+                     prediction_result["risk_score"], prediction_result.get("model_version"))
+                )
+                # CALL ends with an extra status result; drain it before committing
+                while await cursor.nextset():
+                    pass
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+
+@aio_app.route('/predict', methods=['GET', 'POST'])
+@login_required
+async def predict():
+    user_id = session.get('user_id')
+    if request.method == 'GET':
+        return await render_template('predict.html', user_id=user_id)
+
+    form = await request.form
+    data = form if form else await request.get_json(silent=True)
+
+    try:
+        record = normalize_record(data)
+        prediction_result = await assess_risk(record)
+        await save_prediction(user_id, record, prediction_result)
+
+        return await render_template('result.html',
+                                     prediction=prediction_result["prediction"],
+                                     risk_score=prediction_result["risk_score"],
+                                     timestamp=datetime.now().isoformat())
+    except Exception as e:
+        await flash(f'Error processing prediction: {str(e)}', 'error')
+        return await render_template('predict.html', user_id=user_id)
+
+# Prediction history, paged and streamed exactly as in app.py
+async def fetch_page(query, params, limit):
+    async with connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            # One extra row tells us whether another page exists
+            await execute(cursor, query, params + (limit + 1,))
+            rows = list(await cursor.fetchall())
+    return page_from_rows(rows, limit)
+
+def stream_ndjson(query, params):
+    async def generate():
+        async with connection() as conn:
+            cursor = await conn.cursor(aiomysql.SSDictCursor)
+            finished = False
+            try:
+                await execute(cursor, query, params)
+                while True:
+                    rows = await cursor.fetchmany(Config.HISTORY_STREAM_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    yield ''.join(json.dumps(format_prediction_row(row), default=str) + '\n' for row in rows)
+                await cursor.close()
+                finished = True
+            finally:
+                if not finished:
+                    # The client went away mid-stream; drop the connection rather
+                    # than read the rest of the result off it
+                    conn.close()
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@aio_app.route('/user/predictions', methods=['GET'])
+@login_or_token_required
+async def get_user_predictions():
+    try:
+        limit, after = page_arguments(request.args)
+    except ValueError:
+        await flash('Invalid page cursor', 'error')
+        return redirect(url_for('get_user_predictions'))
+    user_id = g.user_id
+
+    if request.args.get('format') == 'ndjson':
+        return stream_ndjson(queries.USER_PREDICTIONS, (user_id,))
+
+    if after:
+        query, params = queries.USER_PREDICTIONS_PAGE_AFTER, (user_id,) + keyset_params(after)
+    else:
+        query, params = queries.USER_PREDICTIONS_PAGE, (user_id,)
+    try:
+        predictions, next_cursor = await fetch_page(query, params, limit)
+    except DB_ERRORS as e:
+        await flash(f'Error fetching predictions: {str(e)}', 'error')
+        return await render_template('history.html', predictions=[])
+    return await render_template('history.html', predictions=predictions, next_cursor=next_cursor, limit=limit)
+
+@aio_app.route('/predictions', methods=['GET'])
+@token_required
+async def get_all_predictions(current_user):
+    try:
+        limit, after = page_arguments(request.args)
+    except ValueError:
+        return jsonify({'message': 'Invalid page cursor'}), 400
+
+    if request.args.get('format') == 'ndjson':
+        return stream_ndjson(queries.ALL_PREDICTIONS, ())
+
+    if after:
+        query, params = queries.ALL_PREDICTIONS_PAGE_AFTER, keyset_params(after)
+    else:
+        query, params = queries.ALL_PREDICTIONS_PAGE, ()
+    try:
+        predictions, next_cursor = await fetch_page(query, params, limit)
+    except DB_ERRORS as e:
+        return jsonify({'message': f'Error fetching predictions: {str(e)}'}), 500
+    return jsonify({'predictions': predictions, 'next_cursor': next_cursor}), 200
+
+# Reference pages share app.py's cache. A version check or reload happens at most
+# every REFERENCE_CACHE_CHECK_INTERVAL seconds and runs in a thread, off the event loop.
+async def reference_page(table, template):
+    try:
+        page = await asyncio.to_thread(reference_cache.page, table)
+        if session.get('_flashes'):
+            # Pending flash messages make this render unique; don't cache it
+            return await render_template(template, **{table: page.rows})
+        if page.html is None:
+            reference_cache.store_html(page, await render_template(template, **{table: page.rows}))
+    except Error:
+        await flash('Database connection error', 'error')
+        return await render_template(template, **{table: []})
+
+    not_modified = (request.if_none_match.contains_weak(page.etag) if request.if_none_match
+                    else request.if_modified_since is not None and page.last_modified <= request.if_modified_since)
+    response = await make_response(('', 304) if not_modified else page.html)
+    response.set_etag(page.etag)
+    response.last_modified = page.last_modified
+    # The pages sit behind login: browsers may keep them but must revalidate
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@aio_app.route('/symptoms')
+@login_required
+async def symptoms():
+    return await reference_page('symptoms', 'symptoms.html')
+
+@aio_app.route('/recommendations')
+@login_required
+async def recommendations():
+    return await reference_page('recommendations', 'recommendations.html')
+
+# Flask-only endpoints are registered here without a view so url_for() in the shared
+# templates resolves; requests for them are routed to Flask below
+for rule in flask_app.url_map.iter_rules():
+    if rule.endpoint not in aio_app.view_functions:
+        aio_app.add_url_rule(rule.rule, endpoint=rule.endpoint, methods=rule.methods)
+
+ASYNC_PATHS = {'/predict', '/user/predictions', '/predictions', '/symptoms', '/recommendations'}
+
+# asgiref runs every WSGI request, streamed body included, on one shared thread per
+# process (sync_to_async's default thread_sensitive=True), so one slow /login or
+# /predict/batch stream would hold up all other Flask routes. Run them on a pool.
+wsgi_executor = ThreadPoolExecutor(max_workers=Config.ASYNC_WSGI_THREADS, thread_name_prefix='wsgi')
+
+class PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+    # The adapter's own run_wsgi_app, without its sync_to_async wrapper
+    _run_wsgi_app = vars(WsgiToAsgiInstance)['run_wsgi_app'].func
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run_wsgi_app, thread_sensitive=False, executor=wsgi_executor)(body)
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiToAsgiInstance(self.wsgi_application)(scope, receive, send)
+
+flask_asgi = PooledWsgiToAsgi(flask_app)
+
+async def application(scope, receive, send):
+    # Lifespan events go to Quart so the pool opens and closes with the worker;
+    # CORS preflights go to Flask, whose flask_cors extension answers them
+    if scope['type'] == 'http' and (scope['path'] not in ASYNC_PATHS or scope['method'] == 'OPTIONS'):
+        await flask_asgi(scope, receive, send)
+    else:
+        await aio_app(scope, receive, send)
@@ -0,0 +1,50 @@
+# auth_cache.py
+# In-process cache of users' version_control numbers for token validation
+import threading
+import time
+
+
+class UserVersionCache:
+    """Maps user_id -> current version_number with a TTL.
+
+    API tokens carry the user's fields and the version they were issued at, so a
+    cache hit authenticates a request without touching the database. Changes made
+    by this process invalidate the entry immediately; other processes pick up the
+    bumped version from version_control once their entry expires.
+    """
+
+    def __init__(self, ttl=60, maxsize=100000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}  # user_id -> (expires_at, version)
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < now:
+                self.counters['misses'] += 1
+                return None
+            self.counters['hits'] += 1
+            return entry[1]
+
+    def put(self, user_id, version):
+        with self._lock:
+            if len(self._entries) >= self.maxsize:
+                # Drop expired entries first, then the oldest if still full
+                now = time.monotonic()
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[0] >= now}
+                if len(self._entries) >= self.maxsize:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[user_id] = (time.monotonic() + self.ttl, version)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self.counters['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'ttl_seconds': self.ttl, 'counters': dict(self.counters)}
@@ -0,0 +1,360 @@
+"""Incremental backups and point-in-time restore for lung_cancer_db.
+
+    python backup.py create [--dir backups/]
+    python backup.py restore [--until '2026-10-01 12:00:00'] [--dir backups/]
+    python backup.py list
+
+create copies the rows of BACKUP_TABLES whose updated_at lies after the previous
+run's mark, up to NOW() minus BACKUP_SAFETY_LAG, plus the deletes recorded in
+backup_tombstones. It reads and writes BACKUP_CHUNK_SIZE rows at a time, so the
+first run is a full copy and later runs cost as much as the changes since. Rows
+are stored in backup_rows, or with --dir as one gzip-compressed NDJSON file per run.
+
+restore replays complete runs oldest first, skipping every change made after
+--until. Run it against a database freshly created from database/lung_cancer_db.sql
+and migrate.py to rebuild the tables as they were at that time.
+"""
+import argparse
+import glob
+import gzip
+import itertools
+import json
+import os
+import time
+from datetime import datetime
+
+import mysql.connector
+
+from config import Config
+
+# Parents before children, so foreign keys hold while restoring; user_predictions
+# links each prediction to its user
+BACKUP_TABLES = ('users', 'medical_history', 'predictions', 'user_predictions')
+
+
+def connect():
+    return mysql.connector.connect(**Config.DB_CONFIG, autocommit=False)
+
+
+def keyset_chunks(connection, table, mark_column, since, until, chunk_size):
+    """Yield lists of rows with since < mark_column <= until in (mark_column, id) order."""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        after = None
+        while True:
+            conditions, params = [f"{mark_column} <= %s"], [until]
+            if since is not None:
+                conditions.append(f"{mark_column} > %s")
+                params.append(since)
+            if after is not None:
+                conditions.append(f"({mark_column} > %s OR ({mark_column} = %s AND id > %s))")
+                params += [after[0], after[0], after[1]]
+            cursor.execute(
+                f"SELECT * FROM {table} WHERE {' AND '.join(conditions)} "
+                f"ORDER BY {mark_column}, id LIMIT %s",
+                (*params, chunk_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            yield rows
+            after = (rows[-1][mark_column], rows[-1]['id'])
+    finally:
+        cursor.close()
+
+
+class TableSink:
+    """Writes a run's records to backup_rows, committing each chunk."""
+
+    location = None
+
+    def __init__(self, connection, run_id):
+        self.connection = connection
+        self.run_id = run_id
+
+    def write(self, records):
+        cursor = self.connection.cursor()
+        try:
+            cursor.executemany("""
+                INSERT INTO backup_rows (run_id, table_name, record_id, operation, changed_at, row_data)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, [(self.run_id, table, record_id, operation, changed_at,
+                   json.dumps(row, default=str) if row is not None else None)
+                  for table, record_id, operation, changed_at, row in records])
+            self.connection.commit()
+        finally:
+            cursor.close()
+
+    def close(self):
+        pass
+
+    def discard(self):
+        pass
+
+
+class FileSink:
+    """Streams a run's records to a gzip-compressed NDJSON file.
+
+    The first line describes the run. The file is renamed into place only once the
+    run completes, so a crashed run never leaves a file that looks usable.
+    """
+
+    def __init__(self, directory, run_id, since, until):
+        os.makedirs(directory, exist_ok=True)
+        self.location = os.path.join(directory, f'backup-{run_id:06d}.ndjson.gz')
+        self._partial = self.location + '.partial'
+        self._file = gzip.open(self._partial, 'wt', encoding='utf-8')
+        self._file.write(json.dumps({'run': run_id, 'since': since, 'until': until}, default=str) + '\n')
+
+    def write(self, records):
+        for table, record_id, operation, changed_at, row in records:
+            self._file.write(json.dumps({
+                'table': table, 'id': record_id, 'op': operation, 'changed_at': changed_at, 'row': row,
+            }, default=str) + '\n')
+
+    def close(self):
+        self._file.close()
+        os.replace(self._partial, self.location)
+
+    def discard(self):
+        self._file.close()
+        os.remove(self._partial)
+
+
+def finish_run(connection, run_id, status, rows_written, location=None):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            UPDATE backup_runs
+            SET status = %s, rows_written = %s, location = %s, finished_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (status, rows_written, location, run_id))
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+def start_run(connection, lag):
+    """Insert a backup_runs row and return (run_id, since, until), or None if nothing is due."""
+    cursor = connection.cursor()
+    try:
+        # Rows of runs that never completed are never restored
+        cursor.execute("DELETE FROM backup_runs WHERE status <> 'complete'")
+        cursor.execute("SELECT MAX(until_mark) FROM backup_runs WHERE status = 'complete'")
+        since = cursor.fetchone()[0]
+        # Stop short of NOW() so rows stamped by still-open transactions fall in the next run
+        cursor.execute("SELECT NOW() - INTERVAL %s SECOND", (lag,))
+        until = cursor.fetchone()[0]
+        if since is not None and until <= since:
+            connection.commit()
+            return None
+        cursor.execute("INSERT INTO backup_runs (since_mark, until_mark) VALUES (%s, %s)", (since, until))
+        run_id = cursor.lastrowid
+        connection.commit()
+        return run_id, since, until
+    finally:
+        cursor.close()
+
+
+def create_backup(connection, directory=None, chunk_size=5000, lag=5):
+    cursor = connection.cursor()
+    try:
+        # One backup at a time: start_run() clears unfinished runs
+        cursor.execute("SELECT GET_LOCK('lung_cancer_db_backup', 0)")
+        if cursor.fetchone()[0] != 1:
+            raise SystemExit('Another backup is running')
+    finally:
+        cursor.close()
+
+    try:
+        run = start_run(connection, lag)
+        if run is None:
+            print('nothing to back up yet')
+            return
+        run_id, since, until = run
+        print(f"run {run_id}: changes after {since or 'the beginning'} up to {until}")
+
+        sink = FileSink(directory, run_id, since, until) if directory else TableSink(connection, run_id)
+        written = 0
+        started = time.monotonic()
+        try:
+            for table in BACKUP_TABLES:
+                count = 0
+                for rows in keyset_chunks(connection, table, 'updated_at', since, until, chunk_size):
+                    sink.write([(table, row['id'], 'upsert', row['updated_at'], row) for row in rows])
+                    count += len(rows)
+                print(f"  {table}: {count} changed rows")
+                written += count
+            deletes = 0
+            for rows in keyset_chunks(connection, 'backup_tombstones', 'deleted_at', since, until, chunk_size):
+                sink.write([(row['table_name'], row['record_id'], 'delete', row['deleted_at'], None)
+                            for row in rows])
+                deletes += len(rows)
+            print(f"  deletes: {deletes}")
+            written += deletes
+            sink.close()
+        except BaseException:
+            connection.rollback()
+            sink.discard()
+            finish_run(connection, run_id, 'failed', written)
+            raise
+        finish_run(connection, run_id, 'complete', written, sink.location)
+        elapsed = time.monotonic() - started
+        print(f"done: {written} rows in {elapsed:.1f}s -> {sink.location or 'backup_rows'}")
+    finally:
+        cursor = connection.cursor()
+        cursor.execute("SELECT RELEASE_LOCK('lung_cancer_db_backup')")
+        cursor.fetchall()
+        cursor.close()
+
+
+def table_records(connection, until, chunk_size):
+    """Yield (run label, records) for each complete run in backup_rows that starts before until."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT id FROM backup_runs
+            WHERE status = 'complete' AND location IS NULL AND (since_mark IS NULL OR since_mark < %s)
+            ORDER BY until_mark
+        """, (until,))
+        run_ids = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+    def records(run_id):
+        cursor = connection.cursor()
+        try:
+            after = 0
+            while True:
+                cursor.execute("""
+                    SELECT id, table_name, record_id, operation, changed_at, row_data FROM backup_rows
+                    WHERE run_id = %s AND id > %s AND changed_at <= %s
+                    ORDER BY id LIMIT %s
+                """, (run_id, after, until, chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    return
+                for _, table, record_id, operation, changed_at, row_data in rows:
+                    yield table, record_id, operation, changed_at, json.loads(row_data) if row_data else None
+                after = rows[-1][0]
+        finally:
+            cursor.close()
+
+    for run_id in run_ids:
+        yield f'run {run_id}', records(run_id)
+
+
+def file_records(directory, until):
+    """Yield (path, records) for each backup file in directory whose run starts before until."""
+    for path in sorted(glob.glob(os.path.join(directory, 'backup-*.ndjson.gz'))):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+        if header['since'] is not None and datetime.fromisoformat(header['since']) >= until:
+            continue
+
+        def records(path=path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                f.readline()
+                for line in f:
+                    record = json.loads(line)
+                    if datetime.fromisoformat(record['changed_at']) <= until:
+                        yield record['table'], record['id'], record['op'], record['changed_at'], record['row']
+
+        yield path, records()
+
+
+def upsert_statement(table, columns):
+    if table not in BACKUP_TABLES or not all(column.isidentifier() for column in columns):
+        raise ValueError(f'unexpected table or column in backup: {table}')
+    names = ', '.join(f'`{column}`' for column in columns)
+    updates = ', '.join(f'`{column}` = VALUES(`{column}`)' for column in columns if column != 'id')
+    return (f"INSERT INTO {table} ({names}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON DUPLICATE KEY UPDATE {updates}")
+
+
+def record_shape(record):
+    table, _, operation, _, row = record
+    return table, operation, tuple(row or ())
+
+
+def apply_records(connection, records, chunk_size):
+    """Replay records in order, one transaction per chunk. Returns the number applied."""
+    cursor = connection.cursor()
+    applied = 0
+    try:
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            if not chunk:
+                return applied
+            # Consecutive records of one table and shape go out as one executemany()
+            for (table, operation, columns), group in itertools.groupby(chunk, key=record_shape):
+                group = list(group)
+                if operation == 'delete':
+                    if table not in BACKUP_TABLES:
+                        raise ValueError(f'unexpected table in backup: {table}')
+                    cursor.executemany(f"DELETE FROM {table} WHERE id = %s", [(record[1],) for record in group])
+                else:
+                    cursor.executemany(upsert_statement(table, columns),
+                                       [tuple(record[4][column] for column in columns) for record in group])
+            connection.commit()
+            applied += len(chunk)
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def restore(connection, until=None, directory=None, chunk_size=5000):
+    until = until or datetime.now()
+    sources = file_records(directory, until) if directory else table_records(connection, until, chunk_size)
+    total = 0
+    started = time.monotonic()
+    for label, records in sources:
+        applied = apply_records(connection, records, chunk_size)
+        total += applied
+        print(f"{label}: {applied} changes replayed")
+    print(f"done: {total} changes up to {until} in {time.monotonic() - started:.1f}s")
+
+
+def list_runs(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT id, since_mark, until_mark, status, rows_written, location
+            FROM backup_runs ORDER BY id
+        """)
+        for run_id, since, until, status, rows_written, location in cursor.fetchall():
+            print(f"{run_id:>6}  {str(since or '-'):<19} -> {until}  {status:<8} "
+                  f"{rows_written:>10} rows  {location or 'backup_rows'}")
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental backups for lung_cancer_db')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    create = subcommands.add_parser('create', help='back up rows changed since the last run')
+    create.add_argument('--dir', default=Config.BACKUP_DIR, help='write a compressed file here instead of backup_rows')
+    create.add_argument('--chunk-size', type=int, default=Config.BACKUP_CHUNK_SIZE, help='rows per read and write')
+    restore_parser = subcommands.add_parser('restore', help='replay backups up to a point in time')
+    restore_parser.add_argument('--until', type=datetime.fromisoformat, help="e.g. '2026-10-01 12:00:00' (default: now)")
+    restore_parser.add_argument('--dir', default=Config.BACKUP_DIR, help='read backup files from here')
+    restore_parser.add_argument('--chunk-size', type=int, default=Config.BACKUP_CHUNK_SIZE, help='changes per transaction')
+    subcommands.add_parser('list', help='list backup runs')
+    args = parser.parse_args()
+
+    connection = connect()
+    try:
+        if args.command == 'create':
+            create_backup(connection, args.dir, args.chunk_size, Config.BACKUP_SAFETY_LAG)
+        elif args.command == 'restore':
+            restore(connection, args.until, args.dir, args.chunk_size)
+        else:
+            list_runs(connection)
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Load test: requests/sec and latency of the sync (WSGI) and async (ASGI) servers
+at increasing numbers of concurrent keep-alive connections.
+
+Start both servers against the same database, then point this script at them:
+
+    python app.py                                                # sync, port 5050
+    hypercorn asgi:application --bind 127.0.0.1:5051 --workers 2 # async
+    python benchmarks/bench_async_serving.py \\
+        --target sync=http://127.0.0.1:5050 --target async=http://127.0.0.1:5051 \\
+        --path /symptoms --connections 10 100 1000 --email you@example.com --password ...
+
+Each connection sends requests (GET, or --method POST with --body) back to back for
+--duration seconds. Login-only pages and /predictions need --email/--password: the
+session cookie and API token from /login are sent with every request. Thousands of
+connections need a matching `ulimit -n` on both ends.
+
+Routes the async server does not port run as Flask views behind a WSGI adapter. To
+measure them under the same load, --flask-path adds --flask-connections clients on
+such a route during every run, reported on their own row:
+
+    python benchmarks/bench_async_serving.py --target async=http://127.0.0.1:5051 \\
+        --path /predict --method POST \\
+        --body 'age=62&gender=Male&smoking=yes&cough=yes&chest_pain=no&fatigue=yes&shortness_of_breath=no' \\
+        --flask-path /login --flask-body '{"email": "you@example.com", "password": "..."}' \\
+        --connections 10 100 1000 --email you@example.com --password ...
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+
+def login_headers(base_url, email, password):
+    """Session cookie and API token header lines of one /login."""
+    request = urllib.request.Request(
+        base_url + '/login', data=json.dumps({'email': email, 'password': password}).encode(),
+        headers={'Content-Type': 'application/json'}, method='POST',
+    )
+    with urllib.request.urlopen(request) as response:
+        cookie = response.headers['Set-Cookie'].split(';', 1)[0]
+        token = json.loads(response.read())['token']
+    return f"Cookie: {cookie}\r\nx-access-token: {token}\r\n"
+
+
+async def read_response(reader):
+    """Read one HTTP response; returns (status, keep_alive)."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    version, status = lines[0].split(' ', 2)[:2]
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return int(status), False
+
+    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+    return int(status), keep_alive
+
+
+async def client(host, port, request, stop_at, latencies, failures):
+    reader = writer = None
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            status, keep_alive = await read_response(reader)
+            if status >= 400:
+                failures.append(status)
+            else:
+                latencies.append(time.perf_counter() - started)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            failures.append('io')
+            keep_alive = False
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def build_request(parts, method, path, body, login):
+    headers = f"Host: {parts.netloc}\r\nConnection: keep-alive\r\n" + (login or '')
+    payload = (body or '').encode()
+    if body is not None:
+        # JSON bodies start with { or [; anything else is sent as a form
+        content_type = 'application/json' if body.lstrip()[:1] in ('{', '[') else 'application/x-www-form-urlencoded'
+        headers += f"Content-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+    return f"{method} {path} HTTP/1.1\r\n{headers}\r\n".encode() + payload
+
+
+async def run(url, loads, duration, login):
+    """loads: (method, path, body, connections) per route, all run at once.
+
+    Returns (requests/s, latencies, failures) per load.
+    """
+    parts = urlsplit(url)
+    results = [([], []) for _ in loads]
+    started = time.perf_counter()
+    stop_at = started + duration
+    await asyncio.gather(*(client(parts.hostname, parts.port or 80, build_request(parts, method, path, body, login),
+                                  stop_at, latencies, failures)
+                           for (method, path, body, connections), (latencies, failures) in zip(loads, results)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    return [(len(latencies) / elapsed, latencies, len(failures)) for latencies, failures in results]
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    return statistics.quantiles(values, n=100)[int(fraction * 100) - 1] if len(values) > 1 else values[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', required=True, help='name=base_url, repeatable')
+    parser.add_argument('--path', default='/predictions?limit=50')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--body', help='request body; JSON if it starts with { or [, else a form')
+    parser.add_argument('--flask-path', help='Flask-served route to load alongside --path, e.g. /login')
+    parser.add_argument('--flask-method', default='POST')
+    parser.add_argument('--flask-body')
+    parser.add_argument('--flask-connections', type=int, default=10)
+    parser.add_argument('--connections', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per run')
+    parser.add_argument('--email')
+    parser.add_argument('--password')
+    args = parser.parse_args()
+
+    targets = [target.split('=', 1) for target in args.target]
+    print(f"{'server':<10} {'route':<20} {'connections':>11} {'requests/s':>11} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7}")
+    for name, url in targets:
+        login = login_headers(url, args.email, args.password) if args.email else None
+        for connections in args.connections:
+            loads = [(args.method, args.path, args.body, connections)]
+            if args.flask_path:
+                loads.append((args.flask_method, args.flask_path, args.flask_body, args.flask_connections))
+            results = asyncio.run(run(url, loads, args.duration, login))
+            for (method, path, body, clients), (throughput, latencies, failures) in zip(loads, results):
+                print(f"{name:<10} {path.split('?', 1)[0]:<20} {clients:>11} {throughput:>11.1f} "
+                      f"{percentile(latencies, 0.50) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} "
+                      f"{failures:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Per-call latency of sklearn's RandomForestClassifier vs the flattened FlatForest.
+
+Loads the model serving uses (the registry's current version, else model.pkl) and
+codes the survey rows with the shared feature encoder, so both see the float32
+input /predict sends. Checks that both give identical probabilities on every
+survey row, then times single-row and micro-batch calls and prints p50/p99
+latency per call.
+
+    python benchmarks/bench_forest_latency.py --calls 2000 --batch-sizes 1 8 32
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from model.features import FEATURE_COLUMNS, encoder as feature_encoder  # noqa: E402
+from model.forest import FlatForest  # noqa: E402
+from model.inference import engine  # noqa: E402
+from model.train import DEFAULT_DATA  # noqa: E402
+
+
+def survey_features():
+    return feature_encoder.encode(pd.read_csv(DEFAULT_DATA)[FEATURE_COLUMNS])
+
+
+def latencies(fn, batches):
+    timings = np.empty(len(batches))
+    for index, batch in enumerate(batches):
+        started = time.perf_counter()
+        fn(batch)
+        timings[index] = time.perf_counter() - started
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    args = parser.parse_args()
+
+    # load() refuses a registry version trained with a different encoder
+    model = engine.load()
+    forest = FlatForest.from_sklearn(model)
+    X = survey_features()
+    print(f'Model {engine.version}, {X.dtype} input')
+
+    if not np.array_equal(model.predict_proba(X), forest.predict_proba(X)):
+        raise SystemExit('FlatForest probabilities differ from sklearn')
+    if not np.array_equal(model.predict(X), forest.predict(X)):
+        raise SystemExit('FlatForest predictions differ from sklearn')
+    print(f'Identical predictions on {len(X)} survey rows\n')
+
+    rng = np.random.default_rng(0)
+    print(f"{'engine':<10} {'batch':>6} {'p50 (us)':>10} {'p99 (us)':>10}")
+    for batch_size in args.batch_sizes:
+        batches = [X[rng.integers(0, len(X), size=batch_size)] for _ in range(args.calls)]
+        for name, fn in (('sklearn', model.predict_proba), ('flat', forest.predict_proba)):
+            fn(batches[0])  # warm up
+            timings = latencies(fn, batches) * 1e6
+            print(f"{name:<10} {batch_size:>6} {np.percentile(timings, 50):>10.1f} {np.percentile(timings, 99):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""/predict latency on its own and during a login storm.
+
+Seed the benchmark database and start the server with bench_web_tier.py's data,
+then compare hashing on request threads with hashing on the process pool:
+
+    python benchmarks/bench_web_tier.py --concurrency 1 --duration 1   # seeds lung_cancer_bench
+    DB_NAME=lung_cancer_bench PASSWORD_HASH_WORKERS=0 python serve.py --workers 2 --bind 127.0.0.1:5099
+    python benchmarks/bench_login_storm.py --output inline.json
+    DB_NAME=lung_cancer_bench PASSWORD_HASH_WORKERS=2 python serve.py --workers 2 --bind 127.0.0.1:5099
+    python benchmarks/bench_login_storm.py --output pooled.json
+
+Phase 1 runs --predict-clients sending /predict back to back. Phase 2 adds
+--login-clients posting correct credentials to /login as fast as they are answered.
+With the pool, /predict p95 should stay close to phase 1 while surplus logins are
+answered 503 at once; with inline hashing every request thread is busy hashing.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from bench_web_tier import (Session, git_revision, route_request, succeeded, summarize,
+                            survey_records, synthetic_records)
+
+
+async def predict_client(index, target, settings, record_from, stop_at, latencies, errors):
+    rng = random.Random(settings['seed'] * 1000003 + index)
+    user_number = index % settings['users'] + 1
+    session = Session(*target)
+    logged_in = False
+    while time.perf_counter() < stop_at:
+        route = 'predict' if logged_in else 'login'
+        method, path, body, content_type = route_request(route, rng, user_number, settings['records'], 1)
+        started = time.perf_counter()
+        try:
+            status, response = await session.request(method, path, body, content_type)
+            ok = succeeded(route, status, response)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            ok = False
+        if route == 'login':
+            logged_in = ok
+        elif started >= record_from:
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors['predict'] += 1
+    session.close()
+
+
+async def login_client(index, target, settings, record_from, stop_at, latencies, outcomes):
+    rng = random.Random(index)
+    user_number = settings['users'] - index % settings['users']
+    session = Session(*target)
+    while time.perf_counter() < stop_at:
+        method, path, body, content_type = route_request('login', rng, user_number, None, 1)
+        started = time.perf_counter()
+        try:
+            status, response = await session.request(method, path, body, content_type)
+            outcome = 'ok' if succeeded('login', status, response) else str(status)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            outcome = 'io'
+        if started >= record_from:
+            outcomes[outcome] += 1
+            if outcome == 'ok':
+                latencies.append(time.perf_counter() - started)
+    session.close()
+
+
+async def run_phase(url, predict_clients, login_clients, duration, warmup, settings):
+    parts = urlsplit(url)
+    target = (parts.hostname, parts.port or 80)
+    predict_latencies, login_latencies = [], []
+    errors, outcomes = Counter(), Counter()
+    record_from = time.perf_counter() + warmup
+    stop_at = record_from + duration
+    await asyncio.gather(
+        *(predict_client(index, target, settings, record_from, stop_at, predict_latencies, errors)
+          for index in range(predict_clients)),
+        *(login_client(index, target, settings, record_from, stop_at, login_latencies, outcomes)
+          for index in range(login_clients)),
+    )
+    phase = {'predict': summarize(predict_latencies, errors['predict'], duration)}
+    if login_clients:
+        phase['login'] = summarize(login_latencies, sum(outcomes.values()) - outcomes['ok'], duration)
+        phase['login']['outcomes'] = dict(outcomes)
+    return phase
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5099')
+    parser.add_argument('--users', type=int, default=200, help='users seeded by bench_web_tier.py')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--predict-clients', type=int, default=8)
+    parser.add_argument('--login-clients', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds per phase')
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    settings = {
+        'seed': args.seed,
+        'users': args.users,
+        'records': synthetic_records(survey_records(), 1000, np.random.default_rng(args.seed + 1)),
+    }
+    url = args.url.rstrip('/')
+    phases = {}
+    for name, login_clients in (('baseline', 0), ('login_storm', args.login_clients)):
+        phases[name] = asyncio.run(run_phase(url, args.predict_clients, login_clients,
+                                             args.duration, args.warmup, settings))
+
+    print(f"{'phase':<12} {'route':<8} {'requests/s':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}",
+          file=sys.stderr)
+    for name, phase in phases.items():
+        for route, stats in phase.items():
+            print(f"{name:<12} {route:<8} {stats['throughput']:>11.1f} {stats.get('p50_ms', float('nan')):>9.1f} "
+                  f"{stats.get('p95_ms', float('nan')):>9.1f} {stats.get('p99_ms', float('nan')):>9.1f} "
+                  f"{stats['errors']:>7}", file=sys.stderr)
+        if 'login' in phase:
+            print(f"{'':<12} login outcomes: {phase['login']['outcomes']}", file=sys.stderr)
+
+    commit, dirty = git_revision()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'predict_clients': args.predict_clients,
+        'login_clients': args.login_clients,
+        'duration': args.duration,
+        'phases': phases,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Throughput of concurrent single-row predictions with and without micro-batching.
+
+Each client thread scores /predict-style submissions in a loop, either calling the
+model directly (one predict_proba per request) or through MicroBatcher.
+
+    python benchmarks/bench_micro_batching.py --clients 1 16 64 --duration 5
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from model.batching import MicroBatcher  # noqa: E402
+from model.features import encoder  # noqa: E402
+from model.inference import InferenceEngine  # noqa: E402
+
+SAMPLE = {
+    'age': 58, 'gender': 'Male', 'smoking': 'yes', 'cough': 'yes',
+    'chest_pain': 'no', 'fatigue': 'yes', 'shortness_of_breath': 'no',
+}
+
+
+def run(score, clients, duration):
+    completed = [0] * clients
+    stop = threading.Event()
+    item = encoder.encode_record(SAMPLE)
+
+    def worker(index):
+        while not stop.is_set():
+            score(item)
+            completed[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(completed) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per run')
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    engine = InferenceEngine()
+    engine.load()
+
+    def direct(item):
+        return engine.predict_proba(item)[0]
+
+    batcher = MicroBatcher(lambda items: engine.predict_proba(np.vstack(items)),
+                           max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000.0)
+
+    print(f"{'clients':>8} {'direct/s':>12} {'batched/s':>12} {'gain':>8}")
+    for clients in args.clients:
+        direct_rate = run(direct, clients, args.duration)
+        batched_rate = run(batcher, clients, args.duration)
+        print(f"{clients:>8} {direct_rate:>12.0f} {batched_rate:>12.0f} {batched_rate / direct_rate:>7.2f}x")
+
+    stats = batcher.stats()
+    mean_batch = stats['batch_size']['sum'] / max(stats['batch_size']['count'], 1)
+    mean_wait = stats['queue_wait_seconds']['sum'] / max(stats['queue_wait_seconds']['count'], 1)
+    print(f"\nmean batch size {mean_batch:.1f}, mean queue wait {mean_wait * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Predictions/sec through the prediction write path at increasing client counts.
+
+Compares the old path (global EXCLUSIVE row in lock_management around every
+prediction) with the current lock-free path used by /predict.
+
+    python benchmarks/bench_predict_concurrency.py --clients 1 8 64 --duration 10
+
+Requires the lung_cancer_db schema and the credentials in config.Config.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import acquire_lock, db_pool, predict_lung_cancer_risk, release_lock, save_prediction  # noqa: E402
+
+SAMPLE = {
+    'age': 58, 'gender': 'Male', 'smoking': 'yes', 'cough': 'yes',
+    'chest_pain': 'no', 'fatigue': 'yes', 'shortness_of_breath': 'no',
+}
+
+
+def score(data):
+    return predict_lung_cancer_risk(
+        int(data['age']), data['gender'], data['smoking'], data['cough'],
+        data['chest_pain'], data['fatigue'], data['shortness_of_breath'],
+    )
+
+
+def global_lock_prediction(connection, cursor, user_id):
+    # The pre-change /predict flow: every step commits on its own
+    if not acquire_lock(connection, cursor, 'predictions', 0, 'EXCLUSIVE', user_id):
+        connection.rollback()
+        return False
+    try:
+        save_prediction(connection, cursor, user_id, SAMPLE, score(SAMPLE))
+        connection.commit()
+    finally:
+        release_lock(connection, cursor, 'predictions', 0, user_id)
+        connection.commit()
+    return True
+
+
+def lock_free_prediction(connection, cursor, user_id):
+    save_prediction(connection, cursor, user_id, SAMPLE, score(SAMPLE))
+    connection.commit()
+    return True
+
+
+MODES = {
+    'global-lock': global_lock_prediction,
+    'lock-free': lock_free_prediction,
+}
+
+
+def create_bench_user():
+    connection = db_pool.connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
+            ('Benchmark User', f'bench-{uuid.uuid4().hex}@example.com', 'x'),
+        )
+        user_id = cursor.lastrowid
+        connection.commit()
+        return user_id
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def run(mode, clients, duration, user_id):
+    write = MODES[mode]
+    completed = [0] * clients
+    busy = [0] * clients
+    stop = threading.Event()
+
+    def worker(index):
+        while not stop.is_set():
+            connection = db_pool.connection()
+            cursor = connection.cursor()
+            try:
+                if write(connection, cursor, user_id):
+                    completed[index] += 1
+                else:
+                    busy[index] += 1
+            finally:
+                cursor.close()
+                connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return sum(completed) / elapsed, sum(busy) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 64])
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per run')
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['global-lock', 'lock-free'])
+    args = parser.parse_args()
+
+    # Every client holds one connection for the whole run
+    db_pool.size = max(db_pool.size, max(args.clients))
+    user_id = create_bench_user()
+
+    print(f"{'mode':<12} {'clients':>8} {'predictions/s':>14} {'busy/s':>10}")
+    for mode in args.modes:
+        for clients in args.clients:
+            throughput, rejected = run(mode, clients, args.duration, user_id)
+            print(f"{mode:<12} {clients:>8} {throughput:>14.1f} {rejected:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Scalar vs vectorized rule-based risk scoring.
+
+Scores the same synthetic patients with the original per-row if/elif scorer and
+with risk_scoring.score_batch(), checks that both agree, and prints rows/sec.
+
+    python benchmarks/bench_risk_scoring.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from risk_scoring import SYMPTOM_FIELDS, score_batch  # noqa: E402
+
+
+def scalar_risk(age, gender, smoking, cough, chest_pain, fatigue, shortness_of_breath):
+    # The original branch-per-factor scorer from app.py, kept as the baseline
+    risk_score = 0
+    if age < 40:
+        risk_score += 1
+    elif 40 <= age < 50:
+        risk_score += 2
+    elif 50 <= age < 60:
+        risk_score += 3
+    else:
+        risk_score += 4
+    if gender == 'Male':
+        risk_score += 2
+    else:
+        risk_score += 1
+    if smoking == 'yes':
+        risk_score += 5
+    if cough == 'yes':
+        risk_score += 2
+    if chest_pain == 'yes':
+        risk_score += 3
+    if fatigue == 'yes':
+        risk_score += 1
+    if shortness_of_breath == 'yes':
+        risk_score += 3
+    return float(risk_score)
+
+
+def synthetic_columns(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    columns = {
+        'age': rng.integers(18, 90, size=rows),
+        'gender': rng.choice(np.array(['Male', 'Female']), size=rows),
+    }
+    for field in SYMPTOM_FIELDS:
+        columns[field] = rng.choice(np.array(['yes', 'no']), size=rows)
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    columns = synthetic_columns(args.rows)
+    # Plain Python lists so the scalar path is not penalized by numpy scalar access
+    records = list(zip(*(columns[name].tolist() for name in ('age', 'gender') + SYMPTOM_FIELDS)))
+
+    started = time.perf_counter()
+    scalar_scores = [scalar_risk(*record) for record in records]
+    scalar_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vector_scores, _ = score_batch(columns)
+    vector_seconds = time.perf_counter() - started
+
+    if not np.array_equal(np.asarray(scalar_scores), vector_scores):
+        raise SystemExit('Vectorized scores differ from the scalar scorer')
+
+    print(f"{'scorer':<12} {'seconds':>10} {'rows/s':>14}")
+    print(f"{'scalar':<12} {scalar_seconds:>10.3f} {args.rows / scalar_seconds:>14,.0f}")
+    print(f"{'vectorized':<12} {vector_seconds:>10.3f} {args.rows / vector_seconds:>14,.0f}")
+    print(f"speedup: {scalar_seconds / vector_seconds:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
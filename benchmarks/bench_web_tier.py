@@ -0,0 +1,485 @@
+"""Web tier load test: throughput and p50/p95/p99 latency per route, as JSON.
+
+    python benchmarks/bench_web_tier.py --concurrency 8 32 --duration 30 --output results.json
+    python benchmarks/bench_web_tier.py --output new.json --baseline results.json
+
+1. Recreates --database (default lung_cancer_bench) on the MySQL server in the DB_*
+   settings from database/lung_cancer_db.sql plus the migrations, and seeds it with
+   --users users and --predictions predictions sampled from "survey lung cancer.csv".
+   The same --seed always produces the same data.
+2. Starts the app on --port against that database (--server flask runs app.py's
+   Flask server, gunicorn runs serve.py, asgi runs Hypercorn) and waits for /ready.
+3. Each of --concurrency virtual users logs in, then sends requests back to back on a
+   keep-alive connection, picking routes by the --mix weights. Requests in the first
+   --warmup seconds are not counted.
+
+The report holds the git commit, the settings and, per concurrency level and route,
+requests/s, errors and latency percentiles. With --baseline the p95 and requests/s
+of each route are also printed next to those of an earlier report.
+
+--reuse-database skips step 1 (pass the --users/--predictions it was seeded with);
+--server none loads an already-running server at --url instead of starting one.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+import mysql.connector
+import numpy as np
+from mysql.connector import Error, errorcode
+from werkzeug.security import generate_password_hash
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+from migrate import apply_pending, split_statements  # noqa: E402
+from risk_scoring import RULES_MODEL_VERSION, normalize_record, read_csv_records, score_batch, to_columns  # noqa: E402
+
+SCHEMA = os.path.join(ROOT, 'database', 'lung_cancer_db.sql')
+SURVEY_CSV = os.path.join(ROOT, 'survey lung cancer.csv')
+APP_DATABASE = 'lung_cancer_db'
+BENCH_PASSWORD = 'bench-password'
+SEED_CHUNK_SIZE = 5000
+
+ROUTES = ('login', 'predict', 'user_predictions', 'predictions', 'feedback')
+DEFAULT_MIX = 'login=1,predict=4,user_predictions=3,predictions=3,feedback=1'
+
+# Flashed messages that mean a 200 page is really an error
+FAILURE_MARKERS = (b'Database connection error', b'Error processing prediction',
+                   b'Error fetching predictions', b'Error: ')
+
+
+# --- Seeding ---
+
+def survey_records(path=SURVEY_CSV):
+    with open(path, 'rb') as f:
+        return [normalize_record(row) for row in read_csv_records(f)]
+
+
+def synthetic_records(survey, count, rng):
+    """Resample whole survey rows, so symptom combinations keep their frequencies,
+    with ages jittered by up to 3 years."""
+    picks = rng.integers(len(survey), size=count)
+    ages = np.clip(np.array([survey[i]['age'] for i in picks]) + rng.integers(-3, 4, size=count), 18, 100)
+    return [dict(survey[i], age=int(age)) for i, age in zip(picks, ages)]
+
+
+def create_database(connection, name):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+        with open(SCHEMA, encoding='utf-8') as f:
+            sql = f.read().replace(APP_DATABASE, name)
+        for statement in split_statements(sql):
+            try:
+                cursor.execute(statement)
+            except Error as e:
+                # SET GLOBAL event_scheduler needs SUPER; the benchmark doesn't use events
+                if e.errno != errorcode.ER_SPECIFIC_ACCESS_DENIED_ERROR:
+                    raise
+            if cursor.with_rows:
+                cursor.fetchall()
+    finally:
+        cursor.close()
+    connection.database = name
+    apply_pending(connection)
+
+
+def seed(connection, users, predictions, survey, rng):
+    cursor = connection.cursor()
+    try:
+        password_hash = generate_password_hash(BENCH_PASSWORD, Config.PASSWORD_HASH_METHOD)
+        cursor.executemany(
+            "INSERT INTO users (id, name, email, password_hash) VALUES (%s, %s, %s, %s)",
+            [(i, f'Bench User {i}', bench_email(i), password_hash) for i in range(1, users + 1)]
+        )
+        cursor.executemany(
+            "INSERT INTO version_control (table_name, record_id, version_number, modified_by) "
+            "VALUES ('users', %s, 1, %s)",
+            [(i, i) for i in range(1, users + 1)]
+        )
+
+        # A year of history, oldest first
+        now = datetime.now().replace(microsecond=0)
+        ages = np.sort(rng.integers(0, 365 * 24 * 3600, size=predictions))[::-1]
+        owners = rng.integers(1, users + 1, size=predictions)
+        for start in range(0, predictions, SEED_CHUNK_SIZE):
+            stop = min(start + SEED_CHUNK_SIZE, predictions)
+            rows = synthetic_records(survey, stop - start, rng)
+            risk_scores, labels = score_batch(to_columns(rows))
+            ids = range(start + 1, stop + 1)
+            cursor.executemany(
+                """INSERT INTO predictions
+                (id, age, gender, smoking, cough, chest_pain, fatigue, shortness_of_breath,
+                 prediction, risk_score, model_version, prediction_date)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+                [(prediction_id, row['age'], row['gender'], row['smoking'], row['cough'], row['chest_pain'],
+                  row['fatigue'], row['shortness_of_breath'], str(label), float(risk_score),
+                  RULES_MODEL_VERSION, now - timedelta(seconds=int(age)))
+                 for prediction_id, row, risk_score, label, age
+                 in zip(ids, rows, risk_scores, labels, ages[start:stop])]
+            )
+            cursor.executemany(
+                "INSERT INTO user_predictions (user_id, prediction_id) VALUES (%s, %s)",
+                [(int(owner), prediction_id) for prediction_id, owner in zip(ids, owners[start:stop])]
+            )
+            cursor.executemany(
+                "INSERT INTO version_control (table_name, record_id, version_number, modified_by) "
+                "VALUES ('predictions', %s, 1, %s)",
+                [(prediction_id, int(owner)) for prediction_id, owner in zip(ids, owners[start:stop])]
+            )
+            connection.commit()
+            print(f"seeded {stop}/{predictions} predictions", file=sys.stderr)
+    finally:
+        cursor.close()
+
+
+def bench_email(user_number):
+    return f'bench{user_number}@example.com'
+
+
+# --- Server ---
+
+def start_server(args, env):
+    bind = f'127.0.0.1:{args.port}'
+    if args.server == 'flask':
+        command = [sys.executable, '-c',
+                   f"from app import app; app.run(host='127.0.0.1', port={args.port}, threaded=True)"]
+    elif args.server == 'gunicorn':
+        command = [sys.executable, 'serve.py', '--bind', bind, '--workers', str(args.workers)]
+    else:
+        command = [sys.executable, '-m', 'hypercorn', 'asgi:application',
+                   '--bind', bind, '--workers', str(args.workers)]
+    log = open(args.server_log, 'ab') if args.server_log else subprocess.DEVNULL
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f'server exited with status {process.returncode} (see --server-log)')
+        try:
+            with urllib.request.urlopen(url + '/ready', timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (OSError, urllib.error.HTTPError):
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f'{url}/ready did not answer 200 within {timeout}s')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# --- Load ---
+
+async def read_response(reader):
+    """Read one HTTP response; returns (status, body, set_cookies, keep_alive)."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    version, status = lines[0].split(' ', 2)[:2]
+    headers, cookies = {}, []
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            name = name.strip().lower()
+            if name == 'set-cookie':
+                cookies.append(value.strip())
+            else:
+                headers[name] = value.strip()
+
+    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        parts = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            parts.append((await reader.readexactly(size + 2))[:-2])
+            if size == 0:
+                break
+        body = b''.join(parts)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return int(status), body, cookies, keep_alive
+
+
+class Session:
+    """A virtual user's keep-alive connection, cookies and API token."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookies = {}
+        self.token = None
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, content_type=None, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: keep-alive']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+        if body is not None:
+            lines += [f'Content-Type: {content_type}', f'Content-Length: {len(body)}']
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        try:
+            status, response, cookies, keep_alive = await read_response(self.reader)
+        except BaseException:
+            self.close()
+            raise
+        for cookie in cookies:
+            name, _, value = cookie.split(';', 1)[0].partition('=')
+            self.cookies[name.strip()] = value
+        if not keep_alive:
+            self.close()
+        return status, response
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def route_request(route, rng, user_number, records, predictions):
+    """(method, path, body, content type) of one request to route."""
+    if route == 'login':
+        body = json.dumps({'email': bench_email(user_number), 'password': BENCH_PASSWORD})
+        return 'POST', '/login', body.encode(), 'application/json'
+    if route == 'predict':
+        return 'POST', '/predict', urlencode(rng.choice(records)).encode(), 'application/x-www-form-urlencoded'
+    if route == 'user_predictions':
+        return 'GET', '/user/predictions?limit=50', None, None
+    if route == 'predictions':
+        return 'GET', '/predictions?limit=50', None, None
+    body = urlencode({'prediction_id': rng.randint(1, predictions), 'rating': rng.randint(1, 5),
+                      'feedback_text': 'Benchmark feedback'})
+    return 'POST', '/feedback', body.encode(), 'application/x-www-form-urlencoded'
+
+
+def succeeded(route, status, body):
+    # Redirects mean the session was lost; the app reports most failures as flashed 200 pages
+    if status != 200:
+        return False
+    if route == 'login':
+        return b'"token"' in body
+    return not any(marker in body for marker in FAILURE_MARKERS)
+
+
+async def virtual_user(index, target, mix, settings, record_from, stop_at, latencies, errors):
+    rng = random.Random(settings['seed'] * 1000003 + index)
+    user_number = index % settings['users'] + 1
+    routes, weights = zip(*mix.items())
+    session = Session(*target)
+    logged_in = False
+    while time.perf_counter() < stop_at:
+        route = rng.choices(routes, weights)[0] if logged_in else 'login'
+        method, path, body, content_type = route_request(route, rng, user_number,
+                                                         settings['records'], settings['predictions'])
+        started = time.perf_counter()
+        try:
+            # The export of every user's predictions takes the API token from /login
+            headers = {'x-access-token': session.token} if route == 'predictions' else None
+            status, response = await session.request(method, path, body, content_type, headers)
+            ok = succeeded(route, status, response)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            ok = False
+        elapsed = time.perf_counter() - started
+        if route == 'login':
+            logged_in = ok
+            session.token = json.loads(response)['token'] if ok else None
+        if started >= record_from:
+            if ok:
+                latencies[route].append(elapsed)
+            else:
+                errors[route] += 1
+    session.close()
+
+
+async def run_level(url, concurrency, duration, warmup, mix, settings):
+    parts = urlsplit(url)
+    target = (parts.hostname, parts.port or 80)
+    latencies = {route: [] for route in ROUTES}
+    errors = Counter()
+    record_from = time.perf_counter() + warmup
+    stop_at = record_from + duration
+    await asyncio.gather(*(virtual_user(index, target, mix, settings, record_from, stop_at, latencies, errors)
+                           for index in range(concurrency)))
+    return latencies, errors
+
+
+def percentile(ordered, fraction):
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(latencies, errors, seconds):
+    latencies = sorted(latencies)
+    summary = {'requests': len(latencies), 'errors': errors, 'throughput': round(len(latencies) / seconds, 2)}
+    if latencies:
+        summary.update({
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'max_ms': round(latencies[-1] * 1000, 3),
+        })
+    return summary
+
+
+# --- Report ---
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def print_level(level, baseline_level):
+    print(f"\nconcurrency {level['concurrency']}", file=sys.stderr)
+    print(f"{'route':<18} {'requests/s':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+          + (f" {'base p95':>9} {'base req/s':>11}" if baseline_level else ''), file=sys.stderr)
+    for route, stats in [*level['routes'].items(), ('total', level['total'])]:
+        line = (f"{route:<18} {stats['throughput']:>11.1f} {stats.get('p50_ms', math.nan):>9.1f} "
+                f"{stats.get('p95_ms', math.nan):>9.1f} {stats.get('p99_ms', math.nan):>9.1f} {stats['errors']:>7}")
+        if baseline_level:
+            base = baseline_level['total'] if route == 'total' else baseline_level['routes'].get(route, {})
+            line += f" {base.get('p95_ms', math.nan):>9.1f} {base.get('throughput', math.nan):>11.1f}"
+        print(line, file=sys.stderr)
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        route, _, weight = item.partition('=')
+        if route.strip() not in ROUTES:
+            raise argparse.ArgumentTypeError(f'unknown route {route!r}; expected one of {", ".join(ROUTES)}')
+        mix[route.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='lung_cancer_bench')
+    parser.add_argument('--reuse-database', action='store_true', help='keep the data of an earlier run')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--predictions', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--server', choices=('flask', 'gunicorn', 'asgi', 'none'), default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn/asgi worker processes')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--url', help='base URL of a running server (with --server none)')
+    parser.add_argument('--server-log', help='append the server output to this file')
+    parser.add_argument('--startup-timeout', type=float, default=60.0)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds per concurrency level')
+    parser.add_argument('--warmup', type=float, default=3.0, help='unmeasured seconds before each level')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help='route=weight,...')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='JSON report of an earlier run to compare with')
+    args = parser.parse_args()
+    if args.database == APP_DATABASE:
+        parser.error(f'refusing to recreate the application database {APP_DATABASE}')
+    if args.server == 'none' and not args.url:
+        parser.error('--server none needs --url')
+
+    survey = survey_records()
+    rng = np.random.default_rng(args.seed)
+    if not args.reuse_database:
+        connect_args = {key: value for key, value in Config.DB_CONFIG.items() if key != 'database'}
+        connection = mysql.connector.connect(**connect_args, autocommit=True)
+        try:
+            create_database(connection, args.database)
+            connection.autocommit = False
+            seed(connection, args.users, args.predictions, survey, rng)
+        finally:
+            connection.close()
+    settings = {
+        'seed': args.seed,
+        'users': args.users,
+        'predictions': args.predictions,
+        # Submitted by /predict; drawn independently of the seeded rows
+        'records': synthetic_records(survey, 1000, np.random.default_rng(args.seed + 1)),
+    }
+
+    process = None
+    url = args.url.rstrip('/') if args.url else f'http://127.0.0.1:{args.port}'
+    if args.server != 'none':
+        process = start_server(args, dict(os.environ, DB_NAME=args.database))
+    try:
+        wait_ready(url, process, args.startup_timeout)
+        levels = []
+        for concurrency in args.concurrency:
+            latencies, errors = asyncio.run(run_level(url, concurrency, args.duration, args.warmup,
+                                                      args.mix, settings))
+            levels.append({
+                'concurrency': concurrency,
+                'routes': {route: summarize(latencies[route], errors[route], args.duration)
+                           for route in ROUTES if route in args.mix},
+                'total': summarize([value for values in latencies.values() for value in values],
+                                   sum(errors.values()), args.duration),
+            })
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    commit, dirty = git_revision()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'server': args.server,
+        'workers': args.workers,
+        'database': {'users': args.users, 'predictions': args.predictions, 'seed': args.seed},
+        'duration': args.duration,
+        'warmup': args.warmup,
+        'mix': args.mix,
+        'levels': levels,
+    }
+
+    baseline_levels = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        baseline_levels = {level['concurrency']: level for level in baseline['levels']}
+        print(f"baseline: {baseline.get('commit')}", file=sys.stderr)
+    for level in levels:
+        print_level(level, baseline_levels.get(level['concurrency']))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
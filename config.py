@@ -7,8 +7,88 @@ class Config:
     
     # Database configuration
     DB_CONFIG = {
-        'host': 'localhost',
-        'user': 'root',
-        'password': 'root',  # Change this to your MySQL password
-        'database': 'lung_cancer_db'
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'port': int(os.environ.get('DB_PORT', 3306)),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', 'root'),  # Change this to your MySQL password
+        'database': os.environ.get('DB_NAME', 'lung_cancer_db')
     }
+
+    # Connection pool configuration (see db_pool.py)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))                   # Connections kept open
+    DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))  # Extra connections under burst load
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))           # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))          # Close connections idle longer than this
+    DB_POOL_PING_INTERVAL = int(os.environ.get('DB_POOL_PING_INTERVAL', 30))  # Ping connections idle longer than this
+
+    # Batch prediction (/predict/batch)
+    PREDICT_BATCH_MAX_ROWS = int(os.environ.get('PREDICT_BATCH_MAX_ROWS', 100000))
+    PREDICT_BATCH_CHUNK_SIZE = int(os.environ.get('PREDICT_BATCH_CHUNK_SIZE', 1000))  # Rows per INSERT and commit
+
+    # Scorer used by /predict: 'rules' (hand-coded weights) or 'model' (the RandomForest promoted
+    # in the model registry, model/artifacts; model/model.pkl until a version is promoted)
+    PREDICTION_ENGINE = os.environ.get('PREDICTION_ENGINE', 'rules')
+
+    # Micro-batching of concurrent /predict calls (model/batching.py) with the 'model' engine;
+    # rules scoring takes microseconds per row and is never batched. 0 ms disables it
+    PREDICT_MICROBATCH_WAIT_MS = float(os.environ.get('PREDICT_MICROBATCH_WAIT_MS', 2))
+    PREDICT_MICROBATCH_MAX_ROWS = int(os.environ.get('PREDICT_MICROBATCH_MAX_ROWS', 32))
+    PREDICT_TIMEOUT = float(os.environ.get('PREDICT_TIMEOUT', 5))  # Seconds to wait for a score
+
+    # Prediction result cache (model/cache.py); size 0 disables it
+    PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+    PREDICTION_CACHE_TTL = int(os.environ.get('PREDICTION_CACHE_TTL', 300))  # Seconds
+    # Score the rule-based model from its precomputed 256-entry table
+    RULES_LOOKUP_TABLE = os.environ.get('RULES_LOOKUP_TABLE', 'true').lower() == 'true'
+
+    # Prediction history paging (/predictions, /user/predictions)
+    HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 50))
+    HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', 1000))
+    HISTORY_STREAM_CHUNK_SIZE = int(os.environ.get('HISTORY_STREAM_CHUNK_SIZE', 500))  # Rows per fetchmany() when streaming
+
+    # Prediction analytics (/analytics), read from the prediction_rollups table
+    ANALYTICS_DEFAULT_DAYS = int(os.environ.get('ANALYTICS_DEFAULT_DAYS', 30))  # Range when no from/to is given
+    ANALYTICS_MAX_DAYS = int(os.environ.get('ANALYTICS_MAX_DAYS', 366))
+
+    # Password hashing (password_hashing.py). Hashes stored with another method are
+    # replaced at the user's next login, so the work factor can be raised at any time.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')  # or e.g. 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # Processes per app process; 0 hashes inline
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8))  # Queued + running before 503
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))  # Seconds to wait for a hash
+
+    # Seconds a user's version stays cached for API token checks (auth_cache.py)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+
+    # Reference data cache for /symptoms and /recommendations (reference_cache.py)
+    REFERENCE_CACHE_TTL = int(os.environ.get('REFERENCE_CACHE_TTL', 3600))  # Reload at least this often
+    REFERENCE_CACHE_CHECK_INTERVAL = int(os.environ.get('REFERENCE_CACHE_CHECK_INTERVAL', 30))  # Seconds between version checks
+    WARM_CACHES_ON_START = os.environ.get('WARM_CACHES_ON_START', 'true').lower() == 'true'
+
+    # Incremental backups (backup.py)
+    BACKUP_CHUNK_SIZE = int(os.environ.get('BACKUP_CHUNK_SIZE', 5000))  # Rows per read and per write
+    BACKUP_SAFETY_LAG = int(os.environ.get('BACKUP_SAFETY_LAG', 5))     # Seconds a run's mark trails NOW()
+    BACKUP_DIR = os.environ.get('BACKUP_DIR')  # Write .ndjson.gz files here instead of the backup_rows table
+
+    # Pre-fork server (serve.py)
+    WEB_BIND = os.environ.get('WEB_BIND', '0.0.0.0:5050')
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 0))  # 0 = one per available core
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))  # Request threads per worker
+    WEB_GRACEFUL_TIMEOUT = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))  # Seconds old workers get to finish on reload
+    MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 5))  # Seconds between checks for a new model; 0 disables
+
+    # Async serving (asgi.py): threads per worker running the Flask-only routes
+    ASYNC_WSGI_THREADS = int(os.environ.get('ASYNC_WSGI_THREADS', 16))
+
+    # Instrumentation (instrumentation.py, /metrics)
+    SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 1.0))  # Log a span breakdown above this; 0 disables
+    SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'false').lower() == 'true'
+
+    # Slow-query log and per-statement statistics (query_log.py, /admin/queries)
+    SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 0.2))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'  # Capture plans of slow statements
+    QUERY_LOG_MAX_FINGERPRINTS = int(os.environ.get('QUERY_LOG_MAX_FINGERPRINTS', 1000))
+
+    # Enables /metrics, /pool/stats, /predict/stats, /analytics, /admin/queries and
+    # /debug/profile for requests sending it as X-Admin-Token
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
@@ -90,8 +90,11 @@ CREATE TABLE IF NOT EXISTS predictions (
     shortness_of_breath ENUM('yes', 'no') NOT NULL,
     prediction VARCHAR(255) NOT NULL,
     risk_score DECIMAL(5,2) DEFAULT 0.0,
+    model_version VARCHAR(64) NULL COMMENT 'Registry version or rules version that scored the row',
     prediction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    version INT DEFAULT 1
+    version INT DEFAULT 1,
+    batch_id CHAR(32) NULL COMMENT 'Set for rows written by /predict/batch',
+    INDEX idx_predictions_batch (batch_id)
 );
 
 -- Table: User Predictions (links users to their predictions)
@@ -124,6 +127,21 @@ CREATE TABLE IF NOT EXISTS user_feedback (
     FOREIGN KEY (prediction_id) REFERENCES predictions(id) ON DELETE SET NULL
 );
 
+-- Table: Prediction Rollups (read by /analytics instead of scanning predictions)
+-- Each combination is spread over 8 rows (slot = prediction id MOD 8): concurrent
+-- inserts for the same day and bucket then rarely wait on one row's lock. Readers sum the slots.
+CREATE TABLE IF NOT EXISTS prediction_rollups (
+    day DATE NOT NULL,
+    gender ENUM('Male', 'Female', 'Other') NOT NULL,
+    age_bucket VARCHAR(7) NOT NULL COMMENT '0-39, 40-49, 50-59, 60+ or unknown',
+    risk_level VARCHAR(16) NOT NULL COMMENT 'Low, Moderate or High',
+    model_version VARCHAR(64) NOT NULL COMMENT 'predictions.model_version, or unknown when NULL',
+    slot TINYINT UNSIGNED NOT NULL,
+    predictions INT NOT NULL DEFAULT 0,
+    risk_score_sum DECIMAL(16,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, gender, age_bucket, risk_level, model_version, slot)
+);
+
 -- Table: Deleted Predictions Log
 CREATE TABLE IF NOT EXISTS deleted_predictions_log (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -131,55 +149,8 @@ CREATE TABLE IF NOT EXISTS deleted_predictions_log (
     deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Create backup table for critical data
-CREATE TABLE IF NOT EXISTS users_backup LIKE users;
-CREATE TABLE IF NOT EXISTS predictions_backup LIKE predictions;
-CREATE TABLE IF NOT EXISTS medical_history_backup LIKE medical_history;
-
--- Create stored procedure for backup
-DELIMITER $$
-CREATE PROCEDURE create_backup()
-BEGIN
-    DECLARE backup_timestamp TIMESTAMP;
-    SET backup_timestamp = CURRENT_TIMESTAMP;
-    
-    -- Backup users
-    INSERT INTO users_backup 
-    SELECT *, backup_timestamp FROM users;
-    
-    -- Backup predictions
-    INSERT INTO predictions_backup 
-    SELECT *, backup_timestamp FROM predictions;
-    
-    -- Backup medical history
-    INSERT INTO medical_history_backup 
-    SELECT *, backup_timestamp FROM medical_history;
-END $$
-DELIMITER ;
-
--- Create stored procedure for point-in-time recovery
-DELIMITER $$
-CREATE PROCEDURE point_in_time_recovery(IN recovery_timestamp TIMESTAMP)
-BEGIN
-    -- Restore users
-    UPDATE users u
-    JOIN users_backup b ON u.id = b.id
-    SET u.* = b.*
-    WHERE b.backup_timestamp <= recovery_timestamp;
-    
-    -- Restore predictions
-    UPDATE predictions p
-    JOIN predictions_backup b ON p.id = b.id
-    SET p.* = b.*
-    WHERE b.backup_timestamp <= recovery_timestamp;
-    
-    -- Restore medical history
-    UPDATE medical_history m
-    JOIN medical_history_backup b ON m.id = b.id
-    SET m.* = b.*
-    WHERE b.backup_timestamp <= recovery_timestamp;
-END $$
-DELIMITER ;
+-- Backups are incremental: backup.py copies rows changed since the last run in
+-- bounded chunks (migrations 0005 and 0011 add the updated_at marks and backup_* tables)
 
 -- Create trigger for transaction logging
 DELIMITER $$
@@ -211,24 +182,9 @@ DELIMITER ;
 DELIMITER $$
 CREATE PROCEDURE detect_deadlocks()
 BEGIN
-    DECLARE done INT DEFAULT 0;
-    DECLARE lock_id INT;
-    DECLARE cur CURSOR FOR 
-        SELECT id FROM lock_management 
-        WHERE lock_timeout < CURRENT_TIMESTAMP;
-    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = 1;
-    
-    OPEN cur;
-    read_loop: LOOP
-        FETCH cur INTO lock_id;
-        IF done THEN
-            LEAVE read_loop;
-        END IF;
-        
-        -- Release expired locks
-        DELETE FROM lock_management WHERE id = lock_id;
-    END LOOP;
-    CLOSE cur;
+    -- Release every expired lock in one statement (uses idx_lock_management_timeout)
+    DELETE FROM lock_management
+    WHERE lock_timeout < CURRENT_TIMESTAMP;
 END $$
 DELIMITER ;
 
@@ -237,9 +193,6 @@ CREATE EVENT IF NOT EXISTS maintenance_schedule
 ON SCHEDULE EVERY 1 DAY
 DO
 BEGIN
-    -- Create daily backup
-    CALL create_backup();
-    
     -- Clean up old transaction logs (keep last 30 days)
     DELETE FROM transaction_log 
     WHERE timestamp < DATE_SUB(CURRENT_TIMESTAMP, INTERVAL 30 DAY);
@@ -320,8 +273,7 @@ SELECT
     p.prediction, p.risk_score, p.prediction_date
 FROM users u
 JOIN user_predictions up ON u.id = up.user_id
-JOIN predictions p ON up.prediction_id = p.id
-ORDER BY p.prediction_date DESC;
+JOIN predictions p ON up.prediction_id = p.id;
 
 DELIMITER $$
 CREATE TRIGGER after_prediction_delete
@@ -332,24 +284,166 @@ BEGIN
 END $$
 DELIMITER ;
 
+-- Create stored procedure for prediction persistence
+-- Writes the prediction, its user link and its version row in one call.
+-- No COMMIT here: the caller's transaction commits everything at once.
+DELIMITER $$
+CREATE PROCEDURE record_prediction(
+    IN p_user_id INT,
+    IN p_age INT,
+    IN p_gender VARCHAR(10),
+    IN p_smoking VARCHAR(3),
+    IN p_cough VARCHAR(3),
+    IN p_chest_pain VARCHAR(3),
+    IN p_fatigue VARCHAR(3),
+    IN p_shortness_of_breath VARCHAR(3),
+    IN p_prediction VARCHAR(255),
+    IN p_risk_score DECIMAL(5,2),
+    IN p_model_version VARCHAR(64),
+    OUT p_prediction_id INT
+)
+BEGIN
+    INSERT INTO predictions
+    (age, gender, smoking, cough, chest_pain, fatigue, shortness_of_breath,
+     prediction, risk_score, model_version, version)
+    VALUES (p_age, p_gender, p_smoking, p_cough, p_chest_pain, p_fatigue,
+            p_shortness_of_breath, p_prediction, p_risk_score, p_model_version, 1);
+    SET p_prediction_id = LAST_INSERT_ID();
+
+    INSERT INTO user_predictions (user_id, prediction_id)
+    VALUES (p_user_id, p_prediction_id);
+
+    INSERT INTO version_control (table_name, record_id, version_number, modified_by)
+    VALUES ('predictions', p_prediction_id, 1, p_user_id)
+    ON DUPLICATE KEY UPDATE
+    version_number = version_number + 1,
+    modified_by = p_user_id;
+END $$
+DELIMITER ;
+
+-- Prediction rollups, maintained on every insert, update and delete of predictions
+-- Age buckets of the rule-based model (AGE_BUCKET_EDGES in risk_scoring.py)
+DELIMITER $$
+CREATE FUNCTION prediction_age_bucket(p_age INT) RETURNS VARCHAR(7)
+DETERMINISTIC NO SQL
+BEGIN
+    RETURN CASE
+        WHEN p_age IS NULL THEN 'unknown'
+        WHEN p_age < 40 THEN '0-39'
+        WHEN p_age < 50 THEN '40-49'
+        WHEN p_age < 60 THEN '50-59'
+        ELSE '60+' END;
+END $$
+DELIMITER ;
+
+-- "High risk of lung cancer" -> "High"; the rules and the model share these labels
+DELIMITER $$
+CREATE FUNCTION prediction_risk_level(p_prediction VARCHAR(255)) RETURNS VARCHAR(16)
+DETERMINISTIC NO SQL
+BEGIN
+    RETURN SUBSTRING_INDEX(p_prediction, ' ', 1);
+END $$
+DELIMITER ;
+
+-- Adds (p_delta = 1) or removes (p_delta = -1) one prediction from its rollup row
+DELIMITER $$
+CREATE PROCEDURE bump_prediction_rollup(
+    IN p_id INT,
+    IN p_prediction_date TIMESTAMP,
+    IN p_gender VARCHAR(10),
+    IN p_age INT,
+    IN p_prediction VARCHAR(255),
+    IN p_risk_score DECIMAL(5,2),
+    IN p_model_version VARCHAR(64),
+    IN p_delta INT
+)
+BEGIN
+    INSERT INTO prediction_rollups
+    (day, gender, age_bucket, risk_level, model_version, slot, predictions, risk_score_sum)
+    VALUES (DATE(p_prediction_date), p_gender, prediction_age_bucket(p_age),
+            prediction_risk_level(p_prediction), IFNULL(p_model_version, 'unknown'), p_id MOD 8,
+            p_delta, p_delta * IFNULL(p_risk_score, 0))
+    ON DUPLICATE KEY UPDATE
+    predictions = predictions + VALUES(predictions),
+    risk_score_sum = risk_score_sum + VALUES(risk_score_sum);
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER prediction_rollups_after_insert
+AFTER INSERT ON predictions
+FOR EACH ROW
+BEGIN
+    CALL bump_prediction_rollup(NEW.id, NEW.prediction_date, NEW.gender, NEW.age,
+                                NEW.prediction, NEW.risk_score, NEW.model_version, 1);
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER prediction_rollups_after_update
+AFTER UPDATE ON predictions
+FOR EACH ROW
+BEGIN
+    -- Rescoring moves a row between risk levels and versions; other updates leave the rollups alone
+    IF NOT (OLD.prediction_date <=> NEW.prediction_date AND OLD.gender <=> NEW.gender
+            AND OLD.age <=> NEW.age AND OLD.prediction <=> NEW.prediction
+            AND OLD.risk_score <=> NEW.risk_score AND OLD.model_version <=> NEW.model_version) THEN
+        CALL bump_prediction_rollup(OLD.id, OLD.prediction_date, OLD.gender, OLD.age,
+                                    OLD.prediction, OLD.risk_score, OLD.model_version, -1);
+        CALL bump_prediction_rollup(NEW.id, NEW.prediction_date, NEW.gender, NEW.age,
+                                    NEW.prediction, NEW.risk_score, NEW.model_version, 1);
+    END IF;
+END $$
+DELIMITER ;
+
 DELIMITER $$
-CREATE PROCEDURE update_all_risk_scores()
+CREATE TRIGGER prediction_rollups_after_delete
+AFTER DELETE ON predictions
+FOR EACH ROW
+BEGIN
+    CALL bump_prediction_rollup(OLD.id, OLD.prediction_date, OLD.gender, OLD.age,
+                                OLD.prediction, OLD.risk_score, OLD.model_version, -1);
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE PROCEDURE update_all_risk_scores(IN p_chunk_size INT)
 BEGIN
-    DECLARE done INT DEFAULT 0;
-    DECLARE pred_id INT;
-    DECLARE cur CURSOR FOR SELECT id FROM predictions;
-    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = 1;
-
-    OPEN cur;
-    read_loop: LOOP
-        FETCH cur INTO pred_id;
-        IF done THEN
-            LEAVE read_loop;
+    -- Recomputes risk_score and prediction from the stored answers with the weights of
+    -- predict_lung_cancer_risk (risk_scoring.py), one bounded id range per transaction.
+    -- maintenance.py runs the same job from Python with progress and resume support.
+    DECLARE last_id INT DEFAULT 0;
+    DECLARE chunk_end INT;
+
+    chunk_loop: LOOP
+        SELECT MAX(id) INTO chunk_end FROM (
+            SELECT id FROM predictions WHERE id > last_id ORDER BY id LIMIT p_chunk_size
+        ) AS chunk;
+        IF chunk_end IS NULL THEN
+            LEAVE chunk_loop;
         END IF;
-        -- Example: set risk_score to 0 for demonstration
-        UPDATE predictions SET risk_score = 0 WHERE id = pred_id;
+
+        START TRANSACTION;
+        UPDATE predictions
+        SET risk_score = (
+                CASE WHEN age < 40 THEN 1 WHEN age < 50 THEN 2 WHEN age < 60 THEN 3 ELSE 4 END
+                + CASE WHEN gender = 'Male' THEN 2 ELSE 1 END
+                + 5 * (smoking = 'yes') + 2 * (cough = 'yes') + 3 * (chest_pain = 'yes')
+                + 1 * (fatigue = 'yes') + 3 * (shortness_of_breath = 'yes')),
+            -- Assignments run left to right, so this sees the new risk_score
+            prediction = CASE
+                WHEN risk_score < 6 THEN 'Low risk of lung cancer'
+                WHEN risk_score < 10 THEN 'Moderate risk of lung cancer'
+                ELSE 'High risk of lung cancer' END,
+            model_version = 'rules-v1',  -- RULES_MODEL_VERSION in risk_scoring.py
+            version = version + 1
+        WHERE id > last_id AND id <= chunk_end
+          -- Rows scored by a registry model keep that model's score and version
+          AND (model_version IS NULL OR model_version = 'rules-v1');
+        COMMIT;
+
+        SET last_id = chunk_end;
     END LOOP;
-    CLOSE cur;
 END $$
 DELIMITER ;
 
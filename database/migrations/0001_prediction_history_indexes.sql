@@ -0,0 +1,10 @@
+-- 0001: Indexes for the prediction history routes (queries.py)
+
+-- Both history routes: ORDER BY prediction_date DESC, id DESC with keyset ranges
+CREATE INDEX idx_predictions_date_id ON predictions (prediction_date, id);
+
+-- /user/predictions: filter on user_id, then join to predictions (covering)
+CREATE INDEX idx_user_predictions_user ON user_predictions (user_id, prediction_id);
+
+-- /predictions: join from each prediction back to its owner (covering)
+CREATE INDEX idx_user_predictions_prediction ON user_predictions (prediction_id, user_id);
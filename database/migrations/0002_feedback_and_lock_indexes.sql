@@ -0,0 +1,7 @@
+-- 0002: Indexes for the feedback list and expired-lock cleanup
+
+-- /feedback: WHERE user_id = ? ORDER BY created_at DESC
+CREATE INDEX idx_user_feedback_user_created ON user_feedback (user_id, created_at);
+
+-- detect_deadlocks(): lock_timeout < CURRENT_TIMESTAMP
+CREATE INDEX idx_lock_management_timeout ON lock_management (lock_timeout);
@@ -0,0 +1,68 @@
+-- 0003: Bump version_control whenever reference data changes, so cached copies of
+-- symptoms and recommendations (reference_cache.py) reload. record_id 0 tracks the whole table.
+
+DELIMITER $$
+CREATE TRIGGER symptoms_version_after_insert
+AFTER INSERT ON symptoms
+FOR EACH ROW
+BEGIN
+    INSERT INTO version_control (table_name, record_id, version_number)
+    VALUES ('symptoms', 0, 1)
+    ON DUPLICATE KEY UPDATE version_number = version_number + 1;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER symptoms_version_after_update
+AFTER UPDATE ON symptoms
+FOR EACH ROW
+BEGIN
+    INSERT INTO version_control (table_name, record_id, version_number)
+    VALUES ('symptoms', 0, 1)
+    ON DUPLICATE KEY UPDATE version_number = version_number + 1;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER symptoms_version_after_delete
+AFTER DELETE ON symptoms
+FOR EACH ROW
+BEGIN
+    INSERT INTO version_control (table_name, record_id, version_number)
+    VALUES ('symptoms', 0, 1)
+    ON DUPLICATE KEY UPDATE version_number = version_number + 1;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER recommendations_version_after_insert
+AFTER INSERT ON recommendations
+FOR EACH ROW
+BEGIN
+    INSERT INTO version_control (table_name, record_id, version_number)
+    VALUES ('recommendations', 0, 1)
+    ON DUPLICATE KEY UPDATE version_number = version_number + 1;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER recommendations_version_after_update
+AFTER UPDATE ON recommendations
+FOR EACH ROW
+BEGIN
+    INSERT INTO version_control (table_name, record_id, version_number)
+    VALUES ('recommendations', 0, 1)
+    ON DUPLICATE KEY UPDATE version_number = version_number + 1;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER recommendations_version_after_delete
+AFTER DELETE ON recommendations
+FOR EACH ROW
+BEGIN
+    INSERT INTO version_control (table_name, record_id, version_number)
+    VALUES ('recommendations', 0, 1)
+    ON DUPLICATE KEY UPDATE version_number = version_number + 1;
+END $$
+DELIMITER ;
@@ -0,0 +1,97 @@
+-- 0005: Incremental backups (backup.py) in place of the full-table create_backup() copies.
+-- Every backed-up table gets an (updated_at, id) high-water mark; deletes are recorded
+-- as tombstones so a restore can replay them.
+
+ALTER TABLE users
+    ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+ALTER TABLE predictions
+    ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+-- Delta scans: updated_at in (last mark, new mark], read in (updated_at, id) order
+CREATE INDEX idx_users_updated ON users (updated_at, id);
+CREATE INDEX idx_predictions_updated ON predictions (updated_at, id);
+CREATE INDEX idx_medical_history_updated ON medical_history (updated_at, id);
+
+-- One row per backup run; a run covers changes in (since_mark, until_mark]
+CREATE TABLE IF NOT EXISTS backup_runs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    since_mark TIMESTAMP NULL,
+    until_mark TIMESTAMP NOT NULL,
+    location VARCHAR(255) NULL COMMENT 'Compressed file, or NULL when stored in backup_rows',
+    status ENUM('running', 'complete', 'failed') NOT NULL DEFAULT 'running',
+    rows_written BIGINT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP NULL,
+    INDEX idx_backup_runs_status (status, until_mark)
+);
+
+-- Changed rows captured by each run, as JSON so one table serves every source table
+CREATE TABLE IF NOT EXISTS backup_rows (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    run_id INT NOT NULL,
+    table_name VARCHAR(50) NOT NULL,
+    record_id INT NOT NULL,
+    operation ENUM('upsert', 'delete') NOT NULL,
+    changed_at TIMESTAMP NULL,
+    row_data JSON NULL,
+    INDEX idx_backup_rows_run (run_id, id),
+    FOREIGN KEY (run_id) REFERENCES backup_runs(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS backup_tombstones (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(50) NOT NULL,
+    record_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_backup_tombstones_deleted (deleted_at, id)
+);
+
+DELIMITER $$
+CREATE TRIGGER users_backup_tombstone
+AFTER DELETE ON users
+FOR EACH ROW
+BEGIN
+    INSERT INTO backup_tombstones (table_name, record_id) VALUES ('users', OLD.id);
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER predictions_backup_tombstone
+AFTER DELETE ON predictions
+FOR EACH ROW
+BEGIN
+    INSERT INTO backup_tombstones (table_name, record_id) VALUES ('predictions', OLD.id);
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER medical_history_backup_tombstone
+AFTER DELETE ON medical_history
+FOR EACH ROW
+BEGIN
+    INSERT INTO backup_tombstones (table_name, record_id) VALUES ('medical_history', OLD.id);
+END $$
+DELIMITER ;
+
+-- The old full-copy procedures; create_backup() could not insert into its LIKE tables
+-- (one column short) and point_in_time_recovery() used SET t.* = b.*, which MySQL rejects
+DROP PROCEDURE IF EXISTS create_backup;
+DROP PROCEDURE IF EXISTS point_in_time_recovery;
+
+-- Daily maintenance no longer copies whole tables; schedule `python backup.py create`
+DROP EVENT IF EXISTS maintenance_schedule;
+
+DELIMITER $$
+CREATE EVENT maintenance_schedule
+ON SCHEDULE EVERY 1 DAY
+DO
+BEGIN
+    -- Clean up old transaction logs (keep last 30 days)
+    DELETE FROM transaction_log
+    WHERE timestamp < DATE_SUB(CURRENT_TIMESTAMP, INTERVAL 30 DAY);
+
+    -- Release expired locks
+    CALL detect_deadlocks();
+END $$
+DELIMITER ;
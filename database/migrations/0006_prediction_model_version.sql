@@ -0,0 +1,84 @@
+-- 0006: Record which model scored each prediction: a model registry version
+-- (model/registry.py) or the rules version (RULES_MODEL_VERSION in risk_scoring.py).
+-- Rows written before this migration keep NULL, since their scorer is unknown.
+
+ALTER TABLE predictions
+    ADD COLUMN model_version VARCHAR(64) NULL COMMENT 'Registry version or rules version that scored the row'
+    AFTER risk_score;
+
+DROP PROCEDURE IF EXISTS record_prediction;
+
+DELIMITER $$
+CREATE PROCEDURE record_prediction(
+    IN p_user_id INT,
+    IN p_age INT,
+    IN p_gender VARCHAR(10),
+    IN p_smoking VARCHAR(3),
+    IN p_cough VARCHAR(3),
+    IN p_chest_pain VARCHAR(3),
+    IN p_fatigue VARCHAR(3),
+    IN p_shortness_of_breath VARCHAR(3),
+    IN p_prediction VARCHAR(255),
+    IN p_risk_score DECIMAL(5,2),
+    IN p_model_version VARCHAR(64),
+    OUT p_prediction_id INT
+)
+BEGIN
+    INSERT INTO predictions
+    (age, gender, smoking, cough, chest_pain, fatigue, shortness_of_breath,
+     prediction, risk_score, model_version, version)
+    VALUES (p_age, p_gender, p_smoking, p_cough, p_chest_pain, p_fatigue,
+            p_shortness_of_breath, p_prediction, p_risk_score, p_model_version, 1);
+    SET p_prediction_id = LAST_INSERT_ID();
+
+    INSERT INTO user_predictions (user_id, prediction_id)
+    VALUES (p_user_id, p_prediction_id);
+
+    INSERT INTO version_control (table_name, record_id, version_number, modified_by)
+    VALUES ('predictions', p_prediction_id, 1, p_user_id)
+    ON DUPLICATE KEY UPDATE
+    version_number = version_number + 1,
+    modified_by = p_user_id;
+END $$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS update_all_risk_scores;
+
+DELIMITER $$
+CREATE PROCEDURE update_all_risk_scores(IN p_chunk_size INT)
+BEGIN
+    -- Recomputes risk_score and prediction from the stored answers with the weights of
+    -- predict_lung_cancer_risk (risk_scoring.py), one bounded id range per transaction.
+    -- maintenance.py runs the same job from Python with progress and resume support.
+    DECLARE last_id INT DEFAULT 0;
+    DECLARE chunk_end INT;
+
+    chunk_loop: LOOP
+        SELECT MAX(id) INTO chunk_end FROM (
+            SELECT id FROM predictions WHERE id > last_id ORDER BY id LIMIT p_chunk_size
+        ) AS chunk;
+        IF chunk_end IS NULL THEN
+            LEAVE chunk_loop;
+        END IF;
+
+        START TRANSACTION;
+        UPDATE predictions
+        SET risk_score = (
+                CASE WHEN age < 40 THEN 1 WHEN age < 50 THEN 2 WHEN age < 60 THEN 3 ELSE 4 END
+                + CASE WHEN gender = 'Male' THEN 2 ELSE 1 END
+                + 5 * (smoking = 'yes') + 2 * (cough = 'yes') + 3 * (chest_pain = 'yes')
+                + 1 * (fatigue = 'yes') + 3 * (shortness_of_breath = 'yes')),
+            -- Assignments run left to right, so this sees the new risk_score
+            prediction = CASE
+                WHEN risk_score < 6 THEN 'Low risk of lung cancer'
+                WHEN risk_score < 10 THEN 'Moderate risk of lung cancer'
+                ELSE 'High risk of lung cancer' END,
+            model_version = 'rules-v1',  -- RULES_MODEL_VERSION in risk_scoring.py
+            version = version + 1
+        WHERE id > last_id AND id <= chunk_end;
+        COMMIT;
+
+        SET last_id = chunk_end;
+    END LOOP;
+END $$
+DELIMITER ;
@@ -0,0 +1,112 @@
+-- 0007: Prediction counts per day, gender, age bucket and risk level, kept current by
+-- triggers on predictions so /analytics never scans predictions itself. Existing rows
+-- are counted by `python maintenance.py rebuild-rollups`, not here, so the migration
+-- stays quick on a large table.
+
+-- Each combination is spread over 8 rows (slot = prediction id MOD 8): concurrent
+-- inserts for the same day and bucket then rarely wait on one row's lock. Readers sum the slots.
+CREATE TABLE IF NOT EXISTS prediction_rollups (
+    day DATE NOT NULL,
+    gender ENUM('Male', 'Female', 'Other') NOT NULL,
+    age_bucket VARCHAR(7) NOT NULL COMMENT '0-39, 40-49, 50-59, 60+ or unknown',
+    risk_level VARCHAR(16) NOT NULL COMMENT 'Low, Moderate or High',
+    slot TINYINT UNSIGNED NOT NULL,
+    predictions INT NOT NULL DEFAULT 0,
+    risk_score_sum DECIMAL(16,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, gender, age_bucket, risk_level, slot)
+);
+
+-- Age buckets of the rule-based model (AGE_BUCKET_EDGES in risk_scoring.py)
+DELIMITER $$
+CREATE FUNCTION prediction_age_bucket(p_age INT) RETURNS VARCHAR(7)
+DETERMINISTIC NO SQL
+BEGIN
+    RETURN CASE
+        WHEN p_age IS NULL THEN 'unknown'
+        WHEN p_age < 40 THEN '0-39'
+        WHEN p_age < 50 THEN '40-49'
+        WHEN p_age < 60 THEN '50-59'
+        ELSE '60+' END;
+END $$
+DELIMITER ;
+
+-- "High risk of lung cancer" -> "High"; the rules and the model share these labels
+DELIMITER $$
+CREATE FUNCTION prediction_risk_level(p_prediction VARCHAR(255)) RETURNS VARCHAR(16)
+DETERMINISTIC NO SQL
+BEGIN
+    RETURN SUBSTRING_INDEX(p_prediction, ' ', 1);
+END $$
+DELIMITER ;
+
+-- Adds (p_delta = 1) or removes (p_delta = -1) one prediction from its rollup row
+DELIMITER $$
+CREATE PROCEDURE bump_prediction_rollup(
+    IN p_id INT,
+    IN p_prediction_date TIMESTAMP,
+    IN p_gender VARCHAR(10),
+    IN p_age INT,
+    IN p_prediction VARCHAR(255),
+    IN p_risk_score DECIMAL(5,2),
+    IN p_delta INT
+)
+BEGIN
+    INSERT INTO prediction_rollups
+    (day, gender, age_bucket, risk_level, slot, predictions, risk_score_sum)
+    VALUES (DATE(p_prediction_date), p_gender, prediction_age_bucket(p_age),
+            prediction_risk_level(p_prediction), p_id MOD 8, p_delta, p_delta * IFNULL(p_risk_score, 0))
+    ON DUPLICATE KEY UPDATE
+    predictions = predictions + VALUES(predictions),
+    risk_score_sum = risk_score_sum + VALUES(risk_score_sum);
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER prediction_rollups_after_insert
+AFTER INSERT ON predictions
+FOR EACH ROW
+BEGIN
+    CALL bump_prediction_rollup(NEW.id, NEW.prediction_date, NEW.gender, NEW.age,
+                                NEW.prediction, NEW.risk_score, 1);
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER prediction_rollups_after_update
+AFTER UPDATE ON predictions
+FOR EACH ROW
+BEGIN
+    -- Rescoring moves a row between risk levels; other updates leave the rollups alone
+    IF NOT (OLD.prediction_date <=> NEW.prediction_date AND OLD.gender <=> NEW.gender
+            AND OLD.age <=> NEW.age AND OLD.prediction <=> NEW.prediction
+            AND OLD.risk_score <=> NEW.risk_score) THEN
+        CALL bump_prediction_rollup(OLD.id, OLD.prediction_date, OLD.gender, OLD.age,
+                                    OLD.prediction, OLD.risk_score, -1);
+        CALL bump_prediction_rollup(NEW.id, NEW.prediction_date, NEW.gender, NEW.age,
+                                    NEW.prediction, NEW.risk_score, 1);
+    END IF;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER prediction_rollups_after_delete
+AFTER DELETE ON predictions
+FOR EACH ROW
+BEGIN
+    CALL bump_prediction_rollup(OLD.id, OLD.prediction_date, OLD.gender, OLD.age,
+                                OLD.prediction, OLD.risk_score, -1);
+END $$
+DELIMITER ;
+
+-- Sorting belongs to the queries reading the view, not to every read of it
+CREATE OR REPLACE VIEW user_prediction_history AS
+SELECT
+    u.id AS user_id,
+    u.name AS user_name,
+    u.email AS user_email,
+    p.id AS prediction_id,
+    p.age, p.gender, p.smoking, p.cough, p.chest_pain, p.fatigue, p.shortness_of_breath,
+    p.prediction, p.risk_score, p.prediction_date
+FROM users u
+JOIN user_predictions up ON u.id = up.user_id
+JOIN predictions p ON up.prediction_id = p.id;
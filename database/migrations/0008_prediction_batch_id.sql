@@ -0,0 +1,8 @@
+-- 0008: predictions.batch_id for /predict/batch. Rows from one multi-row INSERT are
+-- not guaranteed consecutive ids, so each chunk is tagged and its rows found again
+-- by this column. Databases created from lung_cancer_db.sql already have both.
+
+ALTER TABLE predictions
+    ADD COLUMN batch_id CHAR(32) NULL COMMENT 'Set for rows written by /predict/batch';
+
+CREATE INDEX idx_predictions_batch ON predictions (batch_id);
@@ -0,0 +1,45 @@
+-- 0009: Rules rescoring leaves rows scored by a registry model alone. Before this,
+-- update_all_risk_scores replaced their model score and version with the rules'.
+
+DROP PROCEDURE IF EXISTS update_all_risk_scores;
+
+DELIMITER $$
+CREATE PROCEDURE update_all_risk_scores(IN p_chunk_size INT)
+BEGIN
+    -- Recomputes risk_score and prediction from the stored answers with the weights of
+    -- predict_lung_cancer_risk (risk_scoring.py), one bounded id range per transaction.
+    -- maintenance.py runs the same job from Python with progress and resume support.
+    DECLARE last_id INT DEFAULT 0;
+    DECLARE chunk_end INT;
+
+    chunk_loop: LOOP
+        SELECT MAX(id) INTO chunk_end FROM (
+            SELECT id FROM predictions WHERE id > last_id ORDER BY id LIMIT p_chunk_size
+        ) AS chunk;
+        IF chunk_end IS NULL THEN
+            LEAVE chunk_loop;
+        END IF;
+
+        START TRANSACTION;
+        UPDATE predictions
+        SET risk_score = (
+                CASE WHEN age < 40 THEN 1 WHEN age < 50 THEN 2 WHEN age < 60 THEN 3 ELSE 4 END
+                + CASE WHEN gender = 'Male' THEN 2 ELSE 1 END
+                + 5 * (smoking = 'yes') + 2 * (cough = 'yes') + 3 * (chest_pain = 'yes')
+                + 1 * (fatigue = 'yes') + 3 * (shortness_of_breath = 'yes')),
+            -- Assignments run left to right, so this sees the new risk_score
+            prediction = CASE
+                WHEN risk_score < 6 THEN 'Low risk of lung cancer'
+                WHEN risk_score < 10 THEN 'Moderate risk of lung cancer'
+                ELSE 'High risk of lung cancer' END,
+            model_version = 'rules-v1',  -- RULES_MODEL_VERSION in risk_scoring.py
+            version = version + 1
+        WHERE id > last_id AND id <= chunk_end
+          -- Rows scored by a registry model keep that model's score and version
+          AND (model_version IS NULL OR model_version = 'rules-v1');
+        COMMIT;
+
+        SET last_id = chunk_end;
+    END LOOP;
+END $$
+DELIMITER ;
@@ -0,0 +1,86 @@
+-- 0010: Key prediction_rollups by model_version as well. Rules scores (0-18) and
+-- model probabilities (0-100) are on different scales, so averaging them together
+-- meant nothing. The table is derived data: it is recreated empty here and refilled
+-- with `python maintenance.py rebuild-rollups`.
+
+DROP TRIGGER IF EXISTS prediction_rollups_after_insert;
+DROP TRIGGER IF EXISTS prediction_rollups_after_update;
+DROP TRIGGER IF EXISTS prediction_rollups_after_delete;
+DROP PROCEDURE IF EXISTS bump_prediction_rollup;
+DROP TABLE IF EXISTS prediction_rollups;
+
+-- Each combination is spread over 8 rows (slot = prediction id MOD 8): concurrent
+-- inserts for the same day and bucket then rarely wait on one row's lock. Readers sum the slots.
+CREATE TABLE IF NOT EXISTS prediction_rollups (
+    day DATE NOT NULL,
+    gender ENUM('Male', 'Female', 'Other') NOT NULL,
+    age_bucket VARCHAR(7) NOT NULL COMMENT '0-39, 40-49, 50-59, 60+ or unknown',
+    risk_level VARCHAR(16) NOT NULL COMMENT 'Low, Moderate or High',
+    model_version VARCHAR(64) NOT NULL COMMENT 'predictions.model_version, or unknown when NULL',
+    slot TINYINT UNSIGNED NOT NULL,
+    predictions INT NOT NULL DEFAULT 0,
+    risk_score_sum DECIMAL(16,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, gender, age_bucket, risk_level, model_version, slot)
+);
+
+-- Adds (p_delta = 1) or removes (p_delta = -1) one prediction from its rollup row
+DELIMITER $$
+CREATE PROCEDURE bump_prediction_rollup(
+    IN p_id INT,
+    IN p_prediction_date TIMESTAMP,
+    IN p_gender VARCHAR(10),
+    IN p_age INT,
+    IN p_prediction VARCHAR(255),
+    IN p_risk_score DECIMAL(5,2),
+    IN p_model_version VARCHAR(64),
+    IN p_delta INT
+)
+BEGIN
+    INSERT INTO prediction_rollups
+    (day, gender, age_bucket, risk_level, model_version, slot, predictions, risk_score_sum)
+    VALUES (DATE(p_prediction_date), p_gender, prediction_age_bucket(p_age),
+            prediction_risk_level(p_prediction), IFNULL(p_model_version, 'unknown'), p_id MOD 8,
+            p_delta, p_delta * IFNULL(p_risk_score, 0))
+    ON DUPLICATE KEY UPDATE
+    predictions = predictions + VALUES(predictions),
+    risk_score_sum = risk_score_sum + VALUES(risk_score_sum);
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER prediction_rollups_after_insert
+AFTER INSERT ON predictions
+FOR EACH ROW
+BEGIN
+    CALL bump_prediction_rollup(NEW.id, NEW.prediction_date, NEW.gender, NEW.age,
+                                NEW.prediction, NEW.risk_score, NEW.model_version, 1);
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER prediction_rollups_after_update
+AFTER UPDATE ON predictions
+FOR EACH ROW
+BEGIN
+    -- Rescoring moves a row between risk levels and versions; other updates leave the rollups alone
+    IF NOT (OLD.prediction_date <=> NEW.prediction_date AND OLD.gender <=> NEW.gender
+            AND OLD.age <=> NEW.age AND OLD.prediction <=> NEW.prediction
+            AND OLD.risk_score <=> NEW.risk_score AND OLD.model_version <=> NEW.model_version) THEN
+        CALL bump_prediction_rollup(OLD.id, OLD.prediction_date, OLD.gender, OLD.age,
+                                    OLD.prediction, OLD.risk_score, OLD.model_version, -1);
+        CALL bump_prediction_rollup(NEW.id, NEW.prediction_date, NEW.gender, NEW.age,
+                                    NEW.prediction, NEW.risk_score, NEW.model_version, 1);
+    END IF;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER prediction_rollups_after_delete
+AFTER DELETE ON predictions
+FOR EACH ROW
+BEGIN
+    CALL bump_prediction_rollup(OLD.id, OLD.prediction_date, OLD.gender, OLD.age,
+                                OLD.prediction, OLD.risk_score, OLD.model_version, -1);
+END $$
+DELIMITER ;
+
@@ -0,0 +1,17 @@
+-- 0011: Back up user_predictions, the only link from a prediction to its owner; without
+-- it a restore leaves every prediction orphaned and every user's history empty.
+-- Existing links are stamped with the migration time, so the next backup run copies them.
+
+ALTER TABLE user_predictions
+    ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+CREATE INDEX idx_user_predictions_updated ON user_predictions (updated_at, id);
+
+DELIMITER $$
+CREATE TRIGGER user_predictions_backup_tombstone
+AFTER DELETE ON user_predictions
+FOR EACH ROW
+BEGIN
+    INSERT INTO backup_tombstones (table_name, record_id) VALUES ('user_predictions', OLD.id);
+END $$
+DELIMITER ;
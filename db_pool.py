@@ -0,0 +1,276 @@
+# db_pool.py
+# Process-local MySQL connection pool with overflow, health checks and idle recycling
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+
+from metrics import Histogram
+
+
+class PoolTimeout(Error):
+    """Raised when no connection could be checked out within the pool timeout."""
+
+
+class PooledConnection:
+    """Proxy around a mysql.connector connection that returns itself to the pool on close()."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._checked_out_at = time.monotonic()
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        if self._pool.listeners:
+            return TimedCursor(cursor, self._pool.listeners)
+        return cursor
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._pool._release(self._raw, time.monotonic() - self._checked_out_at)
+
+    def invalidate(self):
+        """Discard the underlying connection instead of returning it to the pool."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pool._discard(self._raw, time.monotonic() - self._checked_out_at)
+
+
+class TimedCursor:
+    """Cursor proxy that reports every statement to listener(operation, params, seconds)."""
+
+    def __init__(self, raw, listeners):
+        self._raw = raw
+        self._listeners = listeners
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def execute(self, operation, params=None, multi=False):
+        started = time.perf_counter()
+        try:
+            return self._raw.execute(operation, params, multi=multi)
+        finally:
+            self._report(operation, params, time.perf_counter() - started)
+
+    def executemany(self, operation, seq_params):
+        started = time.perf_counter()
+        try:
+            return self._raw.executemany(operation, seq_params)
+        finally:
+            # Plans do not depend on which row of the batch is used
+            self._report(operation, seq_params[0] if seq_params else None, time.perf_counter() - started)
+
+    def _report(self, operation, params, seconds):
+        for listener in self._listeners:
+            listener(operation, params, seconds)
+
+
+class ConnectionPool:
+    def __init__(self, connect_args, size=5, max_overflow=10, timeout=5.0,
+                 recycle=1800, ping_interval=30):
+        self.connect_args = dict(connect_args)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+
+        # Idle connections as (raw_connection, returned_at) pairs, most recently used last
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+        # Called as listener(operation, params, seconds) after every statement on a pooled connection
+        self.listeners = []
+
+        # Metrics for sizing the pool
+        self.wait_time = Histogram()
+        self.checkout_time = Histogram()
+        self.counters = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'connects': 0,
+            'recycled': 0,
+            'failed_pings': 0,
+            'discarded': 0,
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        connect_args = dict(config.DB_CONFIG)
+        connect_args.setdefault('autocommit', False)  # Transaction control stays with the caller
+        return cls(
+            connect_args,
+            size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_POOL_MAX_OVERFLOW,
+            timeout=config.DB_POOL_TIMEOUT,
+            recycle=config.DB_POOL_RECYCLE,
+            ping_interval=config.DB_POOL_PING_INTERVAL,
+        )
+
+    def connection(self):
+        """Borrow a connection; callers return it with close() as before."""
+        self._check_fork()
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            raw, returned_at = self._checkout_idle_or_reserve(deadline)
+            if raw is None:
+                # A slot was reserved, open a fresh connection outside the lock
+                try:
+                    raw = self._connect()
+                except Error:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._healthy(raw, returned_at):
+                continue
+            break
+        self.wait_time.observe(time.monotonic() - started)
+        with self._cond:
+            self.counters['checkouts'] += 1
+        return PooledConnection(self, raw)
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            open_connections = self._open
+            counters = dict(self.counters)
+        return {
+            'size': self.size,
+            'max_overflow': self.max_overflow,
+            'open': open_connections,
+            'idle': idle,
+            'in_use': open_connections - idle,
+            'overflow': max(0, open_connections - self.size),
+            'counters': counters,
+            'wait_seconds': self.wait_time.snapshot(),
+            'checkout_seconds': self.checkout_time.snapshot(),
+        }
+
+    def warm(self, count=None):
+        """Open connections until count (default: size) are idle, e.g. when a worker starts."""
+        count = self.size if count is None else min(count, self.size)
+        borrowed = []
+        try:
+            while len(borrowed) < count:
+                borrowed.append(self.connection())
+        finally:
+            for connection in borrowed:
+                connection.close()
+
+    def dispose(self):
+        """Close every idle connection; checked-out connections are closed on return."""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+    # Internal helpers
+    def _check_fork(self):
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                # Each worker process gets its own pool. Inherited connections share the
+                # parent's sockets, so they are forgotten rather than closed.
+                self._idle = deque()
+                self._open = 0
+                self._pid = os.getpid()
+
+    def _checkout_idle_or_reserve(self, deadline):
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, returned_at = self._idle.pop()
+                    if time.monotonic() - returned_at > self.recycle:
+                        self._open -= 1
+                        self.counters['recycled'] += 1
+                        self._close_quietly(raw)
+                        continue
+                    return raw, returned_at
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters['timeouts'] += 1
+                    raise PoolTimeout(msg=f'Timed out after {self.timeout}s waiting for a database connection')
+                self._cond.wait(remaining)
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self.connect_args)
+        with self._cond:
+            self.counters['connects'] += 1
+        return raw
+
+    def _healthy(self, raw, returned_at):
+        # Only ping connections that have been idle long enough to have possibly gone stale
+        if time.monotonic() - returned_at < self.ping_interval:
+            return True
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Error:
+            with self._cond:
+                self._open -= 1
+                self.counters['failed_pings'] += 1
+                self._cond.notify()
+            self._close_quietly(raw)
+            return False
+
+    def _release(self, raw, held_for):
+        self.checkout_time.observe(held_for)
+        try:
+            # Never hand out a connection with an open transaction or snapshot
+            if raw.in_transaction:
+                raw.rollback()
+        except Error:
+            self._discard(raw, None)
+            return
+        with self._cond:
+            if self._open > self.size:
+                # Overflow connection: close it rather than keeping it idle
+                self._open -= 1
+                self._cond.notify()
+                discard = True
+            else:
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+                discard = False
+        if discard:
+            self._close_quietly(raw)
+
+    def _discard(self, raw, held_for):
+        if held_for is not None:
+            self.checkout_time.observe(held_for)
+        with self._cond:
+            self._open -= 1
+            self.counters['discarded'] += 1
+            self._cond.notify()
+        self._close_quietly(raw)
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Error:
+            pass
@@ -0,0 +1,96 @@
+# instrumentation.py
+# Per-route latency histograms and timed spans around the expensive steps of a request
+# (pool checkout, SQL, locks, scoring, template rendering), exported through /metrics
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import before_render_template, g, request, template_rendered
+
+from metrics import Registry
+
+registry = Registry()
+
+request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Time to build a response, by route', ('method', 'route', 'status'))
+span_seconds = registry.histogram(
+    'span_duration_seconds', 'Time spent in one step of a request', ('span',))
+
+# Span totals of the request being handled on this thread, as {name: [seconds, count]}
+_local = threading.local()
+
+
+def record(name, seconds):
+    span_seconds.labels(name).observe(seconds)
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        totals = trace.setdefault(name, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _render_started(sender, template, context, **extra):
+    _local.render_started = time.perf_counter()
+
+
+def _render_finished(sender, template, context, **extra):
+    started = getattr(_local, 'render_started', None)
+    if started is not None:
+        _local.render_started = None
+        record('render_template', time.perf_counter() - started)
+
+
+def init_app(app, slow_request_seconds=0, server_timing=False):
+    """Time every request of app.
+
+    Requests slower than slow_request_seconds are logged with their span breakdown;
+    with server_timing the breakdown is also sent as a Server-Timing header, which
+    browser developer tools display. Streamed bodies are not included in the timing.
+    """
+    @app.before_request
+    def start_request_trace():
+        g.request_started = time.perf_counter()
+        _local.trace = {}
+
+    @app.after_request
+    def finish_request_trace(response):
+        started = g.pop('request_started', None)
+        trace, _local.trace = getattr(_local, 'trace', None), None
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.labels(request.method, route, str(response.status_code)).observe(elapsed)
+
+        if trace and server_timing:
+            entries = [f'{name};dur={total * 1000:.2f}' for name, (total, _) in trace.items()]
+            response.headers['Server-Timing'] = ', '.join(entries + [f'total;dur={elapsed * 1000:.2f}'])
+        if slow_request_seconds and elapsed >= slow_request_seconds:
+            breakdown = ', '.join(f'{name}={total * 1000:.1f}ms/{count}' for name, (total, count) in trace.items())
+            app.logger.warning(f'Slow request {request.method} {request.path} '
+                               f'{elapsed * 1000:.1f}ms: {breakdown or "no spans"}')
+        return response
+
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
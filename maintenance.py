@@ -0,0 +1,207 @@
+"""Batch maintenance jobs for lung_cancer_db.
+
+    python maintenance.py rescore [--chunk-size 5000] [--restart]
+    python maintenance.py expire-locks
+    python maintenance.py rebuild-rollups [--from 2024-01-01] [--to 2024-12-31]
+
+rescore recomputes predictions.risk_score and prediction from the stored answers
+with the weights in risk_scoring.py (and sets model_version to those rules' version).
+Rows scored by a trained model are left as they are; only rows of the rules or of
+an unknown scorer are rescored. It works one id range per transaction, so row locks are
+held only for a single chunk. Progress is checkpointed in maintenance_progress in
+the same transaction as each chunk; an interrupted run resumes where it stopped.
+
+rebuild-rollups recounts prediction_rollups from predictions, one day per
+transaction (by default every day that has predictions). Triggers keep the rollups
+current on their own; this backfills rows written before migration 0007 (and 0010,
+which recreates the table keyed by model version) and repairs
+a range after bulk changes made with the triggers disabled. A day still receiving
+predictions can be rebuilt while it does, though a row inserted while its day is
+being recounted may be counted twice; rebuild that day again afterwards if so.
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import mysql.connector
+
+from config import Config
+from risk_scoring import (AGE_BUCKET_EDGES, AGE_POINTS, GENDER_POINTS, RISK_BAND_EDGES,
+                          RISK_LABELS, RULES_MODEL_VERSION, SYMPTOM_FIELDS, SYMPTOM_WEIGHTS)
+
+RESCORE_JOB = 'rescore_predictions'
+
+
+def risk_score_sql():
+    """SQL expression equal to risk_scoring.compute_risk() for one predictions row."""
+    age = ' '.join(f"WHEN age < {edge} THEN {points}"
+                   for edge, points in zip(AGE_BUCKET_EDGES.tolist(), AGE_POINTS.tolist()))
+    gender = f"CASE WHEN gender = 'Male' THEN {GENDER_POINTS[1]} ELSE {GENDER_POINTS[0]} END"
+    symptoms = ' + '.join(f"{weight} * ({field} = 'yes')"
+                          for field, weight in zip(SYMPTOM_FIELDS, SYMPTOM_WEIGHTS.tolist()))
+    return f"(CASE {age} ELSE {AGE_POINTS[-1]} END + {gender} + {symptoms})"
+
+
+def prediction_sql(score):
+    bands = ' '.join(f"WHEN {score} < {edge} THEN '{label}'"
+                     for edge, label in zip(RISK_BAND_EDGES.tolist(), RISK_LABELS.tolist()))
+    return f"CASE {bands} ELSE '{RISK_LABELS[-1]}' END"
+
+
+def connect():
+    return mysql.connector.connect(**Config.DB_CONFIG, autocommit=False)
+
+
+def load_checkpoint(cursor, job):
+    cursor.execute("SELECT last_id, rows_done FROM maintenance_progress WHERE job = %s", (job,))
+    row = cursor.fetchone()
+    return row if row else (0, 0)
+
+
+def rescore_predictions(connection, chunk_size=5000, restart=False):
+    score = risk_score_sql()
+    # Rows scored by a registry model keep that model's score and version
+    rules_rows = "(model_version IS NULL OR model_version = %s)"
+    update_chunk = f"""
+        UPDATE predictions
+        SET risk_score = {score}, prediction = {prediction_sql(score)}, model_version = %s,
+            version = version + 1
+        WHERE id > %s AND id <= %s AND {rules_rows}
+    """
+    bump_versions = f"""
+        INSERT INTO version_control (table_name, record_id, version_number)
+        SELECT 'predictions', id, 1 FROM predictions WHERE id > %s AND id <= %s AND {rules_rows}
+        ON DUPLICATE KEY UPDATE version_number = version_number + 1
+    """
+    cursor = connection.cursor()
+    try:
+        if restart:
+            cursor.execute("DELETE FROM maintenance_progress WHERE job = %s", (RESCORE_JOB,))
+            connection.commit()
+        last_id, rows_done = load_checkpoint(cursor, RESCORE_JOB)
+        cursor.execute("SELECT MAX(id) FROM predictions")
+        max_id = cursor.fetchone()[0] or 0
+        connection.commit()
+        if last_id:
+            print(f"resuming after id {last_id} ({rows_done} rows already rescored)")
+
+        started = time.monotonic()
+        rescored = 0
+        while True:
+            cursor.execute(
+                "SELECT MAX(id) FROM (SELECT id FROM predictions WHERE id > %s ORDER BY id LIMIT %s) AS chunk",
+                (last_id, chunk_size)
+            )
+            chunk_end = cursor.fetchone()[0]
+            if chunk_end is None:
+                break
+
+            cursor.execute(update_chunk, (RULES_MODEL_VERSION, last_id, chunk_end, RULES_MODEL_VERSION))
+            rescored += cursor.rowcount
+            # Version rows move with the data, in the same set-based way
+            cursor.execute(bump_versions, (last_id, chunk_end, RULES_MODEL_VERSION))
+            cursor.execute("""
+                INSERT INTO maintenance_progress (job, last_id, rows_done) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE last_id = VALUES(last_id), rows_done = VALUES(rows_done)
+            """, (RESCORE_JOB, chunk_end, rows_done + rescored))
+            connection.commit()
+            last_id = chunk_end
+
+            elapsed = time.monotonic() - started
+            percent = 100.0 * min(last_id, max_id) / max_id if max_id else 100.0
+            print(f"rescored {rows_done + rescored} rows, up to id {last_id} ({percent:.1f}%), "
+                  f"{rescored / elapsed if elapsed else 0:.0f} rows/s")
+
+        # Finished: the next run starts from the beginning
+        cursor.execute("DELETE FROM maintenance_progress WHERE job = %s", (RESCORE_JOB,))
+        connection.commit()
+        print(f"done: {rows_done + rescored} rows rescored")
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def rebuild_rollups(connection, first_day=None, last_day=None):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT DATE(MIN(prediction_date)), DATE(MAX(prediction_date)) FROM predictions")
+        oldest, newest = cursor.fetchone()
+        connection.commit()
+        first_day = first_day or oldest
+        last_day = last_day or newest
+        if first_day is None or last_day is None:
+            print("no predictions to count")
+            return
+
+        started = time.monotonic()
+        day, days, counted = first_day, (last_day - first_day).days + 1, 0
+        while day <= last_day:
+            # Same grouping as the bump_prediction_rollup() procedure the triggers call;
+            # adding on duplicate keys keeps counts a concurrent insert already added
+            cursor.execute("DELETE FROM prediction_rollups WHERE day = %s", (day,))
+            cursor.execute("""
+                INSERT INTO prediction_rollups
+                (day, gender, age_bucket, risk_level, model_version, slot, predictions, risk_score_sum)
+                SELECT DATE(prediction_date), gender, prediction_age_bucket(age),
+                       prediction_risk_level(prediction), IFNULL(model_version, 'unknown'), id MOD 8,
+                       COUNT(*), SUM(IFNULL(risk_score, 0))
+                FROM predictions
+                WHERE prediction_date >= %s AND prediction_date < %s
+                GROUP BY 1, 2, 3, 4, 5, 6
+                ON DUPLICATE KEY UPDATE
+                predictions = predictions + VALUES(predictions),
+                risk_score_sum = risk_score_sum + VALUES(risk_score_sum)
+            """, (day, day + timedelta(days=1)))
+            connection.commit()
+            counted += 1
+            if counted % 30 == 0 or day == last_day:
+                elapsed = time.monotonic() - started
+                print(f"rebuilt {counted}/{days} days, up to {day} "
+                      f"({counted / elapsed if elapsed else 0:.1f} days/s)")
+            day += timedelta(days=1)
+        print(f"done: rollups rebuilt from {first_day} to {last_day}")
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def expire_locks(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("DELETE FROM lock_management WHERE lock_timeout < CURRENT_TIMESTAMP")
+        connection.commit()
+        print(f"released {cursor.rowcount} expired locks")
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch maintenance jobs for lung_cancer_db')
+    subcommands = parser.add_subparsers(dest='job', required=True)
+    rescore = subcommands.add_parser('rescore', help='recompute risk scores in bounded chunks')
+    rescore.add_argument('--chunk-size', type=int, default=5000, help='rows per transaction')
+    rescore.add_argument('--restart', action='store_true', help='ignore any saved checkpoint')
+    subcommands.add_parser('expire-locks', help='release expired rows in lock_management')
+    rollups = subcommands.add_parser('rebuild-rollups', help='recount prediction_rollups from predictions')
+    rollups.add_argument('--from', dest='first_day', type=date.fromisoformat, help='first day (default: oldest)')
+    rollups.add_argument('--to', dest='last_day', type=date.fromisoformat, help='last day (default: newest)')
+    args = parser.parse_args()
+
+    connection = connect()
+    try:
+        if args.job == 'rescore':
+            rescore_predictions(connection, args.chunk_size, args.restart)
+        elif args.job == 'rebuild-rollups':
+            rebuild_rollups(connection, args.first_day, args.last_day)
+        else:
+            expire_locks(connection)
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
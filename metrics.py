@@ -0,0 +1,112 @@
+# metrics.py
+# Small, dependency-free metric primitives shared by the pool and other subsystems
+import bisect
+import threading
+
+# Default latency buckets in seconds (upper bounds, +Inf is implicit)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed bucket upper bounds."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return {'buckets': cumulative, 'sum': total, 'count': count}
+
+
+class HistogramFamily:
+    """Histograms of one metric, one per combination of label values."""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def collect(self):
+        with self._lock:
+            children = list(self._children.items())
+        samples = [(dict(zip(self.labelnames, values)), child.snapshot()) for values, child in children]
+        return [(self.name, 'histogram', self.help, samples)]
+
+
+class Registry:
+    """Metric families plus collector callables, rendered in the Prometheus text format.
+
+    A collector returns a list of (name, type, help, samples) where samples are
+    (labels, value) pairs; histogram values are Histogram.snapshot() dicts.
+    """
+
+    def __init__(self):
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        family = HistogramFamily(name, help, labelnames, buckets)
+        self.register(family.collect)
+        return family
+
+    def register(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            collectors = list(self._collectors)
+        lines = []
+        for collector in collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    if kind == 'histogram':
+                        for bound, count in value['buckets']:
+                            lines.append(f'{name}_bucket{_format_labels(labels, le=bound)} {count}')
+                        lines.append(f'{name}_sum{_format_labels(labels)} {value["sum"]}')
+                        lines.append(f'{name}_count{_format_labels(labels)} {value["count"]}')
+                    else:
+                        lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
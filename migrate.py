@@ -0,0 +1,198 @@
+"""Versioned schema migrations for lung_cancer_db.
+
+Migrations live in database/migrations as NNNN_description.sql and are applied in
+order, once each; applied versions are recorded in schema_migrations. Re-running is
+safe: "already exists" errors from a partially applied migration are skipped.
+
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied and pending migrations
+    python migrate.py --check    # fail if any route query plans a full table scan
+
+The plan check should see the schema migrations produce, not lung_cancer_db.sql,
+which can define columns ahead of them. --database points any mode at another
+database, e.g. a restored copy of a deployed database, whose schema came from migrations:
+
+    python migrate.py --database lung_cancer_copy && python migrate.py --database lung_cancer_copy --check
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+import mysql.connector
+from mysql.connector import Error, errorcode
+
+import queries
+from config import Config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+# Errors meaning a statement's effect is already in place
+ALREADY_APPLIED = {
+    errorcode.ER_TABLE_EXISTS_ERROR,
+    errorcode.ER_DUP_FIELDNAME,
+    errorcode.ER_DUP_KEYNAME,
+    errorcode.ER_CANT_DROP_FIELD_OR_KEY,
+    errorcode.ER_SP_ALREADY_EXISTS,
+    errorcode.ER_TRG_ALREADY_EXISTS,
+    errorcode.ER_EVENT_ALREADY_EXISTS,
+}
+
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, encoding='utf-8') as f:
+            sql = f.read()
+        migrations.append({
+            'version': int(match.group(1)),
+            'name': match.group(2),
+            'sql': sql,
+            'checksum': hashlib.sha256(sql.encode('utf-8')).hexdigest(),
+        })
+    return migrations
+
+
+def split_statements(sql):
+    """Split a script into statements, honouring mysql-client style DELIMITER lines."""
+    statements, current, delimiter = [], [], ';'
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith('DELIMITER '):
+            delimiter = stripped.split()[1]
+            continue
+        if not current and (not stripped or stripped.startswith('--')):
+            continue
+        if stripped.endswith(delimiter):
+            current.append(line.rstrip()[:-len(delimiter)])
+            statements.append('\n'.join(current).strip())
+            current = []
+        else:
+            current.append(line)
+    if '\n'.join(current).strip():
+        statements.append('\n'.join(current).strip())
+    return statements
+
+
+def connect(database=None):
+    settings = dict(Config.DB_CONFIG, database=database or Config.DB_CONFIG['database'])
+    return mysql.connector.connect(**settings, autocommit=True)
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_migrations(cursor):
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cursor.fetchall())
+
+
+def apply_pending(connection):
+    cursor = connection.cursor()
+    try:
+        ensure_migrations_table(cursor)
+        # Only one migrator at a time
+        cursor.execute("SELECT GET_LOCK('schema_migrations', 60)")
+        if cursor.fetchone()[0] != 1:
+            raise SystemExit('Another migration run holds the schema_migrations lock')
+        try:
+            applied = applied_migrations(cursor)
+            for migration in discover_migrations():
+                version = migration['version']
+                if version in applied:
+                    if applied[version] != migration['checksum']:
+                        print(f"warning: {version:04d}_{migration['name']} changed after it was applied")
+                    continue
+                print(f"applying {version:04d}_{migration['name']}")
+                for statement in split_statements(migration['sql']):
+                    try:
+                        cursor.execute(statement)
+                    except Error as e:
+                        if e.errno not in ALREADY_APPLIED:
+                            raise
+                        print(f"  skipped (already applied): {e.msg}")
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (version, migration['name'], migration['checksum'])
+                )
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('schema_migrations')")
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def print_status(connection):
+    cursor = connection.cursor()
+    try:
+        ensure_migrations_table(cursor)
+        applied = applied_migrations(cursor)
+    finally:
+        cursor.close()
+    for migration in discover_migrations():
+        state = 'applied' if migration['version'] in applied else 'pending'
+        print(f"{migration['version']:04d}_{migration['name']:<40} {state}")
+
+
+def check_query_plans(connection):
+    """EXPLAIN every route query and report the ones that scan a whole table.
+
+    Plans depend on table statistics, so run this against realistically sized data.
+    """
+    cursor = connection.cursor(dictionary=True)
+    failures = []
+    try:
+        for name, sql, params in queries.EXPLAIN_CHECKS:
+            try:
+                cursor.execute('EXPLAIN ' + sql, params)
+            except Error as e:
+                # Usually a column or index no migration creates
+                failures.append((name, f"cannot be planned: {e.msg}"))
+                continue
+            for row in cursor.fetchall():
+                if row.get('type') == 'ALL':
+                    failures.append((name, f"reads every row of {row.get('table')}"))
+    finally:
+        cursor.close()
+    for name, problem in failures:
+        print(f"failed: {name} {problem}")
+    if not failures:
+        print(f"ok: {len(queries.EXPLAIN_CHECKS)} queries use indexes")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply lung_cancer_db schema migrations')
+    parser.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    parser.add_argument('--check', action='store_true', help='fail if a route query does a full table scan')
+    parser.add_argument('--database', help='database to use instead of DB_NAME')
+    args = parser.parse_args()
+
+    connection = connect(args.database)
+    try:
+        if args.status:
+            print_status(connection)
+        elif args.check:
+            sys.exit(0 if check_query_plans(connection) else 1)
+        else:
+            apply_pending(connection)
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
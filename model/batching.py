@@ -0,0 +1,94 @@
+# batching.py
+# Micro-batching scheduler: coalesces concurrent single-row predictions into one call
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """Scores submitted items with one batch_fn(items) call that returns one result
+    per item. A lone item is scored at once; when others are already queued, the
+    batch keeps collecting for up to max_wait seconds or max_batch items.
+
+    The worker thread starts on first use, and again after a fork, so every worker
+    process gets its own scheduler.
+    """
+
+    def __init__(self, batch_fn, max_batch=32, max_wait=0.005):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait = Histogram()
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def submit(self, item):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        return future
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def stats(self):
+        return {
+            'max_batch': self.max_batch,
+            'max_wait_seconds': self.max_wait,
+            'batch_size': self.batch_size.snapshot(),
+            'queue_wait_seconds': self.queue_wait.snapshot(),
+        }
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Items queued before a fork belong to the parent process
+                self._queue = queue.SimpleQueue()
+                threading.Thread(target=self._run, name='prediction-batcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        pending = self._queue
+        while True:
+            batch = [pending.get()]
+            # Take whatever is already queued without waiting
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            # Nothing else was waiting: no concurrency to coalesce, so don't sit out the window
+            deadline = time.monotonic() + self.max_wait if len(batch) > 1 else 0
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._score(batch)
+
+    def _score(self, batch):
+        started = time.monotonic()
+        self.batch_size.observe(len(batch))
+        for _, _, enqueued in batch:
+            self.queue_wait.observe(started - enqueued)
+        try:
+            results = self.batch_fn([item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
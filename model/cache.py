@@ -0,0 +1,67 @@
+# cache.py
+# Bounded LRU/TTL memoization of prediction results keyed on canonical feature vectors
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters.
+
+    Each entry is tagged with the "model_version" of the result it holds. When
+    current_version is given, get() only returns entries tagged with the version it
+    returns now, so a result scored by a replaced model is never served, even one
+    put by a request that was still running on the old model when it was swapped.
+    """
+
+    def __init__(self, maxsize=4096, ttl=300, current_version=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.current_version = current_version
+        self._entries = OrderedDict()  # key -> (expires_at, model_version, value)
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'stale': 0, 'invalidations': 0}
+
+    def get(self, key):
+        now = time.monotonic()
+        version = self.current_version() if self.current_version else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            expires_at, entry_version, value = entry
+            if expires_at < now or (self.current_version and entry_version != version):
+                del self._entries[key]
+                self.counters['expired' if expires_at < now else 'stale'] += 1
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return dict(value)
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value.get('model_version'), dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.counters['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            size = len(self._entries)
+        lookups = counters['hits'] + counters['misses']
+        return {
+            'size': size,
+            'maxsize': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'hit_ratio': counters['hits'] / lookups if lookups else 0.0,
+            'counters': counters,
+        }
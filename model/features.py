@@ -0,0 +1,159 @@
+# features.py
+# Feature encoding shared by training and serving. The encoder is compiled once from
+# the training column list into one step per column, so /predict forms, JSON batches
+# and survey CSV chunks are all coded the same way: float32 rows in FEATURE_COLUMNS
+# order, answers as the survey codes them (1 = no, 2 = yes) and GENDER M -> 1, F -> 0.
+import hashlib
+import json
+from collections.abc import Mapping
+
+import numpy as np
+
+# Training column order of "survey lung cancer.csv" (without LUNG_CANCER)
+FEATURE_COLUMNS = [
+    'GENDER', 'AGE', 'SMOKING', 'YELLOW_FINGERS', 'ANXIETY', 'PEER_PRESSURE',
+    'CHRONIC DISEASE', 'FATIGUE ', 'ALLERGY ', 'WHEEZING', 'ALCOHOL CONSUMING',
+    'COUGHING', 'SHORTNESS OF BREATH', 'SWALLOWING DIFFICULTY', 'CHEST PAIN',
+]
+
+# Form/JSON fields collected by /predict and the survey column each one feeds
+FORM_FIELDS = {
+    'gender': 'GENDER',
+    'age': 'AGE',
+    'smoking': 'SMOKING',
+    'fatigue': 'FATIGUE ',
+    'cough': 'COUGHING',
+    'shortness_of_breath': 'SHORTNESS OF BREATH',
+    'chest_pain': 'CHEST PAIN',
+}
+
+# Accepted spellings, matched after str().strip().lower()
+GENDER_CODES = {'m': 1, 'male': 1, '1': 1, 'f': 0, 'female': 0, 'other': 0, '0': 0}
+ANSWER_CODES = {'yes': 2, '2': 2, 'true': 2, 'no': 1, '1': 1, 'false': 1}
+NO_ANSWER = ANSWER_CODES['no']
+
+
+def _normalize_name(name):
+    # "chest_pain", "CHEST PAIN" and "FATIGUE " all name their survey column
+    return str(name).strip().upper().replace('_', ' ')
+
+
+def _value_key(value):
+    if isinstance(value, (bool, np.bool_)):
+        return 'true' if value else 'false'
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        value = int(value)
+    return str(value).strip().lower()
+
+
+class FeatureEncoder:
+    """Encodes patients into model input for a fixed list of training columns.
+
+    Each column is compiled to a step: 'number' (AGE), 'gender', or 'answer' for
+    the yes/no questions. Columns the input does not carry fall back to `defaults`
+    (a column without a default is required). Inputs are matched to columns by
+    name, ignoring case, surrounding spaces and "_" vs " ", or through `fields`.
+    """
+
+    def __init__(self, columns, fields=None, defaults=None):
+        self.columns = list(columns)
+        self.defaults = dict(defaults or {})
+        self._aliases = {_normalize_name(column): index for index, column in enumerate(self.columns)}
+        for field, column in (fields or {}).items():
+            self._aliases[_normalize_name(field)] = self.columns.index(column)
+        self._steps = [self._compile(column) for column in self.columns]
+        self.signature = hashlib.sha256(json.dumps(
+            [self.columns, [step[0] for step in self._steps], GENDER_CODES, ANSWER_CODES,
+             [self.defaults.get(column) for column in self.columns]]
+        ).encode()).hexdigest()
+
+    @staticmethod
+    def _compile(column):
+        name = _normalize_name(column)
+        if name == 'AGE':
+            return ('number', None)
+        if name == 'GENDER':
+            return ('gender', GENDER_CODES)
+        return ('answer', ANSWER_CODES)
+
+    def _sources(self, names):
+        """Input name for each column index, resolved once per call."""
+        sources = {}
+        for name in names:
+            index = self._aliases.get(_normalize_name(name)) if name is not None else None
+            if index is not None:
+                sources.setdefault(index, name)
+        for index, column in enumerate(self.columns):
+            if index not in sources and column not in self.defaults:
+                raise KeyError(f'missing {column.strip()}')
+        return sources
+
+    def encode_record(self, record):
+        """One form/JSON submission -> a float32 row of len(columns)."""
+        sources = self._sources(record.keys())
+        row = np.empty(len(self.columns), dtype=np.float32)
+        for index, (kind, codes) in enumerate(self._steps):
+            if index not in sources:
+                row[index] = self.defaults[self.columns[index]]
+                continue
+            value = record[sources[index]]
+            if kind == 'number':
+                row[index] = float(value)
+            else:
+                code = codes.get(_value_key(value))
+                if code is None:
+                    raise ValueError(f'invalid {self.columns[index].strip()}: {value!r}')
+                row[index] = code
+        return row
+
+    def encode(self, data, out=None):
+        """Many patients -> a C-contiguous float32 matrix, one row per patient.
+
+        data is a DataFrame, a dict of column arrays, or a list of records (a JSON
+        batch). Each column is coded in one vectorized step; out may be a
+        preallocated (rows, len(columns)) float32 array to fill instead.
+        """
+        if not isinstance(data, Mapping) and not hasattr(data, 'columns'):
+            # A JSON batch: one list per field, keyed by the first record's fields
+            records = list(data)
+            data = {name: [record[name] for record in records] for name in (records[0] if records else {})}
+        names = list(data.columns) if hasattr(data, 'columns') else list(data.keys())
+        sources = self._sources(names)
+        rows = len(data[names[0]]) if names else 0
+        if out is None:
+            out = np.empty((rows, len(self.columns)), dtype=np.float32)
+        elif out.shape != (rows, len(self.columns)) or out.dtype != np.float32 or not out.flags.c_contiguous:
+            raise ValueError(f'out must be a C-contiguous float32 array of shape {(rows, len(self.columns))}')
+
+        for index, (kind, codes) in enumerate(self._steps):
+            if index not in sources:
+                out[:, index] = self.defaults[self.columns[index]]
+                continue
+            values = np.asarray(data[sources[index]])
+            if kind == 'number':
+                out[:, index] = values
+            else:
+                out[:, index] = self._lookup(values, codes, self.columns[index])
+        return out
+
+    @staticmethod
+    def _lookup(values, codes, column):
+        # Spellings are resolved per distinct value, not per row
+        if values.dtype == object:
+            values = values.astype(str)
+        distinct, inverse = np.unique(values, return_inverse=True)
+        mapped = np.empty(len(distinct), dtype=np.float32)
+        for position, value in enumerate(distinct):
+            code = codes.get(_value_key(value))
+            if code is None:
+                raise ValueError(f'invalid {column.strip()}: {value!r}')
+            mapped[position] = code
+        return mapped[inverse.reshape(-1)]
+
+
+# Compiled once per process. Survey questions the form does not ask are coded "no".
+encoder = FeatureEncoder(
+    FEATURE_COLUMNS,
+    fields=FORM_FIELDS,
+    defaults={column: NO_ANSWER for column in FEATURE_COLUMNS if column not in FORM_FIELDS.values()},
+)
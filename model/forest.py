@@ -0,0 +1,123 @@
+# forest.py
+# Flat, array-backed RandomForest evaluator for low-latency inference without sklearn.
+#
+# Export:  python -m model.forest [--model model/model.pkl] [--output model/forest.npz]
+import argparse
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FOREST_PATH = os.path.join(BASE_DIR, 'forest.npz')
+
+LEAF = -1  # sklearn's TREE_LEAF marker for children_left/children_right
+
+
+class FlatForest:
+    """All trees of a fitted forest stored back to back in contiguous arrays.
+
+    Node i of tree t lives at roots[t] + i; left/right already hold absolute indexes.
+    value holds each node's class distribution normalized like DecisionTreeClassifier
+    .predict_proba, so averaging leaf rows reproduces the forest's probabilities.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        # Leaves point to themselves so every row can take the same number of steps
+        self._max_depth = _max_depth(left, right, roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == LEAF
+            node_ids = np.arange(tree.node_count)
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            # Same normalization as sklearn's tree predict_proba (zero rows stay zero)
+            node_values = tree.value[:, 0, :].astype(np.float64)
+            normalizer = node_values.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(node_values / normalizer)
+            offset += tree.node_count
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.intp),
+            classes=np.asarray(model.classes_),
+        )
+
+    def save(self, path=DEFAULT_FOREST_PATH):
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left,
+                 right=self.right, value=self.value, roots=self.roots, classes=self.classes)
+
+    @classmethod
+    def load(cls, path=DEFAULT_FOREST_PATH):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_trees, n_rows)."""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        rows = np.arange(X.shape[0])
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self._max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # Accumulate tree by tree in estimator order, exactly as RandomForestClassifier does
+        proba = np.zeros((leaves.shape[1], self.value.shape[1]), dtype=np.float64)
+        for tree_leaves in leaves:
+            proba += self.value[tree_leaves]
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def _max_depth(left, right, roots):
+    depth = 0
+    frontier = np.asarray(roots)
+    while True:
+        children = np.concatenate([left[frontier], right[frontier]])
+        internal = children[children != np.concatenate([frontier, frontier])]
+        if internal.size == 0:
+            return depth
+        frontier = np.unique(internal)
+        depth += 1
+
+
+def main():
+    import joblib
+    from model.inference import DEFAULT_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description='Flatten model.pkl into a FlatForest archive')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--output', default=DEFAULT_FOREST_PATH)
+    args = parser.parse_args()
+
+    FlatForest.from_sklearn(joblib.load(args.model)).save(args.output)
+    print(f"Forest written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+# inference.py
+# In-process inference engine for the trained RandomForest model, hot-swapped when a
+# new version is promoted in the model registry
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import joblib
+import numpy as np
+
+from model.features import FEATURE_COLUMNS, encoder as feature_encoder
+from model.forest import FlatForest
+from model.registry import ModelRegistry, file_sha256
+
+logger = logging.getLogger('model')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, 'model.pkl')
+
+# Probability of the positive class mapped to the labels used by the rule-based scorer
+RISK_BANDS = ((0.35, "Low risk of lung cancer"), (0.7, "Moderate risk of lung cancer"))
+HIGH_RISK = "High risk of lung cancer"
+RISK_BAND_EDGES = np.array([upper for upper, _ in RISK_BANDS])
+RISK_BAND_LABELS = np.array([label for _, label in RISK_BANDS] + [HIGH_RISK])
+
+
+# One loaded model; swapped as a whole so a prediction never mixes two versions
+LoadedModel = namedtuple('LoadedModel', 'model forest version source')
+
+
+class InferenceEngine:
+    """Serves predictions from the registry's current version, or from model.pkl
+    when nothing has been promoted.
+
+    The model is memory-mapped on first use; call load() before forking workers so
+    they share the loaded pages copy-on-write. Fitted forests are read-only, so
+    concurrent predict calls from request threads are safe once loaded. reload()
+    and the watch() thread swap in a new model with one reference assignment:
+    calls already running finish on the model they started with.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, registry=None):
+        self.model_path = model_path
+        self.registry = registry
+        self.listeners = []  # Called with the new version after every swap
+        self._loaded = None
+        self._lock = threading.Lock()
+        self._watch_pid = None
+
+    @property
+    def model(self):
+        return self._current().model
+
+    @property
+    def version(self):
+        return self._current().version
+
+    def load(self):
+        with self._lock:
+            if self._loaded is None:
+                self._loaded = self._read()
+            return self._loaded.model
+
+    def reload(self):
+        """Read the current version again and swap it in; on error the current model stays."""
+        loaded = self._read()
+        with self._lock:
+            previous, self._loaded = self._loaded, loaded
+        if previous is None or previous.version != loaded.version:
+            for listener in self.listeners:
+                listener(loaded.version)
+        return loaded.model
+
+    def is_stale(self):
+        """True when the registry (or model.pkl) now holds something other than the
+        loaded model, e.g. in a worker forked after a promotion from a master that
+        loaded the previous version."""
+        loaded = self._loaded
+        return loaded is not None and self._source() != loaded.source
+
+    def watch(self, interval):
+        """Check for a newly promoted version every interval seconds and reload in the
+        background. Started once per process, and again after a fork."""
+        if self._watch_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watch_pid != os.getpid():
+                threading.Thread(target=self._watch, args=(interval,), name='model-watcher', daemon=True).start()
+                self._watch_pid = os.getpid()
+
+    def _watch(self, interval):
+        failed = None
+        while True:
+            time.sleep(interval)
+            loaded = self._loaded
+            try:
+                source = self._source()
+            except OSError as e:
+                logger.error('Cannot read the model registry: %s', e)
+                continue
+            if loaded is None or source == loaded.source or source == failed:
+                continue
+            try:
+                self.reload()
+                failed = None
+                logger.info('Now serving model %s', self.version)
+            except Exception as e:
+                # Keep serving the current model; retry once the source changes again
+                failed = source
+                logger.error('Not switching models: %s failed to load: %s', source, e)
+
+    def _source(self):
+        """What should be loaded: ('registry', version) or ('file', mtime, size)."""
+        version = self.registry.current() if self.registry else None
+        if version:
+            return ('registry', version)
+        stat = os.stat(self.model_path)
+        return ('file', stat.st_mtime_ns, stat.st_size)
+
+    def _read(self):
+        source = self._source()
+        if source[0] == 'registry':
+            version = source[1]
+            path = self.registry.model_path(version)
+            # Refuse a corrupted or half-copied artifact before unpickling it
+            self.registry.verify(version)
+            # ...and one trained on features coded differently from how they are served
+            trained_encoder = self.registry.metrics(version).get('encoder')
+            if trained_encoder and trained_encoder != feature_encoder.signature:
+                raise ValueError(f'{version} was trained with feature encoder {trained_encoder[:12]}, '
+                                 f'this code serves {feature_encoder.signature[:12]}')
+        else:
+            path = self.model_path
+            version = 'file-' + file_sha256(path)[:12]
+        model = joblib.load(path, mmap_mode='r')
+        # Inputs are plain arrays in FEATURE_COLUMNS order; dropping the fitted
+        # names avoids a feature-name warning on every call
+        if hasattr(model, 'feature_names_in_'):
+            if list(model.feature_names_in_) != FEATURE_COLUMNS:
+                raise ValueError(f'{path} was trained on unexpected columns')
+            del model.feature_names_in_
+        # Request threads already provide the parallelism
+        model.n_jobs = None
+        # Per-call sklearn overhead dwarfs walking the trees for a few rows, so
+        # serve from the flattened copy; it gives identical probabilities
+        forest = FlatForest.from_sklearn(model) if hasattr(model, 'estimators_') else None
+        return LoadedModel(model, forest, version, source)
+
+    def _current(self):
+        loaded = self._loaded
+        if loaded is None:
+            self.load()
+            loaded = self._loaded
+        return loaded
+
+    def predict(self, features):
+        loaded = self._current()
+        return (loaded.forest or loaded.model).predict(np.atleast_2d(features))
+
+    def predict_proba(self, features):
+        """Probability of lung cancer (class 1) for each row."""
+        return self.predict_proba_versioned(features)[0]
+
+    def predict_proba_versioned(self, features):
+        """predict_proba() and the version of the model that produced it."""
+        loaded = self._current()
+        proba = (loaded.forest or loaded.model).predict_proba(np.atleast_2d(features))
+        return proba[:, list(loaded.model.classes_).index(1)], loaded.version
+
+    def assess(self, data):
+        """Score one /predict form submission; same result shape as predict_lung_cancer_risk."""
+        probabilities, version = self.predict_proba_versioned(feature_encoder.encode_record(data))
+        return risk_result(float(probabilities[0]), version)
+
+
+def risk_result(probability, model_version=None):
+    prediction = HIGH_RISK
+    for upper, label in RISK_BANDS:
+        if probability < upper:
+            prediction = label
+            break
+    return {
+        "prediction": prediction,
+        "risk_score": round(probability * 100, 2),
+        "model_version": model_version,
+    }
+
+
+def risk_results(probabilities):
+    """risk_result() for many probabilities at once: (risk_score, prediction label) arrays."""
+    probabilities = np.asarray(probabilities)
+    band = np.searchsorted(RISK_BAND_EDGES, probabilities, side='right')
+    return np.round(probabilities * 100, 2), RISK_BAND_LABELS[band]
+
+
+# Process-wide engine used by app.py
+engine = InferenceEngine(registry=ModelRegistry())
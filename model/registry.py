@@ -0,0 +1,150 @@
+# registry.py
+# Local model registry. Every trained model is an immutable directory
+# model/artifacts/<version>/ holding model.pkl, its SHA-256 (model.pkl.sha256, in
+# sha256sum format) and metrics.json. The file CURRENT names the version being served;
+# it is replaced with a single rename, so a reader sees the old version or the new one.
+#
+#     python -m model.registry list
+#     python -m model.registry promote <version>
+#     python -m model.registry verify [<version>]
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import joblib
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_REGISTRY_DIR = os.path.join(BASE_DIR, 'artifacts')
+
+MODEL_FILE = 'model.pkl'
+CHECKSUM_FILE = 'model.pkl.sha256'
+METRICS_FILE = 'metrics.json'
+CURRENT_FILE = 'CURRENT'
+HASH_BLOCK_SIZE = 1 << 20
+
+
+class ChecksumMismatch(Exception):
+    """Raised when an artifact's model.pkl no longer matches its recorded SHA-256."""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_REGISTRY_DIR):
+        self.root = root
+
+    def model_path(self, version):
+        return os.path.join(self.root, version, MODEL_FILE)
+
+    def versions(self):
+        """Published versions, oldest first (version names sort by creation time)."""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        # Artifacts being written live in dot-prefixed staging directories
+        return sorted(name for name in names if not name.startswith('.')
+                      and os.path.isfile(os.path.join(self.root, name, CHECKSUM_FILE)))
+
+    def add(self, version, model, metrics):
+        """Write a new artifact. It appears under its version complete or not at all,
+        and an existing version is never overwritten."""
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f'.{version}.', dir=self.root)
+        try:
+            # Uncompressed so the inference engine can memory-map it
+            joblib.dump(model, os.path.join(staging, MODEL_FILE))
+            checksum = file_sha256(os.path.join(staging, MODEL_FILE))
+            with open(os.path.join(staging, METRICS_FILE), 'w', encoding='utf-8') as f:
+                json.dump(dict(metrics, version=version, sha256=checksum), f, indent=2, default=str)
+                f.write('\n')
+            with open(os.path.join(staging, CHECKSUM_FILE), 'w', encoding='utf-8') as f:
+                f.write(f'{checksum}  {MODEL_FILE}\n')
+            for name in (MODEL_FILE, METRICS_FILE, CHECKSUM_FILE):
+                os.chmod(os.path.join(staging, name), 0o444)
+            os.rename(staging, os.path.join(self.root, version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return os.path.join(self.root, version)
+
+    def checksum(self, version):
+        with open(os.path.join(self.root, version, CHECKSUM_FILE), encoding='utf-8') as f:
+            return f.read().split()[0]
+
+    def verify(self, version):
+        expected = self.checksum(version)
+        actual = file_sha256(self.model_path(version))
+        if actual != expected:
+            raise ChecksumMismatch(f'{self.model_path(version)} has SHA-256 {actual}, expected {expected}')
+        return actual
+
+    def metrics(self, version):
+        with open(os.path.join(self.root, version, METRICS_FILE), encoding='utf-8') as f:
+            return json.load(f)
+
+    def current(self):
+        """The promoted version, or None when nothing has been promoted."""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def promote(self, version):
+        """Verify an artifact and make it the one served."""
+        self.verify(version)
+        staging = os.path.join(self.root, f'.{CURRENT_FILE}.{os.getpid()}')
+        with open(staging, 'w', encoding='utf-8') as f:
+            f.write(version + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging, os.path.join(self.root, CURRENT_FILE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage trained model versions')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='list versions with their holdout metrics')
+    promote = commands.add_parser('promote', help='verify a version and serve it')
+    promote.add_argument('version')
+    verify = commands.add_parser('verify', help='check checksums (all versions by default)')
+    verify.add_argument('version', nargs='?')
+    parser.add_argument('--root', default=DEFAULT_REGISTRY_DIR)
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == 'list':
+        current = registry.current()
+        for version in registry.versions():
+            holdout = registry.metrics(version).get('holdout') or {}
+            marker = '*' if version == current else ' '
+            print(f"{marker} {version:<32} accuracy {holdout.get('accuracy', float('nan')):.4f}  "
+                  f"roc_auc {holdout.get('roc_auc', float('nan')):.4f}")
+    elif args.command == 'promote':
+        registry.promote(args.version)
+        print(f"{args.version} is now current")
+    else:
+        failed = False
+        for version in [args.version] if args.version else registry.versions():
+            try:
+                registry.verify(version)
+                print(f"ok      {version}")
+            except (ChecksumMismatch, OSError) as e:
+                print(f"FAILED  {version}: {e}")
+                failed = True
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
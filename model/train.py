@@ -0,0 +1,250 @@
+# train.py
+# Offline training for the RandomForest lung cancer model.
+# Run from the repository root:
+#     python -m model.train                         # search, fit, write a versioned artifact
+#     python -m model.train --warm-start current --add-trees 100 --data new.csv
+#
+# The parsed dataset is cached as .npy arrays under model/.cache, keyed by the CSV's
+# SHA-256 and the feature encoding (model/features.py), so retraining on the same file skips parsing. Hyperparameters are chosen by
+# stratified k-fold cross-validation, with candidate fits spread over all cores.
+# Each run adds a version to the model registry (model/registry.py) and promotes it,
+# so running workers pick it up without a restart.
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, classification_report, f1_score, roc_auc_score
+from sklearn.model_selection import GridSearchCV, RandomizedSearchCV, StratifiedKFold, train_test_split
+
+from model.features import FEATURE_COLUMNS, encoder as feature_encoder
+from model.registry import DEFAULT_REGISTRY_DIR, ModelRegistry, file_sha256
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA = os.path.join(BASE_DIR, 'survey lung cancer.csv')
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, 'model', '.cache')
+
+TARGET_COLUMN = 'LUNG_CANCER'
+CSV_CHUNK_ROWS = 200000
+
+# Searched by default; --search random samples --n-iter candidates from it instead
+PARAM_GRID = {
+    'n_estimators': [100, 300],
+    'max_depth': [None, 8, 16],
+    'min_samples_leaf': [1, 5],
+    'max_features': ['sqrt', 0.5],
+}
+
+
+def encode_chunk(frame):
+    """Survey rows -> (float32 features in FEATURE_COLUMNS order, int8 target)."""
+    # The encoder the inference engine uses, so both sides code features identically
+    features = feature_encoder.encode(frame[FEATURE_COLUMNS])
+    target = frame[TARGET_COLUMN].str.strip().str.upper().eq('YES').to_numpy(dtype=np.int8)
+    return features, target
+
+
+def parse_csv(path):
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [column for column in FEATURE_COLUMNS + [TARGET_COLUMN] if column not in header]
+    if missing:
+        raise ValueError(f'{path} is missing columns: {missing}')
+    dtypes = {column: str if column == 'GENDER' else np.int32 for column in FEATURE_COLUMNS}
+    dtypes[TARGET_COLUMN] = str
+    features, targets = [], []
+    # Read in chunks so only one chunk of text-parsed rows exists at a time
+    for frame in pd.read_csv(path, usecols=FEATURE_COLUMNS + [TARGET_COLUMN], dtype=dtypes,
+                             chunksize=CSV_CHUNK_ROWS):
+        chunk_features, chunk_target = encode_chunk(frame)
+        features.append(chunk_features)
+        targets.append(chunk_target)
+    return np.concatenate(features), np.concatenate(targets)
+
+
+def load_dataset(path, cache_dir=DEFAULT_CACHE_DIR):
+    """Encoded (features, target) of a survey CSV and its SHA-256.
+
+    Arrays come from the cache when this exact file was parsed before; they are
+    memory-mapped, so a cached dataset larger than RAM can still be sampled from.
+    """
+    digest = file_sha256(path)
+    # Keyed by the encoding too, so a change to it never reuses stale arrays
+    entry = os.path.join(cache_dir, f'{digest}-{feature_encoder.signature[:12]}')
+    if os.path.isdir(entry):
+        print(f"dataset {digest[:12]} read from cache")
+        return (np.load(os.path.join(entry, 'features.npy'), mmap_mode='r'),
+                np.load(os.path.join(entry, 'target.npy'), mmap_mode='r'), digest)
+
+    features, target = parse_csv(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        np.save(os.path.join(staging, 'features.npy'), features)
+        np.save(os.path.join(staging, 'target.npy'), target)
+        with open(os.path.join(staging, 'columns.json'), 'w', encoding='utf-8') as f:
+            json.dump({'source': os.path.abspath(path), 'columns': FEATURE_COLUMNS,
+                       'encoder': feature_encoder.signature, 'rows': len(target)}, f)
+        # A cache entry appears complete or not at all
+        os.rename(staging, entry)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.isdir(entry):
+            raise
+    print(f"dataset {digest[:12]} parsed: {len(target)} rows, cached in {entry}")
+    return features, target, digest
+
+
+def stratified_sample(target, size, random_state):
+    """Row indexes of a class-balanced sample of at most size rows, in file order."""
+    if size >= len(target):
+        return np.arange(len(target))
+    indexes, _ = train_test_split(np.arange(len(target)), train_size=size, stratify=target,
+                                  random_state=random_state)
+    return np.sort(indexes)
+
+
+def search_parameters(features, target, args):
+    """Cross-validated hyperparameter search; returns (best params, summary)."""
+    sample = stratified_sample(target, args.max_search_rows, args.random_state)
+    X, y = np.asarray(features[sample]), np.asarray(target[sample])
+    folds = StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=args.random_state)
+    # Parallelism is across candidate fits; each forest fits on one core
+    estimator = RandomForestClassifier(random_state=args.random_state, n_jobs=1)
+    if args.search == 'random':
+        search = RandomizedSearchCV(estimator, PARAM_GRID, n_iter=args.n_iter, scoring=args.scoring, cv=folds,
+                                    n_jobs=args.jobs, random_state=args.random_state, refit=False)
+    else:
+        search = GridSearchCV(estimator, PARAM_GRID, scoring=args.scoring, cv=folds, n_jobs=args.jobs, refit=False)
+    search.fit(X, y)
+
+    results = search.cv_results_
+    ranked = np.argsort(results['rank_test_score'])[:5]
+    summary = {
+        'scoring': args.scoring,
+        'folds': args.folds,
+        'rows': len(y),
+        'candidates': len(results['params']),
+        'best_score': float(search.best_score_),
+        'top': [{'params': results['params'][i],
+                 'mean_score': float(results['mean_test_score'][i]),
+                 'std_score': float(results['std_test_score'][i])} for i in ranked],
+    }
+    print(f"best {args.scoring} {search.best_score_:.4f} with {search.best_params_} "
+          f"({summary['candidates']} candidates x {args.folds} folds on {len(y)} rows)")
+    return search.best_params_, summary
+
+
+def warm_started_model(path, add_trees, jobs):
+    # Copied into memory: the registry's artifact files are read-only
+    model = joblib.load(path)
+    if getattr(model, 'n_features_in_', len(FEATURE_COLUMNS)) != len(FEATURE_COLUMNS):
+        raise ValueError(f'{path} was trained on {model.n_features_in_} features, expected {len(FEATURE_COLUMNS)}')
+    # Keep the fitted trees and grow add_trees more on the new data
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees, n_jobs=jobs)
+    return model
+
+
+def evaluate(model, X, y):
+    predicted = model.predict(X)
+    metrics = {
+        'rows': len(y),
+        'accuracy': float(accuracy_score(y, predicted)),
+        'f1': float(f1_score(y, predicted, zero_division=0)),
+        'report': classification_report(y, predicted, output_dict=True, zero_division=0),
+    }
+    if len(np.unique(y)) == 2:
+        positive = list(model.classes_).index(1)
+        metrics['roc_auc'] = float(roc_auc_score(y, model.predict_proba(X)[:, positive]))
+    return metrics
+
+
+def train(args):
+    registry = ModelRegistry(args.registry_dir)
+    warm_start_path = None
+    if args.warm_start:
+        # A model.pkl path, a registry version, or "current"
+        version = registry.current() if args.warm_start == 'current' else args.warm_start
+        warm_start_path = args.warm_start if os.path.isfile(args.warm_start) else registry.model_path(version)
+        if not os.path.isfile(warm_start_path):
+            raise SystemExit(f'nothing to warm-start from: {args.warm_start}')
+
+    features, target, digest = load_dataset(args.data, args.cache_dir)
+    rows = np.arange(len(target))
+    train_rows, test_rows = train_test_split(rows, test_size=args.test_size, stratify=target,
+                                             random_state=args.random_state)
+    train_rows.sort()
+    test_rows.sort()
+    X_train, y_train = np.asarray(features[train_rows]), np.asarray(target[train_rows])
+    X_test, y_test = np.asarray(features[test_rows]), np.asarray(target[test_rows])
+
+    if args.warm_start:
+        model = warm_started_model(warm_start_path, args.add_trees, args.jobs)
+        search = None
+    else:
+        params, search = search_parameters(X_train, y_train, args) if not args.no_search else ({}, None)
+        model = RandomForestClassifier(random_state=args.random_state, n_jobs=args.jobs, **params)
+    model.fit(X_train, y_train)
+
+    test_metrics = evaluate(model, X_test, y_test)
+    print(f"holdout accuracy {test_metrics['accuracy']:.4f}, f1 {test_metrics['f1']:.4f}"
+          + (f", roc_auc {test_metrics['roc_auc']:.4f}" if 'roc_auc' in test_metrics else ''))
+
+    # Recorded like a DataFrame fit would, so the inference engine can check the column order
+    model.feature_names_in_ = np.array(FEATURE_COLUMNS, dtype=object)
+    model.n_jobs = None
+
+    created = datetime.now(timezone.utc)
+    version = f"{created:%Y%m%dT%H%M%SZ}-{digest[:8]}"
+    metrics = {
+        'created_at': created.isoformat(timespec='seconds'),
+        'dataset': {'path': os.path.abspath(args.data), 'sha256': digest, 'rows': len(target),
+                    'train_rows': len(train_rows), 'test_rows': len(test_rows)},
+        'columns': FEATURE_COLUMNS,
+        'encoder': feature_encoder.signature,
+        'params': {name: value for name, value in model.get_params().items() if name in PARAM_GRID},
+        'trees': len(model.estimators_),
+        'warm_start_from': os.path.abspath(warm_start_path) if warm_start_path else None,
+        'search': search,
+        'holdout': test_metrics,
+        'sklearn': sklearn.__version__,
+    }
+    directory = registry.add(version, model, metrics)
+    print(f"version {version} written to {directory}")
+    if not args.no_promote:
+        registry.promote(version)
+        print(f"version {version} promoted")
+    return model, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the lung cancer RandomForest model')
+    parser.add_argument('--data', default=DEFAULT_DATA, help='survey CSV to train on')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--registry-dir', default=DEFAULT_REGISTRY_DIR)
+    parser.add_argument('--no-promote', action='store_true', help='add the version without serving it')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--search', choices=('grid', 'random'), default='grid')
+    parser.add_argument('--n-iter', type=int, default=10, help='candidates tried by --search random')
+    parser.add_argument('--no-search', action='store_true', help='fit sklearn defaults without a search')
+    parser.add_argument('--scoring', default='roc_auc')
+    parser.add_argument('--max-search-rows', type=int, default=200000,
+                        help='search on a stratified sample of at most this many rows; the final fit uses all')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--jobs', type=int, default=-1, help='parallel fits; -1 uses every core')
+    parser.add_argument('--warm-start', help='grow this forest (model.pkl path, version or "current") '
+                                             'instead of searching')
+    parser.add_argument('--add-trees', type=int, default=100)
+    parser.add_argument('--random-state', type=int, default=42)
+    args = parser.parse_args()
+    train(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# password_hashing.py
+# Password hashing on a small process pool. Hashes are deliberately CPU-heavy, so on
+# request threads a burst of logins starves every other route; here at most
+# max_pending hashes are queued or running and further requests are refused at once.
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import context as mp_context
+from multiprocessing import forkserver, reduction, spawn, util
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from metrics import Histogram
+
+
+class HasherBusy(Exception):
+    """Raised when max_pending hashes are already queued or running, or a hash did
+    not finish within the timeout."""
+
+
+def hash_method(stored_hash):
+    # Werkzeug hashes are "method$salt$hash", e.g. "scrypt:32768:8:1$..."
+    return stored_hash.split('$', 1)[0]
+
+
+def _verify(stored_hash, password, method):
+    # Runs in a pool process. A correct password stored with another method is
+    # rehashed in the same job, while the plaintext is at hand.
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    if hash_method(stored_hash) != method:
+        return True, generate_password_hash(password, method)
+    return True, None
+
+
+# multiprocessing tells every forkserver child the path of the main script, which
+# the child then runs as __mp_main__: under `python app.py` each hashing process
+# would load the model, open a database pool and warm the caches. Pool jobs only
+# need this module, so these children are launched without the main script.
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    from multiprocessing import popen_forkserver
+
+    class _LibraryPopen(popen_forkserver.Popen):
+        # popen_forkserver.Popen._launch, minus the main module in the preparation data
+        def _launch(self, process_obj):
+            prep_data = spawn.get_preparation_data(process_obj._name)
+            prep_data.pop('init_main_from_path', None)
+            prep_data.pop('init_main_from_name', None)
+            buf = io.BytesIO()
+            mp_context.set_spawning_popen(self)
+            try:
+                reduction.dump(prep_data, buf)
+                reduction.dump(process_obj, buf)
+            finally:
+                mp_context.set_spawning_popen(None)
+
+            self.sentinel, w = forkserver.connect_to_new_process(self._fds)
+            _parent_w = os.dup(w)
+            self.finalizer = util.Finalize(self, util.close_fds, (_parent_w, self.sentinel))
+            with open(w, 'wb', closefd=True) as f:
+                f.write(buf.getbuffer())
+            self.pid = forkserver.read_signed(self.sentinel)
+
+    class _LibraryProcess(mp_context.ForkServerProcess):
+        @staticmethod
+        def _Popen(process_obj):
+            return _LibraryPopen(process_obj)
+
+    class _LibraryForkServerContext(mp_context.ForkServerContext):
+        Process = _LibraryProcess
+else:
+    _LibraryForkServerContext = None
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on `workers` processes with Werkzeug's
+    `method` (e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000").
+
+    Every serving process gets its own pool. Call start() in each one before it
+    starts any other thread (serve.py's post_fork and app.py's __main__ do): the pool
+    processes are then forked from a single-threaded process. The forkserver is for
+    recovery only: a pool needed later, because start() failed or a pool process
+    died, is started through it, since forking a process that runs threads can
+    deadlock the child on a lock one of those threads held. Its children import this
+    module, not the main script. With workers=0 hashing runs on the calling thread.
+    """
+
+    def __init__(self, method, workers=2, max_pending=16, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.seconds = Histogram()
+        self.counters = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'rejected': 0, 'timeouts': 0}
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def hash(self, password):
+        result = self._run(generate_password_hash, password, self.method)
+        self._count('hashed')
+        return result
+
+    def verify(self, stored_hash, password):
+        """Returns (matches, new_hash). new_hash is set when the password matched a
+        hash made with another method; store it in place of the old one."""
+        matches, new_hash = self._run(_verify, stored_hash, password, self.method)
+        self._count('verified')
+        if new_hash:
+            self._count('rehashed')
+        return matches, new_hash
+
+    def start(self):
+        """Start this process's pool now, forking its processes at once. If this
+        raises, the pool is started through the forkserver on first use instead."""
+        if self.workers:
+            self._pool('fork').submit(int).result(self.timeout)
+
+    def stats(self):
+        return {
+            'method': self.method,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'counters': self._counters_snapshot(),
+            'seconds': self.seconds.snapshot(),
+        }
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise HasherBusy('Too many password checks in progress')
+        started = time.perf_counter()
+        if not self.workers:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+                self.seconds.observe(time.perf_counter() - started)
+
+        try:
+            future = self._pool().submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard()
+            raise HasherBusy('Password hashing pool restarted') from None
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the job finishes, even if the caller stops waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            self._count('timeouts')
+            raise HasherBusy('Password check timed out') from None
+        except BrokenProcessPool:
+            self._discard()
+            raise HasherBusy('Password hashing pool restarted') from None
+        finally:
+            self.seconds.observe(time.perf_counter() - started)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _counters_snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def _discard(self):
+        # A pool process died, which breaks the whole pool; the next call starts a new one
+        with self._lock:
+            if self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+                self._pid = None
+
+    def _pool(self, start_method='forkserver'):
+        if self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._pid != os.getpid():
+                if start_method == 'forkserver' and _LibraryForkServerContext is not None:
+                    context = _LibraryForkServerContext()
+                    # The server imports only this module, not the app, before forking pool processes
+                    context.set_forkserver_preload([__name__])
+                else:
+                    methods = multiprocessing.get_all_start_methods()
+                    context = multiprocessing.get_context(start_method if start_method in methods else None)
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+                self._pid = os.getpid()
+        return self._executor
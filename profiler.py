@@ -0,0 +1,46 @@
+# profiler.py
+# Sampling profiler that can be switched on in a running process: a background thread
+# records every other thread's stack at a fixed interval, so the cost is independent
+# of how much code runs
+import sys
+import threading
+import time
+from collections import Counter
+
+_running = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is already being taken in this process."""
+
+
+def sample_stacks(seconds, interval=0.005):
+    """Sample all threads for the given seconds; returns a Counter of collapsed stacks.
+
+    Each key is "outer;...;inner" with frames as function (file:line), the format
+    consumed by flamegraph.pl and speedscope.
+    """
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy('A profile is already running')
+    try:
+        me = threading.get_ident()
+        samples = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+                    frame = frame.f_back
+                samples[';'.join(reversed(stack))] += 1
+            time.sleep(interval)
+        return samples
+    finally:
+        _running.release()
+
+
+def collapsed(samples):
+    return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
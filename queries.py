@@ -0,0 +1,127 @@
+# queries.py
+# SQL for the hot read paths in app.py, kept in one place so the EXPLAIN check in
+# migrate.py always inspects exactly what the routes run.
+
+USER_BY_EMAIL = "SELECT * FROM users WHERE Email = %s"
+
+# History pages are keyset-paginated on (prediction_date, id), newest first
+_KEYSET_AFTER = "(p.prediction_date < %s OR (p.prediction_date = %s AND p.id < %s))"
+
+USER_PREDICTIONS = """
+    SELECT p.* FROM predictions p
+    JOIN user_predictions up ON p.id = up.prediction_id
+    WHERE up.user_id = %s
+    ORDER BY p.prediction_date DESC, p.id DESC
+"""
+
+USER_PREDICTIONS_PAGE = """
+    SELECT p.* FROM predictions p
+    JOIN user_predictions up ON p.id = up.prediction_id
+    WHERE up.user_id = %s
+    ORDER BY p.prediction_date DESC, p.id DESC
+    LIMIT %s
+"""
+
+USER_PREDICTIONS_PAGE_AFTER = f"""
+    SELECT p.* FROM predictions p
+    JOIN user_predictions up ON p.id = up.prediction_id
+    WHERE up.user_id = %s AND {_KEYSET_AFTER}
+    ORDER BY p.prediction_date DESC, p.id DESC
+    LIMIT %s
+"""
+
+ALL_PREDICTIONS = """
+    SELECT p.*, u.Name AS user_name, u.Email AS user_email
+    FROM predictions p
+    JOIN user_predictions up ON p.id = up.prediction_id
+    JOIN users u ON up.user_id = u.ID
+    ORDER BY p.prediction_date DESC, p.id DESC
+"""
+
+ALL_PREDICTIONS_PAGE = """
+    SELECT p.*, u.Name AS user_name, u.Email AS user_email
+    FROM predictions p
+    JOIN user_predictions up ON p.id = up.prediction_id
+    JOIN users u ON up.user_id = u.ID
+    ORDER BY p.prediction_date DESC, p.id DESC
+    LIMIT %s
+"""
+
+ALL_PREDICTIONS_PAGE_AFTER = f"""
+    SELECT p.*, u.Name AS user_name, u.Email AS user_email
+    FROM predictions p
+    JOIN user_predictions up ON p.id = up.prediction_id
+    JOIN users u ON up.user_id = u.ID
+    WHERE {_KEYSET_AFTER}
+    ORDER BY p.prediction_date DESC, p.id DESC
+    LIMIT %s
+"""
+
+BATCH_PREDICTION_IDS = "SELECT id FROM predictions WHERE batch_id = %s ORDER BY id"
+
+MEDICAL_HISTORY_BY_USER = "SELECT * FROM medical_history WHERE user_id = %s"
+
+USER_FEEDBACK = """
+    SELECT f.*, p.prediction FROM user_feedback f
+    LEFT JOIN predictions p ON f.prediction_id = p.id
+    WHERE f.user_id = %s
+    ORDER BY f.created_at DESC
+"""
+
+RECORD_VERSION = """
+    SELECT version_number
+    FROM version_control
+    WHERE table_name = %s AND record_id = %s
+"""
+
+# Whole reference tables, cached by reference_cache.py
+REFERENCE_ROWS = {
+    'symptoms': "SELECT * FROM symptoms",
+    'recommendations': "SELECT * FROM recommendations",
+}
+
+# Table-level versions (record_id 0), bumped by the 0003 migration's triggers
+REFERENCE_VERSIONS = """
+    SELECT table_name, version_number
+    FROM version_control
+    WHERE record_id = 0 AND table_name IN (%s, %s)
+"""
+
+# /analytics: prediction counts from the rollup table, never from predictions. Cost
+# grows with the date range and the number of model versions, not with predictions.
+# Rows are split by model_version, whose risk scores are on different scales.
+ANALYTICS_DIMENSIONS = ('day', 'gender', 'age_bucket')
+ANALYTICS = {
+    dimension: f"""
+        SELECT {dimension} AS bucket, model_version, risk_level,
+               SUM(predictions) AS predictions, SUM(risk_score_sum) AS risk_score_sum
+        FROM prediction_rollups
+        WHERE day BETWEEN %s AND %s
+        GROUP BY {dimension}, model_version, risk_level
+        HAVING SUM(predictions) > 0
+        ORDER BY {dimension}, model_version, risk_level
+    """
+    for dimension in ANALYTICS_DIMENSIONS
+}
+
+# Run by the detect_deadlocks() maintenance procedure
+EXPIRED_LOCKS = "SELECT id FROM lock_management WHERE lock_timeout < CURRENT_TIMESTAMP"
+
+# Queries checked by `python migrate.py --check`, with representative parameters.
+# SELECT * FROM symptoms / recommendations and the ALL_PREDICTIONS export are left
+# out: reading every row is what those routes are for.
+_SAMPLE_DATE = '2030-01-01 00:00:00'
+EXPLAIN_CHECKS = [
+    ('login user lookup', USER_BY_EMAIL, ('user@example.com',)),
+    ('user history stream', USER_PREDICTIONS, (1,)),
+    ('user history first page', USER_PREDICTIONS_PAGE, (1, 51)),
+    ('user history next page', USER_PREDICTIONS_PAGE_AFTER, (1, _SAMPLE_DATE, _SAMPLE_DATE, 1, 51)),
+    ('all predictions first page', ALL_PREDICTIONS_PAGE, (51,)),
+    ('all predictions next page', ALL_PREDICTIONS_PAGE_AFTER, (_SAMPLE_DATE, _SAMPLE_DATE, 1, 51)),
+    ('batch prediction ids', BATCH_PREDICTION_IDS, ('0' * 32,)),
+    ('medical history', MEDICAL_HISTORY_BY_USER, (1,)),
+    ('feedback list', USER_FEEDBACK, (1,)),
+    ('check_version / token version lookup', RECORD_VERSION, ('users', 1)),
+    ('reference data versions', REFERENCE_VERSIONS, ('symptoms', 'recommendations')),
+    ('detect_deadlocks', EXPIRED_LOCKS, ()),
+] + [(f'analytics by {dimension}', sql, ('2030-01-01', '2030-01-31')) for dimension, sql in ANALYTICS.items()]
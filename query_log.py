@@ -0,0 +1,135 @@
+# query_log.py
+# Statement timings grouped by normalized fingerprint, a slow-query log with EXPLAIN
+# plans, and the top-N table served by /admin/queries
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+logger = logging.getLogger('slow_query')
+
+_COMMENTS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_PLACEHOLDERS = re.compile(r'%s|%\(\w+\)s')
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+# Statements MySQL can EXPLAIN without running them
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+
+def fingerprint(sql):
+    """Normalize a statement so every call of the same query maps to one key:
+    literals and placeholders become ?, IN lists collapse and whitespace is squeezed."""
+    sql = _COMMENTS.sub(' ', sql)
+    sql = _STRINGS.sub('?', sql)
+    sql = _PLACEHOLDERS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _IN_LISTS.sub('(?+)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class QueryLog:
+    """Per-fingerprint counts and timings for every statement passed to observe().
+
+    Statements slower than slow_threshold seconds are logged by fingerprint
+    (parameters are never logged). When explain(operation, params) is given, the
+    plan of a slow statement is captured on a background thread, at most once per
+    explain_interval seconds per fingerprint, and kept with its stats.
+    """
+
+    def __init__(self, slow_threshold=0.2, max_fingerprints=1000, explain=None, explain_interval=300):
+        self.slow_threshold = slow_threshold
+        self.max_fingerprints = max_fingerprints
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self._stats = {}
+        self._fingerprints = {}  # statement text -> fingerprint; route SQL is mostly constant
+        self._lock = threading.Lock()
+        self._explain_queue = queue.SimpleQueue()
+        self._pid = None
+
+    def observe(self, operation, params, seconds):
+        if isinstance(operation, (bytes, bytearray)):
+            operation = operation.decode('utf-8', 'replace')
+        key = self._fingerprints.get(operation)
+        if key is None:
+            key = fingerprint(operation)
+            if len(self._fingerprints) < 4 * self.max_fingerprints:
+                self._fingerprints[operation] = key
+        slow = seconds >= self.slow_threshold
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    # Forget the query that has cost the least so far
+                    del self._stats[min(self._stats, key=lambda k: self._stats[k]['total_seconds'])]
+                stats = self._stats[key] = {
+                    'fingerprint': key, 'count': 0, 'slow_count': 0, 'total_seconds': 0.0,
+                    'max_seconds': 0.0, 'last_seen': None, 'plan': None, 'plan_captured_at': None,
+                    '_explain_due': 0.0,
+                }
+            stats['count'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['last_seen'] = time.time()
+            explain = False
+            if slow:
+                stats['slow_count'] += 1
+                now = time.monotonic()
+                if self.explain and now >= stats['_explain_due'] and self._explainable(operation):
+                    stats['_explain_due'] = now + self.explain_interval
+                    explain = True
+
+        if slow:
+            logger.warning('slow query %.1fms: %s', seconds * 1000, key)
+        if explain:
+            self._ensure_worker()
+            self._explain_queue.put((key, operation, params))
+
+    def top(self, limit=20, sort='total_seconds'):
+        with self._lock:
+            rows = [{name: value for name, value in stats.items() if not name.startswith('_')}
+                    for stats in self._stats.values()]
+        for row in rows:
+            row['mean_seconds'] = row['total_seconds'] / row['count']
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    @staticmethod
+    def _explainable(operation):
+        statement = operation.strip().rstrip(';')
+        return statement.split(None, 1)[0].upper() in EXPLAINABLE and ';' not in statement
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._explain_queue = queue.SimpleQueue()
+                threading.Thread(target=self._run, name='query-explain', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        pending = self._explain_queue
+        while True:
+            key, operation, params = pending.get()
+            try:
+                plan = self.explain(operation, params)
+            except Exception as e:
+                logger.warning('EXPLAIN failed for %s: %s', key, e)
+                continue
+            with self._lock:
+                stats = self._stats.get(key)
+                if stats is not None:
+                    stats['plan'] = plan
+                    stats['plan_captured_at'] = time.time()
+            logger.warning('plan for %s: %s', key, plan)
@@ -0,0 +1,99 @@
+# reference_cache.py
+# Read-through cache for static reference tables (symptoms, recommendations) and
+# the pages rendered from them
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class ReferencePage:
+    def __init__(self, rows, version, loaded_at):
+        self.rows = rows
+        self.version = version
+        self.last_modified = loaded_at
+        self.html = None
+        self.etag = None
+
+
+class ReferenceCache:
+    """Keeps whole reference tables in memory.
+
+    load_rows(table) returns a table's rows; load_versions(tables) returns
+    {table: version_number} from version_control (record_id 0 tracks the whole table).
+    Versions are polled at most once per check_interval seconds and a table is
+    reloaded when its version changes or after ttl seconds regardless. If the
+    database is unavailable the last loaded copy keeps being served.
+    """
+
+    def __init__(self, tables, load_rows, load_versions, ttl=3600, check_interval=30):
+        self.tables = tuple(tables)
+        self.load_rows = load_rows
+        self.load_versions = load_versions
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._pages = {}
+        self._loaded_at = {}
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'reloads': 0, 'renders': 0, 'stale_served': 0}
+
+    def warm(self):
+        with self._lock:
+            versions = self.load_versions(self.tables)
+            for table in self.tables:
+                self._reload(table, versions.get(table, 0))
+            self._next_check = time.monotonic() + self.check_interval
+
+    def page(self, table):
+        """Current ReferencePage for table, reloading it first if it is stale."""
+        with self._lock:
+            now = time.monotonic()
+            if table not in self._pages or now >= self._next_check:
+                self._refresh(now)
+            self.counters['hits'] += 1
+            return self._pages[table]
+
+    def rendered(self, table, render):
+        """The current page with its html, rendered once per loaded version with render(rows)."""
+        page = self.page(table)
+        if page.html is None:
+            self.store_html(page, render(page.rows))
+        return page
+
+    def store_html(self, page, html):
+        """Attach html rendered from page.rows; the first render to arrive wins."""
+        with self._lock:
+            if page.html is None:
+                page.html = html
+                page.etag = hashlib.sha1(html.encode('utf-8')).hexdigest()
+                self.counters['renders'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tables': {table: page.version for table, page in self._pages.items()},
+                'counters': dict(self.counters),
+            }
+
+    def _refresh(self, now):
+        try:
+            versions = self.load_versions(self.tables)
+            for table in self.tables:
+                page = self._pages.get(table)
+                expired = now - self._loaded_at.get(table, 0.0) >= self.ttl
+                if page is None or expired or page.version != versions.get(table, 0):
+                    self._reload(table, versions.get(table, 0))
+        except Exception:
+            # Keep serving what we have; only fail when nothing was ever loaded
+            if not all(table in self._pages for table in self.tables):
+                raise
+            self.counters['stale_served'] += 1
+        self._next_check = now + self.check_interval
+
+    def _reload(self, table, version):
+        rows = self.load_rows(table)
+        loaded_at = datetime.now(timezone.utc).replace(microsecond=0)
+        self._pages[table] = ReferencePage(rows, version, loaded_at)
+        self._loaded_at[table] = time.monotonic()
+        self.counters['reloads'] += 1
@@ -0,0 +1,177 @@
+# risk_scoring.py
+# Batch scoring with the rule-based lung cancer risk model
+import csv
+import io
+
+import numpy as np
+
+RISK_LABELS = np.array([
+    "Low risk of lung cancer",
+    "Moderate risk of lung cancer",
+    "High risk of lung cancer",
+])
+
+SYMPTOM_FIELDS = ('smoking', 'cough', 'chest_pain', 'fatigue', 'shortness_of_breath')
+
+# Lookup tables for the rule-based model
+# Age buckets: under 40 -> 1, 40-49 -> 2, 50-59 -> 3, 60 and over -> 4
+AGE_BUCKET_EDGES = np.array([40, 50, 60])
+AGE_POINTS = np.array([1, 2, 3, 4])
+# Indexed by is_male: other/female -> 1, male -> 2
+GENDER_POINTS = np.array([1, 2])
+# Weights in SYMPTOM_FIELDS order; smoking carries the highest weight
+SYMPTOM_WEIGHTS = np.array([5, 2, 3, 1, 3])
+# Score bands: under 6 -> Low, 6-9 -> Moderate, 10 and over -> High
+RISK_BAND_EDGES = np.array([6, 10])
+RISK_LEVELS = np.array(['Low', 'Moderate', 'High'])
+# Stored in predictions.model_version for rows scored by these rules; change it
+# whenever a weight or edge above changes
+RULES_MODEL_VERSION = 'rules-v1'
+
+# Headers of "survey lung cancer.csv" mapped to the predictions table columns
+CSV_COLUMNS = {
+    'AGE': 'age',
+    'GENDER': 'gender',
+    'SMOKING': 'smoking',
+    'COUGHING': 'cough',
+    'CHEST PAIN': 'chest_pain',
+    'FATIGUE': 'fatigue',
+    'SHORTNESS OF BREATH': 'shortness_of_breath',
+}
+
+GENDER_VALUES = {'m': 'Male', 'male': 'Male', 'f': 'Female', 'female': 'Female', 'other': 'Other'}
+# The survey file codes answers as 1 = no, 2 = yes
+FLAG_VALUES = {'yes': 'yes', 'no': 'no', '2': 'yes', '1': 'no', 'true': 'yes', 'false': 'no'}
+
+
+def normalize_record(record):
+    """Map a form/JSON dict or a survey CSV row to the predictions table values."""
+    fields = {}
+    for key, value in record.items():
+        if key is None:
+            continue
+        key = key.strip()
+        fields[CSV_COLUMNS.get(key.upper(), key.lower())] = value
+
+    age = int(fields['age'])
+    if not 0 <= age <= 120:
+        raise ValueError(f'age out of range: {age}')
+    gender = GENDER_VALUES.get(str(fields['gender']).strip().lower())
+    if gender is None:
+        raise ValueError(f"invalid gender: {fields['gender']!r}")
+
+    row = {'age': age, 'gender': gender}
+    for field in SYMPTOM_FIELDS:
+        value = FLAG_VALUES.get(str(fields[field]).strip().lower())
+        if value is None:
+            raise ValueError(f'invalid {field}: {fields[field]!r}')
+        row[field] = value
+    return row
+
+
+def read_csv_records(stream, encoding='utf-8'):
+    """Yield rows of an uploaded survey-format CSV as dicts."""
+    return csv.DictReader(io.TextIOWrapper(stream, encoding=encoding, newline=''))
+
+
+def to_columns(rows):
+    """Turn normalized rows into column arrays for score_batch()."""
+    return {
+        'age': np.fromiter((row['age'] for row in rows), dtype=np.int32, count=len(rows)),
+        'gender': np.array([row['gender'] for row in rows]),
+        **{field: np.array([row[field] for row in rows]) for field in SYMPTOM_FIELDS},
+    }
+
+
+def _column(columns, name):
+    # DataFrames may carry either the table column names or the survey CSV headers
+    if hasattr(columns, 'columns') and name not in columns:
+        headers = {CSV_COLUMNS.get(str(header).strip().upper()): header for header in columns.columns}
+        return np.asarray(columns[headers[name]])
+    return np.asarray(columns[name])
+
+
+def _is_yes(values):
+    # Accepts booleans, 'yes'/'no' strings or the survey's 1 = no / 2 = yes codes
+    if values.dtype.kind == 'b':
+        return values
+    if values.dtype.kind in 'iuf':
+        return values == 2
+    return values == 'yes'
+
+
+def compute_risk(columns):
+    """Score N patients at once; returns (risk_score, band index) integer arrays.
+
+    columns is a dict of column arrays or a DataFrame. Band indexes point into RISK_LEVELS.
+    """
+    age = _column(columns, 'age')
+    gender = _column(columns, 'gender')
+
+    risk_score = AGE_POINTS[np.searchsorted(AGE_BUCKET_EDGES, age, side='right')]
+    if gender.dtype.kind in 'iuf':
+        male = gender == 1  # LabelEncoder coding used for training: M -> 1, F -> 0
+    else:
+        male = np.isin(gender, ('Male', 'M'))
+    risk_score = risk_score + GENDER_POINTS[male.astype(np.intp)]
+
+    flags = np.empty((len(age), len(SYMPTOM_FIELDS)), dtype=np.int64)
+    for index, field in enumerate(SYMPTOM_FIELDS):
+        flags[:, index] = _is_yes(_column(columns, field))
+    risk_score = risk_score + flags @ SYMPTOM_WEIGHTS
+
+    band = np.searchsorted(RISK_BAND_EDGES, risk_score, side='right')
+    return risk_score, band
+
+
+def score_batch(columns, lookup=False):
+    """Score N patients at once; returns (risk_score, prediction label) arrays.
+
+    With lookup=True scores come from the precomputed RISK_TABLE instead.
+    """
+    risk_score, band = lookup_risk(columns) if lookup else compute_risk(columns)
+    return risk_score.astype(np.float64), RISK_LABELS[band]
+
+
+# Full lookup table for the rule-based model. Every input reduces to an age bucket,
+# a male flag and the five symptom flags, so there are only 4 * 2 * 32 distinct scores.
+# Index layout: (age_bucket * 2 + is_male) * 32 + symptom bits, SYMPTOM_FIELDS[0] highest.
+SYMPTOM_BITS = 1 << np.arange(len(SYMPTOM_FIELDS) - 1, -1, -1)
+
+
+def _build_risk_table():
+    index = np.arange(len(AGE_POINTS) * 2 << len(SYMPTOM_FIELDS))
+    age_bucket, rest = np.divmod(index, 2 << len(SYMPTOM_FIELDS))
+    male, bits = np.divmod(rest, 1 << len(SYMPTOM_FIELDS))
+    flags = (bits[:, None] & SYMPTOM_BITS) > 0
+    risk_score = AGE_POINTS[age_bucket] + GENDER_POINTS[male] + flags @ SYMPTOM_WEIGHTS
+    return risk_score, np.searchsorted(RISK_BAND_EDGES, risk_score, side='right')
+
+
+RISK_TABLE, RISK_TABLE_BANDS = _build_risk_table()
+
+
+def feature_index(columns):
+    """Position of each row in RISK_TABLE."""
+    age_bucket = np.searchsorted(AGE_BUCKET_EDGES, _column(columns, 'age'), side='right')
+    gender = _column(columns, 'gender')
+    male = gender == 1 if gender.dtype.kind in 'iuf' else np.isin(gender, ('Male', 'M'))
+    index = (age_bucket * 2 + male) << len(SYMPTOM_FIELDS)
+    for bit, field in zip(SYMPTOM_BITS, SYMPTOM_FIELDS):
+        index |= bit * _is_yes(_column(columns, field))
+    return index
+
+
+def lookup_risk(columns):
+    """Same result as compute_risk(), as a single array index per row."""
+    index = feature_index(columns)
+    return RISK_TABLE[index], RISK_TABLE_BANDS[index]
+
+
+def row_key(row):
+    """Canonical RISK_TABLE index of one normalize_record() row, without numpy."""
+    age_bucket = sum(row['age'] >= edge for edge in AGE_BUCKET_EDGES.tolist())
+    index = age_bucket * 2 + (row['gender'] == 'Male')
+    for field in SYMPTOM_FIELDS:
+        index = index * 2 + (row[field] == 'yes')
+    return index
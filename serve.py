@@ -0,0 +1,92 @@
+"""Production launcher: pre-forked gunicorn workers sharing a preloaded app.
+
+    python serve.py [--workers N] [--threads T] [--bind 0.0.0.0:5050]
+
+The master imports app.py once, which loads model.pkl and the reference data, and
+compiles every template before forking. Workers inherit all of it copy-on-write.
+Each worker then opens its own connection pool and reports ready on /ready.
+
+Every worker checks the model registry for a newly promoted version every
+MODEL_WATCH_INTERVAL seconds and swaps it in on a background thread; requests
+keep being served throughout and no worker restarts (see model/inference.py).
+The master keeps the model it preloaded, so a worker forked after a promotion
+(recycled or respawned) loads the current version while warming, before /ready.
+"""
+import argparse
+import gc
+import os
+import threading
+
+from gunicorn.app.base import BaseApplication
+
+from config import Config
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def preload():
+    """Import and warm the app in the master, before any worker exists."""
+    import app as application
+
+    # Compile every template once so workers share the compiled code
+    for name in application.app.jinja_env.list_templates():
+        application.app.jinja_env.get_template(name)
+    # Connections opened while warming belong to the master; workers open their own
+    application.db_pool.dispose()
+    # Keep the collector from touching (and so copying) the preloaded objects
+    gc.freeze()
+    return application.app
+
+
+def post_fork(server, worker):
+    from app import password_hasher, warm_worker
+
+    # Fork the hashing processes while this worker is still single-threaded. A failure
+    # (e.g. a timeout on a loaded host) must not kill the worker, or gunicorn respawns
+    # it in a loop; the pool is then started through the forkserver on first use.
+    try:
+        password_hasher.start()
+    except Exception as e:
+        worker.log.warning('Worker %s: password hashing pool not started: %r', worker.pid, e)
+    # Warm in the background so /ready can answer 503 meanwhile
+    threading.Thread(target=warm_worker, name='warm-worker', daemon=True).start()
+
+
+class Launcher(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return preload()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the app with pre-forked gunicorn workers')
+    parser.add_argument('--bind', default=Config.WEB_BIND)
+    parser.add_argument('--workers', type=int, default=Config.WEB_WORKERS or available_cores())
+    parser.add_argument('--threads', type=int, default=Config.WEB_THREADS)
+    args = parser.parse_args()
+
+    Launcher({
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'graceful_timeout': Config.WEB_GRACEFUL_TIMEOUT,
+        'post_fork': post_fork,
+    }).run()
+
+
+if __name__ == '__main__':
+    main()